@@ -0,0 +1,170 @@
+"""
+Finding fingerprints and baselines of accepted findings.
+
+A fingerprint identifies a finding independently of its line number: it
+hashes the rule id, the matched source line with whitespace collapsed, and
+the file path. Moving code up or down, or re-indenting it, keeps the
+fingerprint; editing the line or renaming the file changes it.
+
+It is built in two halves, XORed together: a content key (rule id and line)
+computed by the engine when the finding is made, and a file key mixed in
+when the finding is attributed to a file (`attribute`). Findings therefore
+keep a correct fingerprint however they reach a file — diff attribution,
+blob results reused across paths — without the engine knowing file names.
+
+A baseline is a set of 64-bit fingerprints (a Python set of ints: O(1)
+lookups, ~60 bytes per entry in memory, 8 in SQLite). A scan with a
+baseline binds it to each file (`Baseline.for_file`) and the engine checks
+the content key against it before formatting evidence or building the
+Finding, so baselined findings cost a hash and a set lookup.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from .findings import Finding
+
+
+MAX_ENTRIES = int(os.getenv("BASELINE_MAX_ENTRIES", "1000000"))
+
+NAME_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+FINGERPRINT_RE = re.compile(r"^[0-9a-f]{16}$")
+
+
+class BaselineError(ValueError):
+    pass
+
+
+# 1. Fingerprints
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=8).digest(), "big")
+
+
+def content_key(rule_id: str, line: str) -> int:
+    """The file-independent half of a fingerprint."""
+    return _hash64(rule_id + "\0" + " ".join(line.split()))
+
+
+def file_key(file: Optional[str]) -> int:
+    """The file half of a fingerprint; 0 for findings not attributed to a file."""
+    return _hash64(file.replace("\\", "/")) if file else 0
+
+
+def to_hex(key: int) -> str:
+    return format(key, "016x")
+
+
+def attribute(f: Finding, file: Optional[str]) -> Finding:
+    """Set the finding's file, re-keying its fingerprint from the old file to the new one."""
+    if f.fingerprint is not None and file != f.file:
+        f.fingerprint = to_hex(int(f.fingerprint, 16) ^ file_key(f.file) ^ file_key(file))
+    f.file = file
+    return f
+
+
+# 2. Baselines
+
+class Suppression:
+    """A baseline bound to one file, counting the findings it hides."""
+
+    __slots__ = ("keys", "file_key", "hidden")
+
+    def __init__(self, keys: frozenset, file: Optional[str]):
+        self.keys = keys
+        self.file_key = file_key(file)
+        self.hidden = 0
+
+    def hides(self, content: int) -> bool:
+        if (content ^ self.file_key) in self.keys:
+            self.hidden += 1
+            return True
+        return False
+
+
+class Baseline:
+    __slots__ = ("name", "keys")
+
+    def __init__(self, name: str, keys: Iterable[int]):
+        self.name = name
+        self.keys = frozenset(keys)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def parse(cls, name: str, fingerprints: Iterable[str]) -> "Baseline":
+        keys = set()
+        for fp in fingerprints:
+            if not FINGERPRINT_RE.match(fp):
+                raise BaselineError(f"Not a fingerprint: {fp[:40]!r} (expected 16 lowercase hex digits).")
+            keys.add(int(fp, 16))
+            if len(keys) > MAX_ENTRIES:
+                raise BaselineError(f"Baseline has more than BASELINE_MAX_ENTRIES ({MAX_ENTRIES}) fingerprints.")
+        return cls(name, keys)
+
+    def for_file(self, file: Optional[str]) -> Suppression:
+        return Suppression(self.keys, file)
+
+
+class BaselineStore:
+    """Named baselines in memory, optionally persisted to SQLite as packed 8-byte keys."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._baselines: Dict[str, Baseline] = {}
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS baselines (name TEXT PRIMARY KEY, keys BLOB NOT NULL)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "BaselineStore":
+        return cls(os.getenv("BASELINES_DB") or None)
+
+    def put(self, baseline: Baseline) -> None:
+        if not NAME_RE.match(baseline.name):
+            raise BaselineError("Baseline names are 1-64 letters, digits, '.', '_' or '-'.")
+        with self._lock:
+            self._baselines[baseline.name] = baseline
+            if self._db is not None:
+                packed = array("Q", sorted(baseline.keys)).tobytes()
+                self._db.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?)", (baseline.name, packed))
+                self._db.commit()
+
+    def get(self, name: str) -> Optional[Baseline]:
+        with self._lock:
+            found = self._baselines.get(name)
+            if found is not None or self._db is None:
+                return found
+            row = self._db.execute("SELECT keys FROM baselines WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            keys = array("Q")
+            keys.frombytes(row[0])
+            found = self._baselines[name] = Baseline(name, keys)
+            return found
+
+    def delete(self, name: str) -> bool:
+        with self._lock:
+            found = self._baselines.pop(name, None) is not None
+            if self._db is not None:
+                found = self._db.execute("DELETE FROM baselines WHERE name = ?", (name,)).rowcount > 0 or found
+                self._db.commit()
+            return found
+
+    def names(self) -> List[str]:
+        with self._lock:
+            names = set(self._baselines)
+            if self._db is not None:
+                names.update(row[0] for row in self._db.execute("SELECT name FROM baselines"))
+        return sorted(names)
+
+
+STORE = BaselineStore.from_env()
@@ -0,0 +1,321 @@
+"""
+Scanning raw byte buffers (bytes, bytearray, memoryview, mmap) without
+decoding them.
+
+The rules run as bytes regexes (Rule.compiled_bytes) on the buffer one
+line-aligned chunk (CHUNK_BYTES) at a time. In each chunk the rules' anchor
+literals are found with bytes.find — the same prefilter ScanContext uses —
+and only the lines containing one are matched. Only a hit's line is
+decoded, with errors="replace", to build the evidence. The comment/string
+tokenizer runs as a bytes regex over the whole buffer, but lazily: its
+tokens are consumed in step with the lines being visited and dropped behind
+them. Memory therefore stays flat in the size of the input (a chunk, a few
+tokens, the findings), and invalid UTF-8 never fails a scan.
+
+For ASCII text the findings are the same as ScanContext's, with byte
+offsets standing in for character offsets. The differences are in what
+counts as a line break and as whitespace: lines end only at "\\n" (with a
+"\\r" before it dropped), not at lone "\\r", "\\f" or Unicode separators,
+and \\w, \\b, \\s and IGNORECASE follow ASCII rules.
+"""
+
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .baseline import Suppression, content_key, to_hex
+from .context import _TOKENIZERS, _DOCSTRING_TYPES, _EXTRA_PREFIXES, _UNICODE_BREAKS
+from .filetypes import UNKNOWN, classify
+from .findings import Finding
+
+
+Buffer = Union[bytes, bytearray, memoryview, "mmap.mmap"]
+
+CHUNK_BYTES = 4 * 1024 * 1024
+
+# classify() sniffs at most 4096 characters; this many bytes always covers them
+SNIFF_BYTES = 4 * 4096
+
+_NL = re.compile(b"\n")
+
+# Bytes other than "\n" that str.splitlines breaks on
+_BREAK_BYTES = frozenset(bytes([b]) for b in b"\r\x0b\x0c\x1c\x1d\x1e")
+
+# The str tokenizers as bytes regexes. Tokens still end at "\r", "\f" and the
+# other ASCII breaks; \x85 is left out, being a UTF-8 continuation byte here.
+_BYTE_TOKENIZERS: Dict[str, Optional["re.Pattern"]] = {
+    ft: re.compile(rx.pattern.replace(_UNICODE_BREAKS, "").encode("ascii"), rx.flags & ~re.UNICODE)
+    if rx is not None else None
+    for ft, rx in _TOKENIZERS.items()
+}
+
+
+def _newline_at_or_after(buf: Buffer, pos: int, size: int) -> int:
+    m = _NL.search(buf, pos)
+    return m.start() if m else size
+
+
+def _line_start(buf: Buffer, pos: int) -> int:
+    """Offset just after the last "\\n" before `pos`."""
+    step = 4096
+    lo = pos
+    while lo > 0:
+        lo = max(0, lo - step)
+        i = bytes(buf[lo:pos]).rfind(b"\n")
+        if i != -1:
+            return lo + i + 1
+        step *= 4
+    return 0
+
+
+def _is_triple(buf: Buffer, start: int) -> bool:
+    return bytes(buf[start:start + 5]).lstrip(b"rRbBuUfF")[:3] in (b'"""', b"'''")
+
+
+class TokenStream:
+    """
+    Comment and string spans of a buffer, produced as lines are visited in
+    increasing order. `advance` to a line keeps exactly the spans touching it.
+    """
+
+    def __init__(self, buf: Buffer, size: int, file_type: str):
+        self.buf = buf
+        self.size = size
+        tokenizer = _BYTE_TOKENIZERS.get(file_type, _BYTE_TOKENIZERS[UNKNOWN])
+        self._matches = tokenizer.finditer(buf) if tokenizer is not None else iter(())
+        self._docstrings = file_type in _DOCSTRING_TYPES
+        self._prefixes = tuple(p.encode("ascii") for p in _EXTRA_PREFIXES.get(file_type, ()))
+        self._ahead: Optional[Tuple[int, int, str]] = None
+        self.spans: List[Tuple[int, int, str]] = []
+
+    def _pull(self) -> Optional[Tuple[int, int, str]]:
+        for m in self._matches:
+            start, end = m.span()
+            if start == end:
+                continue
+            kind = "c" if m.lastgroup == "c" else "s"
+            if kind == "s" and self._docstrings and _is_triple(self.buf, start):
+                if not bytes(self.buf[_line_start(self.buf, start):start]).strip():
+                    kind = "c"
+            return start, end, kind
+        return None
+
+    def advance(self, line_start: int, line_end: int) -> None:
+        """Move to the line [line_start, line_end) (line_end is its "\\n" or the buffer end)."""
+        spans = self.spans
+        drop = 0
+        while drop < len(spans) and spans[drop][1] <= line_start:
+            drop += 1
+        if drop:
+            del spans[:drop]
+        while True:
+            if self._ahead is None:
+                self._ahead = self._pull()
+                if self._ahead is None:
+                    return
+            if self._ahead[0] > line_end:
+                return
+            if self._ahead[1] > line_start:
+                spans.append(self._ahead)
+            self._ahead = None
+
+    def in_code(self, pos: int) -> bool:
+        for start, end, _ in self.spans:
+            if start <= pos < end:
+                return False
+        return True
+
+    def _after_close(self, end: int) -> bool:
+        """Is there anything but whitespace after `end` on the line holding end - 1?"""
+        return bool(bytes(self.buf[end:_newline_at_or_after(self.buf, end - 1, self.size)]).strip())
+
+    def _code_after_break(self, end: int, line_end: int) -> bool:
+        """
+        Did the comment ending at `end` stop at a lone "\r", "\f" or similar
+        break with more text after it? Those are separate lines to
+        ScanContext, so this line is not comment-only.
+        """
+        rest = bytes(self.buf[end:line_end])
+        return rest[:1] in _BREAK_BYTES and bool(rest[1:].strip())
+
+    def is_comment(self, line_start: int, line_end: int, line: bytes) -> bool:
+        """The comment-line flag of the current line, as ScanContext.comment_lines computes it."""
+        flag = False
+        for start, end, kind in self.spans:
+            if kind != "c":
+                continue
+            if start >= line_start:
+                if not line[:start - line_start].strip() and not self._code_after_break(end, line_end):
+                    triple = self._docstrings and _is_triple(self.buf, start)
+                    if not triple or not self._after_close(end):
+                        flag = True
+            else:
+                flag = True
+                if end - 1 <= line_end and self._after_close(end):
+                    flag = False
+        if self._prefixes and line.strip().startswith(self._prefixes):
+            flag = True
+        return flag
+
+
+def _chunks(buf: Buffer, size: int) -> Iterator[Tuple[int, bytes]]:
+    """(offset, bytes) pieces of the buffer that end just after a "\\n" (or at the end)."""
+    lo = 0
+    while lo < size:
+        hi = min(lo + CHUNK_BYTES, size)
+        chunk = bytes(buf[lo:hi])
+        if hi < size:
+            cut = chunk.rfind(b"\n")
+            if cut == -1:
+                # one line longer than a chunk: extend to its end
+                hi = _newline_at_or_after(buf, hi, size) + 1
+                hi = min(hi, size)
+                chunk = bytes(buf[lo:hi])
+            else:
+                chunk = chunk[:cut + 1]
+                hi = lo + cut + 1
+        yield lo, chunk
+        lo = hi
+
+
+def _anchor_lines(chunk: bytes, lowered: Optional[bytes], anchors: Tuple[bytes, ...],
+                  ignorecase: bool) -> Set[int]:
+    """Start offsets (in `chunk`) of lines containing any of `anchors`."""
+    text = lowered if ignorecase else chunk
+    hits: Set[int] = set()
+    for anchor in anchors:
+        pos = text.find(anchor)
+        while pos != -1:
+            hits.add(chunk.rfind(b"\n", 0, pos) + 1)
+            nl = chunk.find(b"\n", pos)
+            if nl == -1:
+                break
+            pos = text.find(anchor, nl + 1)
+    return hits
+
+
+def _all_lines(chunk: bytes) -> Set[int]:
+    starts = {0} if chunk else set()
+    pos = chunk.find(b"\n")
+    while pos != -1 and pos + 1 < len(chunk):
+        starts.add(pos + 1)
+        pos = chunk.find(b"\n", pos + 1)
+    return starts
+
+
+def run_buffer(buf: Buffer, file_type: str, seconds: Dict[str, float], counts: Dict[str, int],
+               ruleset=None, suppress: Optional[Suppression] = None) -> List[Finding]:
+    """
+    Run the detectors routed to `file_type` over a byte buffer, accumulating
+    per-detector time and finding counts like service.run_context.
+    """
+    if ruleset is None:
+        from .ruleset import get_ruleset
+        ruleset = get_ruleset()
+
+    plans = []
+    for detector, rules in ruleset.route(file_type):
+        compiled = []
+        for rule in rules:
+            rx, exclude, requires, anchors = rule.compiled_bytes()
+            compiled.append((rule, rx, exclude, requires, anchors))
+        plans.append((detector, compiled))
+    findings: List[List[Finding]] = [[] for _ in plans]
+    for detector, _ in plans:
+        seconds.setdefault(detector.name, 0.0)
+
+    size = len(buf)
+    needs_tokens = any(d.skip_comments or d.code_only for d, _ in plans)
+    tokens = TokenStream(buf, size, file_type) if needs_tokens else None
+    any_ignorecase = any(r.ignorecase and a for _, c in plans for r, _, _, _, a in c)
+
+    lineno = 1
+    for base, chunk in _chunks(buf, size):
+        t0 = time.perf_counter()
+        lowered = chunk.lower() if any_ignorecase else None
+        all_lines: Optional[Set[int]] = None
+        candidates: List[List[Set[int]]] = []
+        per_detector: List[Set[int]] = []
+        for _, compiled in plans:
+            per_rule = []
+            detector_lines: Set[int] = set()
+            for rule, _, _, _, anchors in compiled:
+                if anchors:
+                    hits = _anchor_lines(chunk, lowered, anchors, rule.ignorecase)
+                else:
+                    if all_lines is None:
+                        all_lines = _all_lines(chunk)
+                    hits = all_lines
+                per_rule.append(hits)
+                detector_lines |= hits
+            candidates.append(per_rule)
+            per_detector.append(detector_lines)
+        union: Set[int] = set().union(*per_detector)
+        prefilter = time.perf_counter() - t0
+        for detector, _ in plans:
+            seconds[detector.name] += prefilter / len(plans)
+
+        counted = 0
+        for ls in sorted(union):
+            lineno += chunk.count(b"\n", counted, ls)
+            counted = ls
+            le = chunk.find(b"\n", ls)
+            if le == -1:
+                le = len(chunk)
+            line = chunk[ls:le - 1] if le > ls and chunk[le - 1] == 13 else chunk[ls:le]
+            abs_ls, abs_le = base + ls, base + le
+            if tokens is not None:
+                tokens.advance(abs_ls, abs_le)
+            comment: Optional[bool] = None
+            text: Optional[str] = None
+
+            for d, (detector, compiled) in enumerate(plans):
+                if ls not in per_detector[d]:
+                    continue
+                per_rule = candidates[d]
+                t0 = time.perf_counter()
+                if detector.skip_comments:
+                    if comment is None:
+                        comment = tokens.is_comment(abs_ls, abs_le, line)
+                    if comment:
+                        seconds[detector.name] += time.perf_counter() - t0
+                        continue
+                for (rule, rx, exclude, requires, _), cand in zip(compiled, per_rule):
+                    if ls not in cand:
+                        continue
+                    m = rx.search(line)
+                    if detector.code_only:
+                        while m and not tokens.in_code(abs_ls + m.start()):
+                            m = rx.search(line, m.end())
+                    if not m:
+                        continue
+                    if exclude is not None and exclude.search(line):
+                        continue
+                    if requires is not None and not requires.search(line):
+                        continue
+                    if text is None:
+                        text = line.decode("utf-8", "replace")
+                    key = content_key(rule.id, text)
+                    if suppress is None or not suppress.hides(key):
+                        findings[d].append(Finding(
+                            detector=detector.name, severity=rule.severity, confidence=rule.confidence,
+                            message=rule.message,
+                            line=lineno, evidence=detector.evidence(text),
+                            recommendation=rule.recommendation,
+                            rule_id=rule.id, fingerprint=to_hex(key),
+                        ))
+                    if detector.first_match:
+                        break
+                seconds[detector.name] += time.perf_counter() - t0
+        lineno += chunk.count(b"\n", counted)
+
+    result: List[Finding] = []
+    for (detector, _), found in zip(plans, findings):
+        counts[detector.name] = counts.get(detector.name, 0) + len(found)
+        result.extend(found)
+    return result
+
+
+def classify_buffer(filename: Optional[str], buf: Buffer) -> str:
+    """classify() for a buffer: only the head the content sniff looks at is decoded."""
+    return classify(filename, bytes(buf[:SNIFF_BYTES]).decode("utf-8", "replace"))
@@ -7,15 +7,18 @@ a senior security engineer who already knows what was found in the code.
 """
 
 import os
+import time
 import httpx
 from typing import List
 
 from .findings import Finding, ChatMessage
+from . import metrics
 
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 CLAUDE_MODEL      = "claude-opus-4-5"
-ANTHROPIC_URL     = "https://api.anthropic.com/v1/messages"
+# Point at a stand-in (benchmarks/fake_anthropic.py) for load tests
+ANTHROPIC_URL     = os.getenv("ANTHROPIC_URL", "https://api.anthropic.com/v1/messages")
 
 
 def _build_system_prompt(findings: List[Finding], scanned_code: str) -> str:
@@ -100,8 +103,14 @@ async def chat_with_claude(
         "content-type":      "application/json",
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(ANTHROPIC_URL, json=payload, headers=headers)
+    status = "error"
+    t0 = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            response = await client.post(ANTHROPIC_URL, json=payload, headers=headers)
+        status = str(response.status_code)
+    finally:
+        metrics.CLAUDE_LATENCY.observe(time.perf_counter() - t0, status=status)
 
     if response.status_code != 200:
         raise RuntimeError(
@@ -110,6 +119,12 @@ async def chat_with_claude(
 
     data = response.json()
 
+    usage = data.get("usage") or {}
+    for direction in ("input", "output"):
+        tokens = usage.get(f"{direction}_tokens")
+        if isinstance(tokens, int):
+            metrics.CLAUDE_TOKENS.inc(tokens, direction=direction)
+
     try:
         return data["content"][0]["text"]
     except (KeyError, IndexError) as e:
@@ -0,0 +1,382 @@
+"""
+Command-line scanner for pre-commit hooks and CI; no web app involved.
+
+    python -m backend.app.ai_devsec.cli [PATH ...] [--format text|json|sarif] [--fail-above SCORE]
+
+PATHs are files or directories (default "."). Directories are walked with
+.gitignore and .devsecignore files honoured (gitignore syntax; deeper files
+win, and those above PATH up to the repository root apply too) and .git
+skipped; files named explicitly are always scanned, which is what
+pre-commit passes. Files are memory-mapped: the binary sniff (a NUL
+byte in the first 8 KB) touches only the first pages, and the mapping is
+scanned as bytes (bytescan.py), so only lines with findings are decoded.
+Empty, blank and binary files, and files above --max-file-mb, are skipped.
+
+Files are scanned with the same engine as /scan, across --jobs worker
+processes; small runs stay in-process, since a pool costs more to start
+than a handful of files take to scan. With --workers (or --local-workers)
+they are sent to cluster workers instead (cluster.py). Exit status is 1 when the combined
+risk score is above --fail-above (default 0: any finding fails), 0
+otherwise, 2 on usage errors and failed cluster scans. --baseline hides accepted findings by
+fingerprint, e.g. a --format json report saved when adopting the tool.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .baseline import Baseline, BaselineError
+from .findings import Finding, ScanResponse
+from .service import run_bytes_scan, scan_response
+
+
+MB = 1024 * 1024
+
+IGNORE_FILES = (".gitignore", ".devsecignore")
+
+SNIFF_BYTES = 8000
+
+_NON_BLANK = re.compile(rb"\S")
+
+# Files per task sent to a worker process, and below how many files not to start a pool
+CHUNK_FILES = 32
+POOL_MIN_FILES = 64
+
+SARIF_LEVELS = {"CRITICAL": "error", "HIGH": "error", "MEDIUM": "warning", "LOW": "note"}
+
+FORMATS = ("text", "json", "sarif")
+
+
+# 1. Ignore files
+
+def _translate(pattern: str) -> str:
+    """One gitignore glob as a regex over '/'-separated paths."""
+    out, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            j = pattern.index("]", i + 2)
+            body = pattern[i + 1:j]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = j + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """The patterns of one ignore file, relative to the directory it sits in."""
+
+    def __init__(self, lines: List[str]):
+        self.patterns: List[Tuple["re.Pattern", bool, bool]] = []   # (regex, negated, dirs only)
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            rx = _translate(line.lstrip("/"))
+            self.patterns.append((re.compile(("^" if anchored else "^(?:.*/)?") + rx + "$"), negated, dir_only))
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IgnoreRules"]:
+        lines: List[str] = []
+        for name in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as fh:
+                    lines.extend(fh)
+            except OSError:
+                continue
+        rules = cls(lines)
+        return rules if rules.patterns else None
+
+    def match(self, rel: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included by a '!' pattern, None if no pattern matches."""
+        result = None
+        for rx, negated, dir_only in self.patterns:
+            if (is_dir or not dir_only) and rx.match(rel):
+                result = not negated
+        return result
+
+
+def _ignored(path: str, is_dir: bool, stack: List[Tuple[str, IgnoreRules]]) -> bool:
+    ignored = False
+    for base, rules in stack:
+        verdict = rules.match(os.path.relpath(path, base).replace(os.sep, "/"), is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+def _enclosing_rules(directory: str) -> List[Tuple[str, IgnoreRules]]:
+    """Ignore files of the directories above `directory`, up to the enclosing git repository's root."""
+    chain = []
+    current = os.path.abspath(directory)
+    while True:
+        parent = os.path.dirname(current)
+        if os.path.exists(os.path.join(current, ".git")) or parent == current:
+            break
+        current = parent
+        chain.append(current)
+    if not os.path.exists(os.path.join(current, ".git")):
+        return []           # not inside a repository: only ignore files below `directory` apply
+    stack = []
+    for ancestor in reversed(chain):
+        rules = IgnoreRules.load(ancestor)
+        if rules is not None:
+            stack.append((os.path.relpath(ancestor), rules))
+    return stack
+
+
+def walk(paths: List[str], use_ignore_files: bool = True) -> Iterator[str]:
+    """Files under `paths`, in a stable order. Explicitly named files are never ignored."""
+    def visit(directory: str, stack: List[Tuple[str, IgnoreRules]]) -> Iterator[str]:
+        if use_ignore_files:
+            rules = IgnoreRules.load(directory)
+            if rules is not None:
+                stack = stack + [(directory, rules)]
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                if entry.name != ".git" and not _ignored(entry.path, True, stack):
+                    yield from visit(entry.path, stack)
+            elif entry.is_file() and not _ignored(entry.path, False, stack):
+                yield os.path.normpath(entry.path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            yield from visit(path, _enclosing_rules(path) if use_ignore_files else [])
+        elif os.path.isfile(path):
+            yield os.path.normpath(path)
+
+
+# 2. Reading and scanning
+
+def scan_file(path: str, max_bytes: int) -> Optional[List[Finding]]:
+    """The file's findings, or None if it is empty, blank, too large, binary or unreadable."""
+    try:
+        with open(path, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0 or size > max_bytes:
+                return None
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(b"\0", 0, min(size, SNIFF_BYTES)) != -1 or not _NON_BLANK.search(mm):
+                    return None
+                return run_bytes_scan(mm, path).findings
+    except (OSError, ValueError):
+        return None
+
+
+def read_text(path: str, max_bytes: int) -> Optional[str]:
+    """The file decoded as UTF-8 (invalid bytes replaced), or None where scan_file would skip it."""
+    try:
+        with open(path, "rb") as fh:
+            data = fh.read(max_bytes + 1)
+    except OSError:
+        return None
+    if not data or len(data) > max_bytes or b"\0" in data[:SNIFF_BYTES] or not _NON_BLANK.search(data):
+        return None
+    return data.decode("utf-8", "replace")
+
+
+def scan_files(paths: List[str], max_bytes: int) -> Tuple[List[dict], int]:
+    """Scan each file on its own. Returns finding dicts and how many files were skipped."""
+    found: List[dict] = []
+    skipped = 0
+    for path in paths:
+        findings = scan_file(path, max_bytes)
+        if findings is None:
+            skipped += 1
+            continue
+        found.extend(f.model_dump() for f in findings)
+    return found, skipped
+
+
+def _apply_baseline(resp: ScanResponse, baseline: Optional[Baseline]) -> ScanResponse:
+    if baseline is None:
+        return resp
+    kept = [f for f in resp.findings if int(f.fingerprint, 16) not in baseline.keys]
+    filtered = scan_response(kept)
+    filtered.suppressed = len(resp.findings) - len(kept)
+    return filtered
+
+
+def scan_paths(paths: List[str], jobs: Optional[int] = None, max_bytes: int = 2 * MB,
+               use_ignore_files: bool = True, baseline: Optional[Baseline] = None,
+               workers: Optional[List[str]] = None, token: str = "") -> Tuple[ScanResponse, int, int]:
+    """
+    Scan everything under `paths`. Returns the combined response, files
+    scanned and skipped. Findings in `baseline` are left out and counted in
+    the response's `suppressed`. With `workers` (cluster worker URLs) the
+    files are read here and scanned there; see cluster.py.
+    """
+    files = list(walk(paths, use_ignore_files))
+    if workers:
+        from .cluster import Coordinator
+
+        entries = []
+        for path in files:
+            text = read_text(path, max_bytes)
+            if text is not None:
+                entries.append((path, text))
+        resp = Coordinator(workers, token).scan(entries)
+        return _apply_baseline(resp, baseline), len(entries), len(files) - len(entries)
+
+    chunks = [files[i:i + CHUNK_FILES] for i in range(0, len(files), CHUNK_FILES)]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(files) >= POOL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as pool:
+            results = list(pool.map(scan_files, chunks, [max_bytes] * len(chunks)))
+    else:
+        results = [scan_files(chunk, max_bytes) for chunk in chunks]
+
+    findings = [Finding(**f) for found, _ in results for f in found]
+    skipped = sum(s for _, s in results)
+    return _apply_baseline(scan_response(findings), baseline), len(files) - skipped, skipped
+
+
+def load_baseline(path: str) -> Baseline:
+    """
+    A baseline file: a JSON list of fingerprints, or a report with "findings"
+    (such as this tool's --format json output) whose fingerprints are accepted.
+    """
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    if isinstance(data, dict):
+        data = data.get("fingerprints") or [f.get("fingerprint") for f in data.get("findings", [])]
+    if not isinstance(data, list):
+        raise BaselineError("expected a list of fingerprints or a report with findings")
+    return Baseline.parse(os.path.basename(path), [fp for fp in data if isinstance(fp, str)])
+
+
+# 3. Output
+
+def to_sarif(resp: ScanResponse) -> dict:
+    rules: Dict[str, dict] = {}
+    results = []
+    for f in resp.findings:
+        rules.setdefault(f.detector, {
+            "id": f.detector,
+            "shortDescription": {"text": f.detector.replace("_", " ")},
+            "help": {"text": f.recommendation or ""},
+        })
+        result = {
+            "ruleId": f.detector,
+            "level": SARIF_LEVELS[f.severity],
+            "message": {"text": f.message},
+            "properties": {"severity": f.severity, "confidence": f.confidence, "rule": f.rule_id},
+        }
+        if f.fingerprint:
+            result["partialFingerprints"] = {"devsecFingerprint/v1": f.fingerprint}
+        if f.file:
+            location: dict = {"artifactLocation": {"uri": f.file.replace(os.sep, "/")}}
+            if f.line:
+                location["region"] = {"startLine": f.line}
+            result["locations"] = [{"physicalLocation": location}]
+        results.append(result)
+    return {
+        "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+        "version": "2.1.0",
+        "runs": [{
+            "tool": {"driver": {"name": "ai-devsec", "rules": list(rules.values())}},
+            "results": results,
+        }],
+    }
+
+
+def render(resp: ScanResponse, fmt: str, scanned: int, skipped: int) -> str:
+    if fmt == "sarif":
+        return json.dumps(to_sarif(resp), indent=2)
+    if fmt == "json":
+        body = resp.model_dump(exclude={"scan_id", "revision"})
+        body.update(files_scanned=scanned, files_skipped=skipped)
+        return json.dumps(body, indent=2)
+    lines = [
+        f"{f.file}:{f.line}: {f.severity} [{f.detector}] {f.message}"
+        + (f"\n    {f.evidence}" if f.evidence else "")
+        for f in resp.findings
+    ]
+    baselined = f", {resp.suppressed} baselined finding(s) hidden" if resp.suppressed else ""
+    lines.append(f"{scanned} file(s) scanned, {skipped} skipped{baselined}. {resp.summary}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scan files and directories for risky code patterns.")
+    parser.add_argument("paths", nargs="*", default=["."], help="Files or directories (default: .).")
+    parser.add_argument("--format", choices=FORMATS, default="text")
+    parser.add_argument("--output", "-o", help="Write the report here instead of stdout.")
+    parser.add_argument("--fail-above", type=int, default=0, metavar="SCORE",
+                        help="Exit 1 if the risk score is above this (0-100, default 0).")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Worker processes (default: CPU count).")
+    parser.add_argument("--max-file-mb", type=float, default=2.0, help="Skip files larger than this.")
+    parser.add_argument("--no-ignore", action="store_true", help="Do not read .gitignore/.devsecignore.")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="Leave out accepted findings: a JSON list of fingerprints or an earlier --format json report.")
+    parser.add_argument("--workers", metavar="URLS",
+                        help="Scan on these cluster workers (comma-separated base URLs; token from CLUSTER_TOKEN).")
+    parser.add_argument("--local-workers", type=int, metavar="N",
+                        help="Start N cluster workers on this machine and scan on them.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        try:
+            baseline = load_baseline(args.baseline)
+        except (OSError, ValueError) as e:
+            parser.error(f"--baseline {args.baseline}: {e}")
+    options = dict(jobs=args.jobs, max_bytes=int(args.max_file_mb * MB), use_ignore_files=not args.no_ignore,
+                   baseline=baseline)
+    try:
+        if args.local_workers:
+            from .cluster import local_workers
+
+            with local_workers(args.local_workers) as (urls, token):
+                resp, scanned, skipped = scan_paths(args.paths, workers=urls, token=token, **options)
+        else:
+            workers = [url for url in (args.workers or "").split(",") if url.strip()]
+            resp, scanned, skipped = scan_paths(args.paths, workers=workers, token=os.getenv("CLUSTER_TOKEN", ""),
+                                                **options)
+    except RuntimeError as e:   # cluster.ClusterError, or a local worker that would not start
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    report = render(resp, args.format, scanned, skipped)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(report + "\n")
+    else:
+        print(report)
+    return 1 if resp.risk_score > args.fail_above else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Distributed scans: one coordinator, many worker instances of this app.
+
+The coordinator splits the files of a repository or archive into shards,
+sends each to a worker's /internal/scan-shard endpoint over HTTP and merges
+the results into one ScanResponse. Files are never split, so each finding
+comes back already attributed to its file and line by the worker's
+run_scan, exactly as a local scan would attribute it; the merged findings
+are in input-file order, whichever worker scanned them.
+
+Sharding: files go largest first into whichever shard is smallest so far
+(longest-processing-time first), with enough shards that each holds about
+CLUSTER_SHARD_MB and every worker slot has work. A file larger than that
+is a shard of its own.
+
+Failures: a shard that fails with a 5xx, a timeout or a dropped connection
+is put back on the queue for any worker, up to CLUSTER_SHARD_ATTEMPTS
+times; the failing worker backs off before taking more work, and after
+CLUSTER_WORKER_FAILURES consecutive failures it is dropped for the rest of
+the scan. A 4xx (a wrong CLUSTER_TOKEN, say) fails the scan at once.
+
+Workers need CLUSTER_TOKEN set (it is sent as X-Cluster-Token); the
+coordinator finds them in CLUSTER_WORKERS, a comma-separated list of base
+URLs, or starts them on this machine (`local_workers`, and the CLI's
+--local-workers) for testing and single-host runs.
+"""
+
+import asyncio
+import heapq
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from .findings import Finding, ScanResponse
+from .service import scan_response
+from . import metrics
+
+
+MB = 1024 * 1024
+
+SHARD_BYTES = int(float(os.getenv("CLUSTER_SHARD_MB", "4")) * MB)
+SHARD_ATTEMPTS = int(os.getenv("CLUSTER_SHARD_ATTEMPTS", "3"))
+WORKER_FAILURES = int(os.getenv("CLUSTER_WORKER_FAILURES", "3"))
+TIMEOUT_S = float(os.getenv("CLUSTER_TIMEOUT_S", "120"))
+
+SHARD_PATH = "/api/ai-devsec/internal/scan-shard"
+TOKEN_HEADER = "X-Cluster-Token"
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# (filename, code)
+FileEntry = Tuple[str, str]
+
+
+class ClusterError(RuntimeError):
+    pass
+
+
+def configured_workers() -> List[str]:
+    return [url.strip().rstrip("/") for url in os.getenv("CLUSTER_WORKERS", "").split(",") if url.strip()]
+
+
+# 1. Sharding
+
+def shard(files: Sequence[FileEntry], slots: int, shard_bytes: int = SHARD_BYTES) -> List[List[int]]:
+    """Partition file indexes into balanced shards of about `shard_bytes`, at least `slots` of them."""
+    total = sum(len(code) for _, code in files)
+    count = max(1, min(len(files), max(slots, -(-total // max(1, shard_bytes)))))
+    heap = [(0, k) for k in range(count)]
+    shards: List[List[int]] = [[] for _ in range(count)]
+    for i in sorted(range(len(files)), key=lambda i: len(files[i][1]), reverse=True):
+        size, k = heapq.heappop(heap)
+        shards[k].append(i)
+        heapq.heappush(heap, (size + len(files[i][1]), k))
+    return [sorted(s) for s in shards if s]
+
+
+# 2. Dispatch
+
+class _Retry(Exception):
+    pass
+
+
+class Coordinator:
+    def __init__(self, workers: Sequence[str], token: str, slots_per_worker: int = 2,
+                 shard_bytes: int = SHARD_BYTES, attempts: int = SHARD_ATTEMPTS,
+                 worker_failures: int = WORKER_FAILURES, timeout: float = TIMEOUT_S, backoff_s: float = 0.5):
+        if not workers:
+            raise ClusterError("no workers configured (CLUSTER_WORKERS)")
+        self.workers = [w.rstrip("/") for w in workers]
+        self.token = token
+        self.slots_per_worker = max(1, slots_per_worker)
+        self.shard_bytes = shard_bytes
+        self.attempts = attempts
+        self.worker_failures = worker_failures
+        self.timeout = timeout
+        self.backoff_s = backoff_s
+
+    @classmethod
+    def from_env(cls) -> "Coordinator":
+        return cls(configured_workers(), os.getenv("CLUSTER_TOKEN", ""))
+
+    def scan(self, files: Sequence[FileEntry]) -> ScanResponse:
+        return asyncio.run(self.scan_async(files))
+
+    async def scan_async(self, files: Sequence[FileEntry]) -> ScanResponse:
+        """Scan `files` across the workers; findings are merged in input-file order."""
+        per_file = await self._dispatch(files)
+        return scan_response([f for found in per_file for f in found])
+
+    async def _send(self, client: httpx.AsyncClient, worker: str, files: Sequence[FileEntry],
+                    indexes: List[int]) -> List[List[Finding]]:
+        body = {"files": [{"filename": files[i][0], "code": files[i][1]} for i in indexes]}
+        try:
+            resp = await client.post(worker + SHARD_PATH, json=body)
+        except httpx.HTTPError as e:
+            raise _Retry(f"{worker}: {type(e).__name__}: {e}")
+        if resp.status_code >= 500:
+            raise _Retry(f"{worker}: HTTP {resp.status_code}")
+        if resp.status_code != 200:
+            raise ClusterError(f"{worker} refused a shard: HTTP {resp.status_code} {resp.text[:200]}")
+        try:
+            found = resp.json()["findings"]
+            if len(found) != len(indexes):
+                raise ValueError(f"{len(found)} results for {len(indexes)} files")
+            return [[Finding(**f) for f in file_findings] for file_findings in found]
+        except (ValueError, KeyError, TypeError) as e:
+            raise _Retry(f"{worker}: malformed response: {e}")
+
+    async def _dispatch(self, files: Sequence[FileEntry]) -> List[List[Finding]]:
+        results: List[Optional[List[Finding]]] = [None] * len(files)
+        if not files:
+            return []
+        shards = shard(files, len(self.workers) * self.slots_per_worker, self.shard_bytes)
+        queue: "asyncio.Queue[Tuple[List[int], int]]" = asyncio.Queue()
+        for indexes in shards:
+            queue.put_nowait((indexes, 0))
+        state = {"remaining": len(shards), "slots": len(self.workers) * self.slots_per_worker}
+        failures: Dict[str, int] = dict.fromkeys(self.workers, 0)
+        errors: List[str] = []
+        finished = asyncio.Event()
+
+        async def slot(client: httpx.AsyncClient, worker: str) -> None:
+            try:
+                while failures[worker] < self.worker_failures:
+                    indexes, attempt = await queue.get()
+                    try:
+                        found = await self._send(client, worker, files, indexes)
+                    except _Retry as e:
+                        failures[worker] += 1
+                        if attempt + 1 >= self.attempts:
+                            errors.append(f"shard of {len(indexes)} file(s) failed {attempt + 1} times; last: {e}")
+                            metrics.CLUSTER_SHARDS.inc(event="failed")
+                            finished.set()
+                            return
+                        metrics.CLUSTER_SHARDS.inc(event="retried")
+                        queue.put_nowait((indexes, attempt + 1))
+                        await asyncio.sleep(self.backoff_s * failures[worker])
+                        continue
+                    except ClusterError as e:
+                        errors.append(str(e))
+                        finished.set()
+                        return
+                    failures[worker] = 0
+                    for i, file_findings in zip(indexes, found):
+                        results[i] = file_findings
+                    metrics.CLUSTER_SHARDS.inc(event="done")
+                    state["remaining"] -= 1
+                    if not state["remaining"]:
+                        finished.set()
+            finally:
+                state["slots"] -= 1
+                if not state["slots"]:
+                    finished.set()
+
+        limits = httpx.Limits(max_connections=len(self.workers) * self.slots_per_worker)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits,
+                                     headers={TOKEN_HEADER: self.token}) as client:
+            tasks = [asyncio.create_task(slot(client, worker))
+                     for worker in self.workers for _ in range(self.slots_per_worker)]
+            await finished.wait()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if errors:
+            raise ClusterError(errors[0])
+        if state["remaining"]:
+            raise ClusterError(f"every worker failed {self.worker_failures} times in a row; "
+                               f"{state['remaining']} shard(s) were not scanned")
+        return results
+
+
+# 3. Workers on this machine
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: List[str], health_url: str, env: Optional[Dict[str, str]] = None,
+                 timeout: float = 30.0) -> subprocess.Popen:
+    """Run `python <args>` from the repository root and wait until `health_url` answers 200."""
+    proc = subprocess.Popen([sys.executable, *args], cwd=_REPO_ROOT, env={**os.environ, **(env or {})})
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(args)} exited with status {proc.returncode}")
+        try:
+            if httpx.get(health_url, timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    stop_server(proc)
+    raise RuntimeError(f"{' '.join(args)} did not become ready within {timeout:.0f}s")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def start_worker(token: str, port: Optional[int] = None) -> Tuple[str, subprocess.Popen]:
+    port = port or free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc = start_server(["-m", "uvicorn", "backend.app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                         "--log-level", "warning"], f"{url}/healthz", {"CLUSTER_TOKEN": token})
+    return url, proc
+
+
+@contextmanager
+def local_workers(count: int) -> Iterator[Tuple[List[str], str]]:
+    """Start `count` worker instances on this machine; yields (their URLs, the token they accept)."""
+    token = secrets.token_urlsafe(16)
+    procs: List[subprocess.Popen] = []
+    try:
+        urls = []
+        for _ in range(count):
+            url, proc = start_worker(token)
+            urls.append(url)
+            procs.append(proc)
+        yield urls, token
+    finally:
+        for proc in procs:
+            stop_server(proc)
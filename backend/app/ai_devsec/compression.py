@@ -0,0 +1,188 @@
+"""
+Compressed request bodies (Content-Encoding: gzip or zstd).
+
+DecompressMiddleware decodes an encoded body as its chunks arrive and hands
+the app the plain body, so /scan, /scan-diff and every other endpoint accept
+compressed uploads without changes. Decoded output is capped at
+REQUEST_MAX_DECOMPRESSED_MB: a gzip member is inflated at most one byte past
+the remaining budget per call, so a small zip bomb costs the limit, never
+its expanded size. Over the limit is 413; a corrupt or truncated body is
+400; an unknown encoding (or zstd without the zstandard package) is 415.
+
+zstd bodies are buffered compressed (also capped at the limit) and then
+decoded in bounded reads, because zstandard's incremental decoder has no
+output bound. zstandard is optional and only imported for zstd bodies.
+"""
+
+import io
+import json
+import os
+import zlib
+from typing import List, Optional
+
+
+MAX_BYTES = int(float(os.getenv("REQUEST_MAX_DECOMPRESSED_MB", "64")) * 1024 * 1024)
+
+READ_BYTES = 64 * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BadBody(Exception):
+    pass
+
+
+# 1. Decoders
+
+class GzipDecoder:
+    """Incremental gzip (including multi-member) with a bounded output."""
+
+    def __init__(self):
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._pending = False
+
+    def decode(self, data: bytes, budget: int) -> bytes:
+        parts: List[bytes] = []
+        try:
+            while data:
+                self._pending = True
+                part = self._d.decompress(data, budget + 1)
+                budget -= len(part)
+                if budget < 0:
+                    raise BodyTooLarge()
+                parts.append(part)
+                data = b""
+                if self._d.eof:
+                    data = self._d.unused_data
+                    self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    self._pending = False
+        except zlib.error as e:
+            raise BadBody(f"Invalid gzip body: {e}")
+        return b"".join(parts)
+
+    def finish(self, budget: int) -> bytes:
+        if self._pending:
+            raise BadBody("Truncated gzip body.")
+        return b""
+
+
+class ZstdDecoder:
+    """Buffers the compressed body, then decodes it in bounded reads."""
+
+    def __init__(self, zstandard):
+        self._zstd = zstandard
+        self._buf = bytearray()
+
+    def decode(self, data: bytes, budget: int) -> bytes:
+        if len(self._buf) + len(data) > budget:
+            raise BodyTooLarge()
+        self._buf += data
+        return b""
+
+    def finish(self, budget: int) -> bytes:
+        data = bytes(self._buf)
+        parts: List[bytes] = []
+        size = 0
+        try:
+            # a declared size over the budget is refused before decoding anything
+            declared = self._zstd.get_frame_parameters(data).content_size
+            if declared != self._zstd.CONTENTSIZE_UNKNOWN and declared > budget:
+                raise BodyTooLarge()
+            reader = self._zstd.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True)
+            while True:
+                part = reader.read(min(READ_BYTES, budget - size + 1))
+                if not part:
+                    break
+                size += len(part)
+                if size > budget:
+                    raise BodyTooLarge()
+                parts.append(part)
+        except self._zstd.ZstdError as e:
+            raise BadBody(f"Invalid zstd body: {e}")
+        # the reader stops quietly at a truncated frame
+        if not size or (declared != self._zstd.CONTENTSIZE_UNKNOWN and size < declared):
+            raise BadBody("Truncated zstd body.")
+        return b"".join(parts)
+
+
+def decoder_for(encoding: str):
+    """A decoder for a Content-Encoding value, or None if it is not supported."""
+    if encoding == "gzip":
+        return GzipDecoder()
+    if encoding == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            return None
+        return ZstdDecoder(zstandard)
+    return None
+
+
+# 2. Middleware
+
+class DecompressMiddleware:
+    """ASGI middleware: decode gzip/zstd request bodies before the app sees them."""
+
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self._max_bytes = max_bytes
+
+    @property
+    def max_bytes(self) -> int:
+        return MAX_BYTES if self._max_bytes is None else self._max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = scope["headers"]
+        encoding = next((v.decode("latin-1").strip().lower() for k, v in headers if k == b"content-encoding"), None)
+        if not encoding or encoding == "identity":
+            return await self.app(scope, receive, send)
+
+        decoder = decoder_for(encoding)
+        if decoder is None:
+            return await _reject(send, 415, f"Unsupported Content-Encoding {encoding!r} (use gzip or zstd).")
+        try:
+            body = await self._read(receive, decoder)
+        except BodyTooLarge:
+            return await _reject(send, 413, f"Decompressed body exceeds REQUEST_MAX_DECOMPRESSED_MB "
+                                            f"({self.max_bytes // (1024 * 1024)} MB).")
+        except BadBody as e:
+            return await _reject(send, 400, str(e))
+
+        scope = dict(scope)
+        scope["headers"] = [(k, v) for k, v in headers if k not in (b"content-encoding", b"content-length")]
+        scope["headers"].append((b"content-length", str(len(body)).encode()))
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+    async def _read(self, receive, decoder) -> bytes:
+        parts: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise BadBody("Client disconnected.")
+            part = decoder.decode(message.get("body", b""), self.max_bytes - size)
+            size += len(part)
+            parts.append(part)
+            if not message.get("more_body", False):
+                parts.append(decoder.finish(self.max_bytes - size))
+                return b"".join(parts)
+
+
+async def _reject(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,402 @@
+"""
+Per-scan preprocessing shared by every detector.
+
+A ScanContext is built once per input. It splits the text into lines,
+keeps their start offsets, and — on first use — runs one regex tokenizer
+over the whole input to find comments and string literals for the file's
+language. Detectors then ask cheap questions ("is line 12 only a comment?",
+"is this hit inside a string?") instead of each re-stripping every line.
+
+Block comments (/* */, <# #>) and Python docstrings count as comment lines.
+The tokenizers are deliberately approximate (no regex literals, no heredocs)
+but they never look inside a string for a comment opener or vice versa.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Pattern, Set, Tuple
+
+from .filetypes import (
+    PYTHON, JAVASCRIPT, SHELL, POWERSHELL, SQL, YAML, JSON, CONFIG,
+    DOCKERFILE, OTHER, PERL, RUBY, LUA, UNKNOWN,
+)
+
+
+# Tokenizer building blocks. Each tokenizer is one alternation with two
+# named groups: `c` for comments and `s` for string literals. Every opener
+# always matches (an escape may be a backslash-newline or a lone backslash
+# at the end), so no token is silently skipped; retokenize relies on that.
+# The one exception, _SQ_CLOSED, never spans a line break, so a retokenize
+# from the start of the edited line still sees it as a full scan would.
+#
+# Line comments and single-line strings end at any character str.splitlines
+# breaks on, not only "\n": `lines` come from splitlines, and a comment that
+# ran past a lone "\r" would hide every later line of a CR-only file.
+
+_UNICODE_BREAKS = r"\x85\u2028\u2029"     # left out of the bytes tokenizers
+_BREAKS   = r"\n\r\x0b\x0c\x1c-\x1e" + _UNICODE_BREAKS
+_EOL      = r"(?=[" + _BREAKS + r"]|\Z)"
+
+_DQ       = r'"(?:[^"\\' + _BREAKS + r']|\\[\s\S]?)*(?:"|' + _EOL + ")"
+_SQ       = r"'(?:[^'\\" + _BREAKS + r"]|\\[\s\S]?)*(?:'|" + _EOL + ")"
+_SQL_SQ   = r"'(?:[^'" + _BREAKS + r"]|'')*(?:'|" + _EOL + ")"
+# only a quote closed on the same line: in prose an apostrophe opens nothing
+_SQ_CLOSED = r"'(?:[^'\\" + _BREAKS + r"]|\\[^" + _BREAKS + r"])*'"
+_BACKTICK = r"`(?:[^`\\]|\\[\s\S]?)*(?:`|\Z)"
+_TRIPLE   = r'[rRbBuUfF]{0,2}(?:"""[\s\S]*?(?:"""|\Z)|\'\'\'[\s\S]*?(?:\'\'\'|\Z))'
+_PY_STR   = r"[rRbBuUfF]{0,2}(?:" + _DQ + "|" + _SQ + ")"
+_REST     = r"[^" + _BREAKS + r"]*"
+_HASH     = r"(?<![^\s])#" + _REST      # '#' at line start or after whitespace
+_SLASHES  = r"//" + _REST
+_BLOCK    = r"/\*[\s\S]*?(?:\*/|\Z)"
+_DASHES   = r"--" + _REST
+_LUA_BLOCK = r"--\[\[[\s\S]*?(?:\]\]|\Z)"
+_PS_BLOCK = r"<#[\s\S]*?(?:#>|\Z)"
+
+
+def _tokenizer(comments: List[str], strings: List[str]) -> Optional[Pattern]:
+    if not comments and not strings:
+        return None
+    parts = []
+    if strings:
+        parts.append("(?P<s>" + "|".join(strings) + ")")
+    if comments:
+        parts.append("(?P<c>" + "|".join(comments) + ")")
+    return re.compile("|".join(parts), re.MULTILINE)
+
+
+_C_LIKE = _tokenizer([_SLASHES, _BLOCK], [_BACKTICK, _DQ, _SQ])
+_HASHY  = _tokenizer([_HASH], [_DQ, _SQ])
+
+_TOKENIZERS: Dict[str, Optional[Pattern]] = {
+    PYTHON:     _tokenizer(["#" + _REST], [_TRIPLE, _PY_STR]),
+    JAVASCRIPT: _C_LIKE,
+    OTHER:      _C_LIKE,
+    # "//" is an operator here (defined-or in Perl, floor division in Lua)
+    PERL:       _HASHY,
+    RUBY:       _HASHY,
+    LUA:        _tokenizer([_LUA_BLOCK, _DASHES], [_DQ, _SQ]),
+    SHELL:      _HASHY,
+    YAML:       _HASHY,
+    CONFIG:     _tokenizer([_HASH, r"(?<![^\s]);" + _REST], [_DQ, _SQ]),
+    DOCKERFILE: _HASHY,
+    POWERSHELL: _tokenizer([_PS_BLOCK, _HASH], [_DQ, _SQ]),
+    SQL:        _tokenizer([_DASHES, _BLOCK], [_SQL_SQ, _DQ]),
+    JSON:       _tokenizer([], [_DQ]),
+    # Pasted snippets without a filename: '#' comments and the common string
+    # styles. No // or /* */ — in shell `cp build/* dst` and in Python `a // b`
+    # they are code, and a false comment would hide every finding after it.
+    # A "'" with no closing quote on its line is an apostrophe ("it's").
+    UNKNOWN:    _tokenizer([_HASH], [_TRIPLE, _DQ, _SQ_CLOSED]),
+}
+
+# Languages where a triple-quoted string standing alone is a docstring
+_DOCSTRING_TYPES = {PYTHON, UNKNOWN}
+
+# Line-prefix comments the tokenizer cannot see unambiguously mid-line
+_EXTRA_PREFIXES: Dict[str, Tuple[str, ...]] = {UNKNOWN: ("--", "//")}
+
+# Characters that re.IGNORECASE equates with an ASCII letter but str.lower()
+# leaves alone (dotless i, long s); their presence disables the lowercase copy.
+_FOLD_UNSAFE = ("\u0131", "\u017f")
+
+# Past this fraction of lines an anchor set is not worth tracking per line
+_ANCHOR_DENSE = 0.5
+
+
+class ScanContext:
+    """Everything about one scan input that detectors would otherwise recompute."""
+
+    __slots__ = ("code", "file_type", "lines", "window", "_offsets", "_stripped",
+                 "_comment_lines", "_span_starts", "_span_ends", "_span_kinds",
+                 "_lower", "_anchor_hits")
+
+    def __init__(self, code: str, file_type: str = UNKNOWN):
+        self.code = code
+        self.file_type = file_type
+        self.lines: List[str] = code.splitlines()
+        # 0-based [first, last) line range detectors visit; the whole input by default
+        self.window: Tuple[int, int] = (0, len(self.lines))
+        self._offsets: Optional[List[int]] = None
+        self._stripped: Optional[List[str]] = None
+        self._comment_lines: Optional[List[bool]] = None
+        self._span_starts: List[int] = []
+        self._span_ends: List[int] = []
+        self._span_kinds: List[str] = []
+        self._lower: Optional[Tuple[str, int]] = None
+        self._anchor_hits: Dict[Tuple[Tuple[str, ...], bool], Optional[Set[int]]] = {}
+
+    # Line table
+
+    @property
+    def offsets(self) -> List[int]:
+        """Start offset of each line in `code` (same line splitting as str.splitlines)."""
+        if self._offsets is None:
+            self._offsets = [0] + list(accumulate(map(len, self.code.splitlines(True))))[:-1]
+            if not self.lines:
+                self._offsets = []
+        return self._offsets
+
+    @property
+    def stripped(self) -> List[str]:
+        if self._stripped is None:
+            self._stripped = [line.strip() for line in self.lines]
+        return self._stripped
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number containing absolute `offset`."""
+        return bisect_right(self.offsets, offset)
+
+    def set_window(self, first: int, last: int) -> None:
+        """Restrict detectors to lines [first, last); drops anchor results for the old window."""
+        self.window = (first, last)
+        self.reset_prefilter()
+
+    def reset_prefilter(self) -> None:
+        """Forget the lowercase copy and cached anchor lookups, so the next scan redoes them."""
+        self._lower = None
+        self._anchor_hits = {}
+
+    def _char_range(self, first: int, last: int) -> Tuple[int, int]:
+        """Absolute [start, end) offsets covering lines [first, last)."""
+        offsets = self.offsets
+        start = offsets[first] if first < len(offsets) else len(self.code)
+        end = offsets[last] if last < len(offsets) else len(self.code)
+        return start, end
+
+    # Literal prefilter
+
+    def _lowered(self) -> Optional[Tuple[str, int]]:
+        """
+        Lowercase copy of the window's text and its start offset, or None when
+        lowercasing would shift offsets or miss an IGNORECASE match.
+        """
+        if self._lower is None:
+            start, end = self._char_range(*self.window)
+            text = self.code[start:end]
+            lower = text.lower()
+            if not text.isascii() and (
+                len(lower) != len(text) or any(ch in text for ch in _FOLD_UNSAFE)
+            ):
+                self._lower = ("", -1)
+            else:
+                self._lower = (lower, start)
+        return None if self._lower[1] < 0 else self._lower
+
+    def lines_containing(self, literals: Tuple[str, ...], ignorecase: bool = False) -> Optional[Set[int]]:
+        """
+        0-based indexes of the window's lines containing any of `literals`
+        (which must be lowercase when `ignorecase`). One str.find pass over the
+        window per literal, cached per context. None means "assume every line":
+        the literals are too common to be worth it, or case folding is unsafe.
+        """
+        key = (literals, ignorecase)
+        if key in self._anchor_hits:
+            return self._anchor_hits[key]
+        start, end = self._char_range(*self.window)
+        if ignorecase:
+            lowered = self._lowered()
+            text, base = lowered if lowered is not None else (None, 0)
+        else:
+            text, base = self.code, 0
+        hits: Optional[Set[int]] = None
+        if text is not None:
+            hits = set()
+            offsets = self.offsets
+            n = len(offsets)
+            first, last = self.window
+            limit = max(int((last - first) * _ANCHOR_DENSE), 1)
+            find = text.find
+            lo, hi = start - base, end - base
+            for literal in literals:
+                pos = find(literal, lo, hi)
+                while pos != -1:
+                    i = bisect_right(offsets, pos + base) - 1
+                    hits.add(i)
+                    if i + 1 >= n:
+                        break
+                    pos = find(literal, offsets[i + 1] - base, hi)
+                if len(hits) > limit:
+                    hits = None
+                    break
+        self._anchor_hits[key] = hits
+        return hits
+
+    # Comment / string classification
+
+    @property
+    def comment_lines(self) -> List[bool]:
+        """comment_lines[i] is True when line i+1 holds nothing but comment (or docstring)."""
+        if self._comment_lines is None:
+            self._tokenize()
+        return self._comment_lines
+
+    def is_comment(self, lineno: int) -> bool:
+        return self.comment_lines[lineno - 1]
+
+    def in_comment(self, lineno: int, col: int) -> bool:
+        return self._span_kind_at(lineno, col) == "c"
+
+    def in_string(self, lineno: int, col: int) -> bool:
+        return self._span_kind_at(lineno, col) == "s"
+
+    def in_code(self, lineno: int, col: int) -> bool:
+        """True when the position is neither inside a comment nor a string literal."""
+        return self._span_kind_at(lineno, col) is None
+
+    def _span_kind_at(self, lineno: int, col: int) -> Optional[str]:
+        if self._comment_lines is None:
+            self._tokenize()
+        pos = self.offsets[lineno - 1] + col
+        i = bisect_right(self._span_starts, pos) - 1
+        if i >= 0 and pos < self._span_ends[i]:
+            return self._span_kinds[i]
+        return None
+
+    def _tokenizer(self) -> Optional[Pattern]:
+        return _TOKENIZERS.get(self.file_type, _TOKENIZERS[UNKNOWN])
+
+    def _tokens(self, tokenizer: Pattern, pos: int) -> Iterator[Tuple[int, int, str]]:
+        """(start, end, kind) for every token from `pos` on; docstrings come out as comments."""
+        code = self.code
+        offsets = self.offsets
+        docstrings = self.file_type in _DOCSTRING_TYPES
+        for m in tokenizer.finditer(code, pos):
+            start, end = m.span()
+            if start == end:
+                continue
+            kind = "c" if m.lastgroup == "c" else "s"
+            if kind == "s" and docstrings and _is_triple(code, start):
+                line_start = offsets[bisect_right(offsets, start) - 1]
+                if not code[line_start:start].strip():
+                    kind = "c"
+            yield start, end, kind
+
+    def _mark_comments(self, comment: List[bool], first_span: int, last_span: int) -> None:
+        """Apply spans [first_span, last_span) to the comment-line flags, in order."""
+        code = self.code
+        offsets = self.offsets
+        lines = self.lines
+        docstrings = self.file_type in _DOCSTRING_TYPES
+        for k in range(first_span, last_span):
+            if self._span_kinds[k] != "c":
+                continue
+            start, end = self._span_starts[k], self._span_ends[k]
+            first = bisect_right(offsets, start) - 1
+            last = bisect_right(offsets, end - 1) - 1
+            after_close = code[end:offsets[last] + len(lines[last])].strip()
+            # the opening line counts only if nothing but whitespace precedes the comment
+            if not code[offsets[first]:start].strip():
+                # a docstring line must also have nothing after the closing quotes
+                if not (docstrings and _is_triple(code, start)) or not after_close:
+                    comment[first] = True
+            for i in range(first + 1, last + 1):
+                comment[i] = True
+            if last > first and after_close:
+                comment[last] = False
+
+    def _mark_prefixes(self, comment: List[bool], first: int, last: int) -> None:
+        prefixes = _EXTRA_PREFIXES.get(self.file_type)
+        if prefixes:
+            lines = self.lines
+            for i in range(first, last):
+                if lines[i].strip().startswith(prefixes):
+                    comment[i] = True
+
+    def _tokenize(self) -> None:
+        n = len(self.lines)
+        comment = [False] * n
+        tokenizer = self._tokenizer()
+        if tokenizer is not None and n:
+            for start, end, kind in self._tokens(tokenizer, 0):
+                self._span_starts.append(start)
+                self._span_ends.append(end)
+                self._span_kinds.append(kind)
+            self._mark_comments(comment, 0, len(self._span_starts))
+        self._mark_prefixes(comment, 0, n)
+        self._comment_lines = comment
+
+    # Incremental re-tokenization
+
+    def retokenize(self, old: "ScanContext", edit_start: int, old_edit_end: int) -> Tuple[int, int]:
+        """
+        Tokenize this context, an edit of `old` (same file type) in which
+        old.code[edit_start:old_edit_end] was replaced, reusing old's tokens.
+
+        Tokenizing restarts at the start of the edit's first line and stops
+        as soon as a token past the edit lines up with an old one: the
+        tokenizer carries no state between matches, so everything after
+        that point is the old token stream shifted. Returns the 0-based [first, last) range of lines
+        whose text, comment flag or string/comment spans may differ from
+        `old` — the only lines that need rescanning.
+        """
+        code, n = self.code, len(self.lines)
+        delta = len(code) - len(old.code)
+        new_edit_end = old_edit_end + delta
+        tokenizer = self._tokenizer()
+        old.comment_lines  # make sure old is tokenized
+        offsets = self.offsets
+
+        # The first line whose text (and line prefix) is untouched by the edit
+        tail_line = bisect_right(offsets, new_edit_end) - 1 if new_edit_end < len(code) else n
+        if 0 <= tail_line < n and offsets[tail_line] != new_edit_end:
+            tail_line += 1
+        first_line = bisect_right(offsets, edit_start) - 1 if n else 0
+        first_line = max(first_line, 0)
+
+        if tokenizer is None or not n or not old.lines:
+            self._tokenize()
+            return (0, n) if not old.lines else (first_line, max(tail_line, first_line))
+
+        # Old spans ending before the edit's first line are kept; restart at that line's
+        # start (a lookbehind or string prefix there may now read differently) or at
+        # the first old span still open there, whichever is earlier
+        o_starts, o_ends, o_kinds = old._span_starts, old._span_ends, old._span_kinds
+        line_start = offsets[first_line]
+        keep = bisect_left(o_ends, line_start)
+        restart = min(line_start, o_starts[keep]) if keep < len(o_starts) else line_start
+        starts, ends, kinds = o_starts[:keep], o_ends[:keep], o_kinds[:keep]
+
+        resync = len(o_starts)
+        changed_end = 0          # furthest character a new or dropped token reaches
+        resync_from = offsets[tail_line] if tail_line < n else len(code)
+        for start, end, kind in self._tokens(tokenizer, restart):
+            if start >= resync_from:
+                j = bisect_right(o_starts, start - delta) - 1
+                if (j >= 0 and o_starts[j] == start - delta
+                        and o_ends[j] == end - delta and o_kinds[j] == kind):
+                    resync = j
+                    starts.extend(s + delta for s in o_starts[j:])
+                    ends.extend(e + delta for e in o_ends[j:])
+                    kinds.extend(o_kinds[j:])
+                    break
+            starts.append(start)
+            ends.append(end)
+            kinds.append(kind)
+            changed_end = end
+        if resync > keep:
+            changed_end = max(changed_end, o_ends[resync - 1] + delta)
+        self._span_starts, self._span_ends, self._span_kinds = starts, ends, kinds
+
+        # Lines between the last changed token and the resync point hold no tokens
+        # in either version, so their state is unchanged.
+        first = min(bisect_right(offsets, restart) - 1, first_line)
+        last = max(bisect_right(offsets, changed_end - 1) if changed_end else 0, tail_line)
+
+        # Comment flags: reuse old flags outside [first, last), replay the spans touching it
+        line_delta = n - len(old.lines)
+        old_flags = old._comment_lines
+        comment = [False] * n
+        lo_char, hi_char = self._char_range(first, last)
+        self._mark_comments(comment, bisect_right(ends, lo_char), bisect_left(starts, hi_char))
+        self._mark_prefixes(comment, first, last)
+        # replayed spans may also write to lines outside the range; those keep their old flags
+        comment[:first] = old_flags[:first]
+        comment[last:] = old_flags[last - line_delta:]
+        self._comment_lines = comment
+        return first, last
+
+
+def _is_triple(code: str, start: int) -> bool:
+    return code[start:start + 5].lstrip("rRbBuUfF")[:3] in ('"""', "'''")
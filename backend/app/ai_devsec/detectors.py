@@ -1,11 +1,19 @@
 """
-All 10 security detectors in one file.
+The rule engine: one generic detector that evaluates declarative rules.
+
+Rules themselves live in the JSON packs under rules/ and are loaded,
+validated and routed by ruleset.py. A `RuleDetector` is one pack — a named
+group of rules sharing how lines are walked (skip comment lines, only count
+hits in code, stop at the first matching rule) and how evidence is shown.
 """
 
 import re
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Pattern, Sequence, Set, Tuple
 
+from .baseline import Suppression, content_key, to_hex
+from .context import ScanContext
 from .findings import Finding, truncate_line, mask_sensitive
 
 
@@ -13,429 +21,265 @@ from .findings import Finding, truncate_line, mask_sensitive
 
 class Detector(ABC):
     name: str
+    # File types the detector applies to (None = all)
+    file_types: Optional[FrozenSet[str]] = None
+
+    def applies_to(self, file_type: str) -> bool:
+        return self.file_types is None or file_type in self.file_types
 
     @abstractmethod
-    def run(self, code: str) -> List[Finding]:
+    def run(self, ctx: ScanContext, rules: Optional[list] = None,
+            suppress: Optional[Suppression] = None, profile: Optional["RegexProfile"] = None) -> List[Finding]:
         raise NotImplementedError
 
 
-# 1. Secrets
-
-_SECRETS_PATTERNS = [
-    ("AWS Access Key",
-     re.compile(r"\bAKIA[0-9A-Z]{16}\b")),
-    ("GitHub Token",
-     re.compile(r"\bghp_[A-Za-z0-9]{36}\b")),
-    ("Generic API Key assignment",
-     re.compile(r"\bapi[_-]?key\b\s*[:=]\s*['\"][^'\"]{16,}['\"]", re.IGNORECASE)),
-    ("Private key header",
-     re.compile(r"-----BEGIN (RSA |EC |OPENSSH )?PRIVATE KEY-----")),
-]
-
-
-class SecretsDetector(Detector):
-    name = "secrets"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            for label, rx in _SECRETS_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity="CRITICAL", confidence=0.9,
-                        message=f"Possible secret detected: {label}",
-                        line=lineno, evidence=truncate_line(line),
-                        recommendation="Remove it, rotate the credential, and store it in env vars or a secret manager.",
-                    ))
-        return findings
-
-# 2. Dangerous execution
-
-_EXEC_PATTERNS = [
-    ("eval()",                      re.compile(r"\beval\s*\(")),
-    ("exec()",                      re.compile(r"\bexec\s*\(")),
-    ("os.system()",                 re.compile(r"\bos\.system\s*\(")),
-    ("subprocess.run/call/Popen()", re.compile(r"\bsubprocess\.(run|call|Popen)\s*\(")),
-    ("shell=True",                  re.compile(r"\bshell\s*=\s*True\b")),
-]
-
-
-class DangerousExecDetector(Detector):
-    name = "dangerous_exec"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            for label, rx in _EXEC_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity="HIGH", confidence=0.8,
-                        message=f"Potentially dangerous execution primitive: {label}",
-                        line=lineno, evidence=truncate_line(line),
-                        recommendation="Avoid dynamic execution. Never use shell=True unless inputs are strictly controlled.",
-                    ))
-        return findings
-
-
-# 3. Hardcoded credentials
-
-_CREDS_KV = [
-    ("Hardcoded password",
-     re.compile(r"\b(pass(word)?|passwd)\b\s*[:=]\s*(['\"]).*?\3", re.IGNORECASE)),
-    ("Hardcoded secret",
-     re.compile(r"\bsecret\b\s*[:=]\s*(['\"]).*?\1", re.IGNORECASE)),
-    ("Hardcoded token",
-     re.compile(r"\b(token|api[_-]?token|access[_-]?token)\b\s*[:=]\s*(['\"]).*?\2", re.IGNORECASE)),
-]
-_CREDS_BEARER = re.compile(r"\bauthorization\b\s*:\s*bearer\s+[A-Za-z0-9\-._~+/]+=*", re.IGNORECASE)
-_CREDS_URL    = re.compile(r"://[^/\s:]+:[^/\s@]+@", re.IGNORECASE)
-
-
-class HardcodedCredsDetector(Detector):
-    name = "hardcoded_creds"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            for label, rx in _CREDS_KV:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity="HIGH", confidence=0.8,
-                        message=f"{label} detected.",
-                        line=lineno, evidence=mask_sensitive(line),
-                        recommendation="Remove hardcoded credentials. Use environment variables or a secret manager.",
-                    ))
-            if _CREDS_BEARER.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="HIGH", confidence=0.85,
-                    message="Authorization header token detected.",
-                    line=lineno, evidence=mask_sensitive(line),
-                    recommendation="Do not hardcode auth tokens. Inject them securely via secrets/ENV.",
-                ))
-            if _CREDS_URL.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="HIGH", confidence=0.75,
-                    message="Credentials in URL detected.",
-                    line=lineno, evidence=mask_sensitive(line),
-                    recommendation="Remove credentials from URLs. Use secure credential storage.",
-                ))
-        return findings
-
-# 4. Insecure HTTP
-
-_HTTP_RX    = re.compile(r"http://", re.IGNORECASE)
-_SAFE_HOSTS = re.compile(
-    r"http://(localhost|127\.0\.0\.1|0\.0\.0\.0|::1)(:\d+)?(/|$|\s|['\"])",
-    re.IGNORECASE,
-)
-
-
-class InsecureHTTPDetector(Detector):
-    name = "insecure_http"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            if _HTTP_RX.search(line) and not _SAFE_HOSTS.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="MEDIUM", confidence=0.7,
-                    message="Insecure HTTP connection detected (use HTTPS).",
-                    line=lineno, evidence=truncate_line(line),
-                    recommendation="Use HTTPS instead of HTTP to ensure encrypted communication.",
-                ))
-        return findings
-
-
-# 5. Download and execute
-
-_DLEXEC_PATTERNS = [
-    ("curl pipe to bash/sh",    re.compile(r"\bcurl\b.*\|\s*(bash|sh)\b",          re.IGNORECASE)),
-    ("wget pipe to bash/sh",    re.compile(r"\bwget\b.*\|\s*(bash|sh)\b",          re.IGNORECASE)),
-    ("curl then bash/sh",       re.compile(r"\bcurl\b.*;\s*(bash|sh)\b",           re.IGNORECASE)),
-    ("wget then bash/sh",       re.compile(r"\bwget\b.*;\s*(bash|sh)\b",           re.IGNORECASE)),
-    ("PowerShell IEX",          re.compile(r"\bpowershell\b.*\b(iex|invoke-expression)\b", re.IGNORECASE)),
-    ("Invoke-WebRequest + IEX", re.compile(r"invoke-webrequest.*\|\s*(iex|invoke-expression)", re.IGNORECASE)),
-]
-
-
-class DownloadExecDetector(Detector):
-    name = "download_exec"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            for label, rx in _DLEXEC_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity="CRITICAL", confidence=0.85,
-                        message=f"Suspicious download-and-execute pattern detected: {label}",
-                        line=lineno, evidence=truncate_line(line),
-                        recommendation="Do not pipe remote content into a shell. Download, verify integrity, review, then execute safely.",
-                    ))
-        return findings
-
-
-# 6. SQL injection
-
-_Q = r"""['"]{1}"""   # matches either " or '
-
-_SQL_PATTERNS = [
-    ("f-string SQL query",
-     re.compile(r"f" + _Q + r".*\b(SELECT|INSERT|UPDATE|DELETE|WHERE|FROM)\b.*\{", re.IGNORECASE)),
-    ("%-format SQL query",
-     re.compile(_Q + r".*\b(SELECT|INSERT|UPDATE|DELETE|WHERE|FROM)\b.*" + _Q + r".*%\s*[^(]", re.IGNORECASE)),
-    (".format() SQL query",
-     re.compile(_Q + r".*\b(SELECT|INSERT|UPDATE|DELETE|WHERE|FROM)\b.*" + _Q + r"\.format\(", re.IGNORECASE)),
-    ("string concatenation in SQL (right side)",
-     re.compile(_Q + r".*\b(SELECT|INSERT|UPDATE|DELETE|WHERE|FROM)\b.*" + _Q + r"\s*\+", re.IGNORECASE)),
-    ("string concatenation in SQL (left side)",
-     re.compile(r"\+\s*" + _Q + r".*\b(SELECT|INSERT|UPDATE|DELETE|WHERE|FROM)\b", re.IGNORECASE)),
-]
-
-
-class SQLInjectionDetector(Detector):
-    name = "sql_injection"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            s = line.strip()
-            if s.startswith("#") or s.startswith("//") or s.startswith("--"):
-                continue
-            for label, rx in _SQL_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity="CRITICAL", confidence=0.85,
-                        message=f"Potential SQL injection via {label}.",
-                        line=lineno, evidence=truncate_line(line),
-                        recommendation=(
-                            "Never build SQL queries with string formatting or concatenation. "
-                            "Use parameterized queries: cursor.execute('SELECT ... WHERE id = %s', (user_id,))."
-                        ),
-                    ))
-                    break  
-        return findings
-
-
-# 7. Insecure deserialization
-
-_DESER_PATTERNS = [
-    ("pickle.loads()", "CRITICAL", 0.9,
-     re.compile(r"\bpickle\.(loads?|Unpickler)\s*\("),
-     "pickle can execute arbitrary code when deserializing untrusted data. Use JSON or Pydantic instead."),
-    ("yaml.load() without Loader", "CRITICAL", 0.9,
-     re.compile(r"\byaml\.load\s*\(\s*(?![^)]*Loader\s*=\s*yaml\.(?:Safe|Base)Loader)"),
-     "yaml.load() with the default loader can execute arbitrary Python code. Use yaml.safe_load() instead."),
-    ("marshal.loads()", "HIGH", 0.85,
-     re.compile(r"\bmarshal\.(loads?|load)\s*\("),
-     "marshal is not secure against maliciously crafted data. Use JSON or another safe format."),
-    ("jsonpickle.decode()", "CRITICAL", 0.9,
-     re.compile(r"\bjsonpickle\.decode\s*\("),
-     "jsonpickle.decode() can deserialize arbitrary Python objects and execute code."),
-    ("shelve.open()", "MEDIUM", 0.7,
-     re.compile(r"\bshelve\.open\s*\("),
-     "shelve uses pickle internally. Do not open shelve files from untrusted sources."),
-]
-
-
-class InsecureDeserializationDetector(Detector):
-    name = "insecure_deserialization"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            if line.strip().startswith("#"):
-                continue
-            for label, severity, confidence, rx, rec in _DESER_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity=severity, confidence=confidence,
-                        message=f"Insecure deserialization: {label} can execute arbitrary code on untrusted input.",
-                        line=lineno, evidence=truncate_line(line), recommendation=rec,
-                    ))
-        return findings
-
-
-# 8. Path traversal
-
-_PT_USER_INPUT = re.compile(
-    r"\b(request\.(args|form|json|data|files|params|get|values|POST|GET)"
-    r"|user_input|user_file|filename|filepath|path_param"
-    r"|input_path|file_name|upload_name|query_param)\b",
-    re.IGNORECASE,
-)
-_PT_FS_CALLS = re.compile(
-    r"\b(open\s*\(|os\.path\.(join|abspath|realpath)\s*\("
-    r"|pathlib\.Path\s*\("
-    r"|os\.(remove|unlink|rename|mkdir|makedirs|listdir|scandir|stat|chmod|chown)\s*\("
-    r"|shutil\.(copy|move|rmtree)\s*\()",
-    re.IGNORECASE,
-)
-_PT_LITERAL = re.compile(r"\.\.[\\/]|\.\.%2[Ff]|%2[Ee]%2[Ee]")
-_PT_CONCAT  = re.compile(
-    r"['\"][\w./\\-]*(uploads?|files?|static|media|tmp|temp|data)[\w./\\-]*['\"]\s*\+",
-    re.IGNORECASE,
-)
-
-
-class PathTraversalDetector(Detector):
-    name = "path_traversal"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            if line.strip().startswith("#"):
-                continue
-            if _PT_LITERAL.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="HIGH", confidence=0.9,
-                    message="Path traversal sequence '../' found in string literal.",
-                    line=lineno, evidence=truncate_line(line),
-                    recommendation=(
-                        "Use os.path.basename() to strip directory parts, then join onto a fixed base. "
-                        "Verify: os.path.realpath(full_path).startswith(os.path.realpath(BASE_DIR))"
-                    ),
-                ))
+# Profiling
+
+class CountingPattern:
+    """A compiled regex that counts its search() calls, matches and time (profiled scans only)."""
+
+    __slots__ = ("rx", "evaluations", "hits", "seconds")
+
+    def __init__(self, rx: Pattern):
+        self.rx = rx
+        self.evaluations = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def search(self, string: str, pos: int = 0):
+        t0 = time.perf_counter()
+        m = self.rx.search(string, pos)
+        self.seconds += time.perf_counter() - t0
+        self.evaluations += 1
+        if m:
+            self.hits += 1
+        return m
+
+
+# (detector, rule label, rule id) -> counter; exclude/requires regexes get their own entries
+RegexProfile = Dict[Tuple[str, str, str], CountingPattern]
+
+
+# Rules
+
+REGEX_FLAGS = {"IGNORECASE": re.IGNORECASE, "MULTILINE": re.MULTILINE}
+
+EVIDENCE: Dict[str, Callable[[str], str]] = {
+    "truncate": truncate_line,
+    "mask":     mask_sensitive,
+}
+
+
+def compile_flags(names: Sequence[str]) -> int:
+    flags = 0
+    for name in names:
+        flags |= REGEX_FLAGS[name]
+    return flags
+
+
+class Rule:
+    """
+    One resolved rule. Regexes are compiled on first use, so a process only
+    pays for the rules of the file types it actually scans.
+    """
+
+    __slots__ = ("id", "label", "pattern", "flags", "severity", "confidence",
+                 "message", "recommendation", "file_types", "anchors",
+                 "exclude", "exclude_flags", "requires", "requires_flags",
+                 "_rx", "_exclude_rx", "_requires_rx", "_bytes")
+
+    def __init__(self, spec: dict):
+        self.id: str = spec["id"]
+        self.label: str = spec["label"]
+        self.pattern: str = spec["pattern"]
+        self.flags: Tuple[str, ...] = tuple(spec.get("flags", ()))
+        self.severity: str = spec["severity"]
+        self.confidence: float = spec["confidence"]
+        self.message: str = spec["message"]
+        self.recommendation: str = spec["recommendation"]
+        ft = spec.get("file_types")
+        self.file_types: Optional[FrozenSet[str]] = frozenset(ft) if ft is not None else None
+        # Literals of which at least one must occur for the pattern to match
+        # (lower-cased for IGNORECASE rules); empty means "no prefilter".
+        ignorecase = "IGNORECASE" in self.flags
+        self.anchors: Tuple[str, ...] = tuple(
+            a.lower() if ignorecase else a for a in spec.get("anchors", ())
+        )
+        self.exclude: Optional[str] = spec.get("exclude")
+        self.exclude_flags: Tuple[str, ...] = tuple(spec.get("exclude_flags", ()))
+        self.requires: Optional[str] = spec.get("requires")
+        self.requires_flags: Tuple[str, ...] = tuple(spec.get("requires_flags", ()))
+        self._rx: Optional[Pattern] = None
+        self._exclude_rx: Optional[Pattern] = None
+        self._requires_rx: Optional[Pattern] = None
+        self._bytes: Optional[tuple] = None
+
+    @property
+    def ignorecase(self) -> bool:
+        return "IGNORECASE" in self.flags
+
+    @property
+    def rx(self) -> Pattern:
+        if self._rx is None:
+            self._rx = re.compile(self.pattern, compile_flags(self.flags))
+        return self._rx
+
+    @property
+    def exclude_rx(self) -> Optional[Pattern]:
+        if self._exclude_rx is None and self.exclude is not None:
+            self._exclude_rx = re.compile(self.exclude, compile_flags(self.exclude_flags))
+        return self._exclude_rx
+
+    @property
+    def requires_rx(self) -> Optional[Pattern]:
+        if self._requires_rx is None and self.requires is not None:
+            self._requires_rx = re.compile(self.requires, compile_flags(self.requires_flags))
+        return self._requires_rx
+
+    def applies_to(self, file_type: str) -> bool:
+        return self.file_types is None or file_type in self.file_types
+
+    def compiled_bytes(self) -> Tuple[Pattern, Optional[Pattern], Optional[Pattern], Tuple[bytes, ...]]:
+        """
+        The rule for byte buffers: (pattern, exclude, requires, anchors), with
+        patterns compiled as UTF-8 bytes regexes. \\w, \\b, \\s and IGNORECASE
+        are then ASCII-only; on ASCII text they match exactly what the str
+        patterns match.
+        """
+        if self._bytes is None:
+            def compile_bytes(pattern: Optional[str], flags: Tuple[str, ...]) -> Optional[Pattern]:
+                return None if pattern is None else re.compile(pattern.encode("utf-8"), compile_flags(flags))
+            self._bytes = (
+                compile_bytes(self.pattern, self.flags),
+                compile_bytes(self.exclude, self.exclude_flags),
+                compile_bytes(self.requires, self.requires_flags),
+                tuple(a.encode("utf-8") for a in self.anchors),
+            )
+        return self._bytes
+
+
+class RuleDetector(Detector):
+    """A named group of rules evaluated line by line, in rule order."""
+
+    def __init__(self, spec: dict):
+        self.name: str = spec["detector"]
+        ft = spec.get("file_types")
+        self.file_types = frozenset(ft) if ft is not None else None
+        # skip lines that hold nothing but a comment
+        self.skip_comments: bool = spec.get("skip_comments", False)
+        # a hit inside a string literal or trailing comment does not count
+        self.code_only: bool = spec.get("code_only", False)
+        # the first matching rule wins; rules go from most to least specific
+        self.first_match: bool = spec.get("first_match", False)
+        self.evidence: Callable[[str], str] = EVIDENCE[spec.get("evidence", "truncate")]
+        self.rules: List[Rule] = [Rule(r) for r in spec["rules"]]
+
+    def rules_for(self, file_type: str) -> List[Rule]:
+        return [r for r in self.rules if r.applies_to(file_type)]
+
+    def _candidate_lines(self, ctx: ScanContext, rules: List[Rule]) -> Tuple[
+        Sequence[int], List[Optional[Set[int]]]
+    ]:
+        """
+        Line indexes worth visiting, and per rule the set of lines that contain
+        one of its anchors (None = every line). When every rule is anchored,
+        only the union of their candidate lines is walked.
+        """
+        per_rule = [
+            ctx.lines_containing(r.anchors, r.ignorecase) if r.anchors else None
+            for r in rules
+        ]
+        if any(c is None for c in per_rule):
+            return range(*ctx.window), per_rule
+        union: Set[int] = set()
+        for c in per_rule:
+            union |= c
+        return sorted(union), per_rule
+
+    def run(self, ctx: ScanContext, rules: Optional[List[Rule]] = None,
+            suppress: Optional[Suppression] = None, profile: Optional[RegexProfile] = None) -> List[Finding]:
+        return list(self.iter_findings(ctx, self.rules if rules is None else rules, suppress, profile))
+
+    def counting(self, rule: Rule, profile: RegexProfile) -> Tuple[
+        CountingPattern, Optional[CountingPattern], Optional[CountingPattern]
+    ]:
+        """`rule`'s (pattern, exclude, requires) as counters registered in `profile`."""
+        def counter(suffix: str, rx: Optional[Pattern]) -> Optional[CountingPattern]:
+            if rx is None:
+                return None
+            label = f"{rule.label} ({suffix})" if suffix else rule.label
+            rule_id = f"{rule.id}:{suffix}" if suffix else rule.id
+            return profile.setdefault((self.name, label, rule_id), CountingPattern(rx))
+        return counter("", rule.rx), counter("exclude", rule.exclude_rx), counter("requires", rule.requires_rx)
+
+    def iter_findings(self, ctx: ScanContext, rules: List[Rule],
+                      suppress: Optional[Suppression] = None,
+                      profile: Optional[RegexProfile] = None) -> Iterator[Finding]:
+        """
+        Findings in line order, produced as they are found; gating stops at
+        the first. Hits hidden by `suppress` are dropped before their
+        evidence is formatted. With `profile`, every regex evaluation is
+        counted there.
+        """
+        if not rules:
+            return
+        indexes, candidates = self._candidate_lines(ctx, rules)
+        if profile is None:
+            compiled = [(r, r.rx, r.exclude_rx, r.requires_rx, c) for r, c in zip(rules, candidates)]
+        else:
+            compiled = [(r, *self.counting(r, profile), c) for r, c in zip(rules, candidates)]
+        comment_lines = ctx.comment_lines if self.skip_comments else None
+        lines = ctx.lines
+        for i in indexes:
+            if comment_lines is not None and comment_lines[i]:
                 continue
-            if _PT_FS_CALLS.search(line) and _PT_USER_INPUT.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="HIGH", confidence=0.8,
-                    message="User-controlled value passed directly to a file-system call — possible path traversal.",
-                    line=lineno, evidence=truncate_line(line),
-                    recommendation="Sanitize with os.path.basename() and verify the final path stays inside BASE_DIR.",
-                ))
+            line = lines[i]
+            lineno = i + 1
+            for rule, rx, exclude, requires, cand in compiled:
+                if cand is not None and i not in cand:
+                    continue
+                m = rx.search(line)
+                if self.code_only:
+                    while m and not ctx.in_code(lineno, m.start()):
+                        m = rx.search(line, m.end())
+                if not m:
+                    continue
+                if exclude is not None and exclude.search(line):
+                    continue
+                if requires is not None and not requires.search(line):
+                    continue
+                key = content_key(rule.id, line)
+                if suppress is None or not suppress.hides(key):
+                    yield Finding(
+                        detector=self.name, severity=rule.severity, confidence=rule.confidence,
+                        message=rule.message,
+                        line=lineno, evidence=self.evidence(line),
+                        recommendation=rule.recommendation,
+                        rule_id=rule.id, fingerprint=to_hex(key),
+                    )
+                if self.first_match:
+                    break
+
+    def first_hit(self, ctx: ScanContext, rules: List[Rule], lineno: int) -> Optional[Rule]:
+        """
+        The first of `rules` that hits line `lineno`, judged as in
+        iter_findings. With first_match only that rule's finding stands, which
+        callers running a subset of the rules need to check.
+        """
+        i = lineno - 1
+        if self.skip_comments and ctx.comment_lines[i]:
+            return None
+        line = ctx.lines[i]
+        for rule in rules:
+            m = rule.rx.search(line)
+            if self.code_only:
+                while m and not ctx.in_code(lineno, m.start()):
+                    m = rule.rx.search(line, m.end())
+            if not m:
                 continue
-            if _PT_CONCAT.search(line):
-                findings.append(Finding(
-                    detector=self.name, severity="MEDIUM", confidence=0.65,
-                    message="Directory path concatenated with a variable — possible path traversal if variable is user-controlled.",
-                    line=lineno, evidence=truncate_line(line),
-                    recommendation="Use os.path.join() and validate the result with os.path.realpath().",
-                ))
-        return findings
-
-
-# 9. Weak cryptography
-
-_CRYPTO_PATTERNS = [
-    ("MD5 used for security", "HIGH", 0.8,
-     re.compile(r"\bhashlib\.md5\s*\(|\.new\s*\(\s*['\"]md5['\"]", re.IGNORECASE),
-     "MD5 is cryptographically broken. Use SHA-256 or SHA-3 for integrity; bcrypt/argon2 for passwords."),
-    ("SHA-1 used for security", "HIGH", 0.8,
-     re.compile(r"\bhashlib\.sha1\s*\(|\.new\s*\(\s*['\"]sha1['\"]", re.IGNORECASE),
-     "SHA-1 is broken since 2017 (SHAttered). Use SHA-256 or SHA-3."),
-    ("DES cipher", "CRITICAL", 0.9,
-     re.compile(r"\bDES\b|\bDES3\b|\bTripleDES\b|algorithms\.(DES|TripleDES)\b", re.IGNORECASE),
-     "DES was cracked in 1999. 3DES is deprecated by NIST. Use AES-256-GCM."),
-    ("RC4 cipher", "CRITICAL", 0.9,
-     re.compile(r"\bRC4\b|\bARC4\b|algorithms\.ARC4\b", re.IGNORECASE),
-     "RC4 is prohibited by RFC 7465. Use AES-256-GCM or ChaCha20-Poly1305."),
-    ("Blowfish cipher", "MEDIUM", 0.8,
-     re.compile(r"\bBlowfish\b|algorithms\.Blowfish\b", re.IGNORECASE),
-     "Blowfish's 64-bit blocks are vulnerable to SWEET32. Use AES-256-GCM."),
-    ("ECB cipher mode", "HIGH", 0.9,
-     re.compile(r"\bECB\b|modes\.ECB\b|MODE_ECB\b|mode\s*=\s*['\"]?ECB['\"]?", re.IGNORECASE),
-     "ECB leaks data patterns. Use AES-GCM or AES-CBC with a random IV."),
-    ("random module (not crypto-safe)", "HIGH", 0.85,
-     re.compile(r"\brandom\.(random|randint|choice|choices|randrange|randbytes|getrandbits)\s*\(", re.IGNORECASE),
-     "Python's random module is not cryptographically secure. Use secrets.token_hex() or os.urandom()."),
-    ("random.seed() with fixed value", "HIGH", 0.9,
-     re.compile(r"\brandom\.seed\s*\(\s*\d+\s*\)"),
-     "A fixed seed makes output predictable. Never seed random with a constant in security code."),
-    ("Hardcoded zero IV or nonce", "HIGH", 0.85,
-     re.compile(
-         r"\biv\s*=\s*b?['\"]\\x00+['\"]|\bnonce\s*=\s*b?['\"]\\x00+['\"]"
-         r"|\biv\s*=\s*bytes?\(\s*\d+\s*\)|\bnonce\s*=\s*bytes?\(\s*\d+\s*\)",
-         re.IGNORECASE,
-     ),
-     "A hardcoded or all-zeros IV/nonce defeats cipher security. Use iv = os.urandom(16)."),
-]
-
-
-class WeakCryptographyDetector(Detector):
-    name = "weak_cryptography"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            if line.strip().startswith("#"):
+            if rule.exclude_rx is not None and rule.exclude_rx.search(line):
                 continue
-            for label, severity, confidence, rx, rec in _CRYPTO_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity=severity, confidence=confidence,
-                        message=f"Weak cryptography: {label}.",
-                        line=lineno, evidence=truncate_line(line), recommendation=rec,
-                    ))
-        return findings
-
-
-# 10. Debug and misconfiguration
-
-_MISCONFIG_PATTERNS = [
-    ("Flask DEBUG=True", "HIGH", 0.9,
-     re.compile(r"\bapp\.run\s*\(.*\bdebug\s*=\s*True\b", re.IGNORECASE),
-     "Flask debug mode exposes an interactive browser console. Never deploy with debug=True."),
-    ("Flask DEBUG via app.config", "HIGH", 0.9,
-     re.compile(r"\bapp\.config\s*\[.?DEBUG.?\]\s*=\s*True\b", re.IGNORECASE),
-     "Flask debug mode exposes an interactive debugger on error pages. Set via environment variable only."),
-    ("Django DEBUG=True", "HIGH", 0.9,
-     re.compile(r"^\s*DEBUG\s*=\s*True\b", re.IGNORECASE),
-     "Django DEBUG=True exposes stack traces, SQL queries, and settings. Use os.getenv('DJANGO_DEBUG')."),
-    ("Django ALLOWED_HOSTS wildcard", "MEDIUM", 0.9,
-     re.compile(r"\bALLOWED_HOSTS\s*=\s*\[?\s*['\"]?\*['\"]?\s*\]?"),
-     "ALLOWED_HOSTS=['*'] disables host header validation. List your actual domains explicitly."),
-    ("SSL verify=False", "HIGH", 0.95,
-     re.compile(r"\bverify\s*=\s*False\b"),
-     "Disabling SSL verification removes MITM protection. Fix the certificate instead."),
-    ("ssl.CERT_NONE", "HIGH", 0.95,
-     re.compile(r"\bssl\.CERT_NONE\b"),
-     "ssl.CERT_NONE disables certificate validation. Use ssl.CERT_REQUIRED."),
-    ("check_hostname=False", "HIGH", 0.9,
-     re.compile(r"\bcheck_hostname\s*=\s*False\b"),
-     "Disabling hostname checking allows MITM with any valid certificate. Set check_hostname=True."),
-    ("assert used as auth check", "MEDIUM", 0.75,
-     re.compile(
-         r"\bassert\s+.*(auth|permission|is_admin|logged_in|is_authenticated"
-         r"|access|authorized|allowed|role|token|user)\b",
-         re.IGNORECASE,
-     ),
-     "assert statements are stripped in optimized mode (-O). Use explicit if/raise for security checks."),
-    ("Bare except clause", "LOW", 0.7,
-     re.compile(r"^\s*except\s*:\s*$|^\s*except\s+Exception\s*:\s*$"),
-     "Catching all exceptions swallows security-relevant errors. Catch specific exceptions and log unexpected ones."),
-]
-
-
-class DebugMisconfigDetector(Detector):
-    name = "debug_misconfig"
-
-    def run(self, code: str) -> List[Finding]:
-        findings: List[Finding] = []
-        for lineno, line in enumerate(code.splitlines(), start=1):
-            if line.strip().startswith("#"):
+            if rule.requires_rx is not None and not rule.requires_rx.search(line):
                 continue
-            for label, severity, confidence, rx, rec in _MISCONFIG_PATTERNS:
-                if rx.search(line):
-                    findings.append(Finding(
-                        detector=self.name, severity=severity, confidence=confidence,
-                        message=f"Dangerous misconfiguration: {label}.",
-                        line=lineno, evidence=truncate_line(line), recommendation=rec,
-                    ))
-        return findings
-
-
-# Master list — imported by service.py
-
-DETECTORS: List[Detector] = [
-    SecretsDetector(),
-    DangerousExecDetector(),
-    HardcodedCredsDetector(),
-    InsecureHTTPDetector(),
-    DownloadExecDetector(),
-    SQLInjectionDetector(),
-    InsecureDeserializationDetector(),
-    PathTraversalDetector(),
-    WeakCryptographyDetector(),
-    DebugMisconfigDetector(),
-]
\ No newline at end of file
+            return rule
+        return None
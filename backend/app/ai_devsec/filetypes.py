@@ -0,0 +1,143 @@
+"""
+File-type classification used to route rules.
+
+`classify()` maps a filename (by extension or well-known name) to a file
+type. When there is no filename, a cheap sniff of the first lines looks for
+a shebang or for several unambiguous language markers; anything unclear is
+"unknown", which runs every rule exactly as before routing existed.
+"""
+
+import os
+import re
+from typing import Dict, FrozenSet, Optional
+
+
+PYTHON     = "python"
+JAVASCRIPT = "javascript"
+SHELL      = "shell"
+POWERSHELL = "powershell"
+SQL        = "sql"
+YAML       = "yaml"
+JSON       = "json"
+CONFIG     = "config"       # ini / toml / .env / properties
+MARKUP     = "markup"       # markdown, rst, html, plain text
+DOCKERFILE = "dockerfile"
+OTHER      = "other"        # recognised source code without dedicated rules
+# Routed like OTHER; separate only because their comments are not C-style
+PERL       = "perl"
+RUBY       = "ruby"
+LUA        = "lua"
+UNKNOWN    = "unknown"
+
+FILE_TYPES: FrozenSet[str] = frozenset({
+    PYTHON, JAVASCRIPT, SHELL, POWERSHELL, SQL, YAML, JSON,
+    CONFIG, MARKUP, DOCKERFILE, OTHER, PERL, RUBY, LUA, UNKNOWN,
+})
+
+# Handy groupings for rule routing
+CODE_TYPES = frozenset({PYTHON, JAVASCRIPT, SHELL, POWERSHELL, OTHER, PERL, RUBY, LUA, UNKNOWN})
+APP_CODE   = frozenset({PYTHON, JAVASCRIPT, OTHER, PERL, RUBY, LUA, UNKNOWN})
+SCRIPTING  = frozenset({SHELL, POWERSHELL, DOCKERFILE, YAML, UNKNOWN})
+
+
+_EXTENSIONS: Dict[str, str] = {
+    ".py": PYTHON, ".pyw": PYTHON, ".pyi": PYTHON,
+    ".js": JAVASCRIPT, ".jsx": JAVASCRIPT, ".mjs": JAVASCRIPT, ".cjs": JAVASCRIPT,
+    ".ts": JAVASCRIPT, ".tsx": JAVASCRIPT, ".vue": JAVASCRIPT,
+    ".sh": SHELL, ".bash": SHELL, ".zsh": SHELL, ".ksh": SHELL,
+    ".ps1": POWERSHELL, ".psm1": POWERSHELL, ".psd1": POWERSHELL, ".bat": POWERSHELL, ".cmd": POWERSHELL,
+    ".sql": SQL,
+    ".yml": YAML, ".yaml": YAML,
+    ".json": JSON,
+    ".ini": CONFIG, ".cfg": CONFIG, ".conf": CONFIG, ".toml": CONFIG, ".env": CONFIG, ".properties": CONFIG,
+    ".md": MARKUP, ".rst": MARKUP, ".txt": MARKUP, ".html": MARKUP, ".htm": MARKUP,
+    ".java": OTHER, ".kt": OTHER, ".go": OTHER, ".php": OTHER, ".cs": OTHER,
+    ".c": OTHER, ".h": OTHER, ".cpp": OTHER, ".hpp": OTHER, ".rs": OTHER, ".scala": OTHER,
+    ".swift": OTHER,
+    ".pl": PERL, ".pm": PERL, ".rb": RUBY, ".lua": LUA,
+}
+
+_NAMES: Dict[str, str] = {
+    "dockerfile":   DOCKERFILE,
+    "containerfile": DOCKERFILE,
+    "makefile":     SHELL,
+    ".bashrc":      SHELL,
+    ".profile":     SHELL,
+    ".env":         CONFIG,
+}
+
+_SHEBANG = re.compile(r"^#!\s*(?:\S*/)?(?:env\s+(?:-\S+\s+)*)?([\w.-]+)")
+_SHEBANG_TYPES = {
+    "python": PYTHON,
+    "bash": SHELL, "sh": SHELL, "zsh": SHELL, "ksh": SHELL, "dash": SHELL,
+    "node": JAVASCRIPT, "deno": JAVASCRIPT,
+    "pwsh": POWERSHELL, "powershell": POWERSHELL,
+    "perl": PERL, "ruby": RUBY, "lua": LUA,
+}
+
+# Strong per-language markers, matched against the start of lines
+_MARKERS = {
+    PYTHON: re.compile(
+        r"^(?:def \w+\(.*\)\s*(?:->.*)?:\s*$|class \w+(?:\(.*\))?:\s*$|from [\w.]+ import \w"
+        r"|if __name__ == ['\"]__main__['\"]:|@\w+(?:\.\w+)*(?:\(.*\))?\s*$)",
+        re.MULTILINE,
+    ),
+    JAVASCRIPT: re.compile(
+        r"^(?:(?:export\s+)?(?:const|let|var) \w+\s*=|(?:export\s+)?(?:async\s+)?function\s*\w*\s*\("
+        r"|import .* from ['\"]|module\.exports\s*=|\}\);?\s*$)",
+        re.MULTILINE,
+    ),
+    SHELL: re.compile(
+        r"^(?:set -[euxo]+|export \w+=|(?:if|while) \[\[? |fi\s*$|done\s*$|esac\s*$|\w+\(\)\s*\{)",
+        re.MULTILINE,
+    ),
+    SQL: re.compile(
+        r"^(?:CREATE (?:TABLE|INDEX|VIEW|FUNCTION)|ALTER TABLE|INSERT INTO|DROP TABLE|BEGIN;|COMMIT;)",
+        re.MULTILINE | re.IGNORECASE,
+    ),
+}
+
+_SNIFF_CHARS = 4096
+_MIN_MARKERS = 2
+
+
+def from_filename(filename: Optional[str]) -> Optional[str]:
+    """File type implied by a filename, or None if the name says nothing."""
+    if not filename:
+        return None
+    base = os.path.basename(filename.replace("\\", "/")).lower()
+    if base in _NAMES:
+        return _NAMES[base]
+    if base.startswith("dockerfile"):
+        return DOCKERFILE
+    _, ext = os.path.splitext(base)
+    return _EXTENSIONS.get(ext)
+
+
+def sniff(code: str) -> str:
+    """Guess a file type from content alone. Deliberately conservative."""
+    head = code[:_SNIFF_CHARS]
+    if head.startswith("#!"):
+        m = _SHEBANG.match(head)
+        interpreter = m.group(1).rstrip("0123456789.") if m else ""
+        if interpreter in _SHEBANG_TYPES:
+            return _SHEBANG_TYPES[interpreter]
+    if head.lstrip().startswith("<?php"):
+        return OTHER
+
+    scores = {ft: len(rx.findall(head)) for ft, rx in _MARKERS.items()}
+    best = max(scores, key=scores.get)
+    ranked = sorted(scores.values(), reverse=True)
+    if ranked[0] >= _MIN_MARKERS and ranked[0] >= 2 * ranked[1]:
+        return best
+    return UNKNOWN
+
+
+def classify(filename: Optional[str], code: Optional[str] = None) -> str:
+    """Filename first, then a content sniff, then UNKNOWN."""
+    ft = from_filename(filename)
+    if ft is not None:
+        return ft
+    if code:
+        return sniff(code)
+    return UNKNOWN
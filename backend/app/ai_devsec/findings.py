@@ -4,7 +4,7 @@ helper functions that sanitise evidence before it appears in a Finding.
 """
 
 import re
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field
 
 
@@ -59,6 +59,9 @@ class Finding(BaseModel):
     line:           Optional[int]   = None
     evidence:       Optional[str]   = None
     recommendation: Optional[str]   = None
+    rule_id:        Optional[str]   = None
+    # stable across line shifts: rule id + whitespace-normalized line + file (see baseline.py)
+    fingerprint:    Optional[str]   = None
 
 
 class ScanRequest(BaseModel):
@@ -73,6 +76,160 @@ class ScanResponse(BaseModel):
     risk_score: int          = Field(ge=0, le=100)
     findings:   List[Finding]
     summary:    str
+    # /scan only: handle for incremental re-scans, and the buffer revision scanned
+    scan_id:    Optional[str] = None
+    revision:   Optional[int] = None
+    # with ?baseline=: how many findings the baseline hid
+    suppressed: Optional[int] = None
+    # with ?dedupe=true: rule_id -> recommendation, left out of the findings
+    recommendations: Optional[Dict[str, str]] = None
+    # with ?project=: id of this scan in the history store (history.py)
+    history_id: Optional[str] = None
+
+
+class GateResponse(BaseModel):
+    """Verdict of a gated /scan or /scan-diff (?gate=SEVERITY)."""
+    passed:    bool
+    threshold: Severity
+    # the first finding at or above the threshold; the scan stopped there
+    finding:   Optional[Finding] = None
+    summary:   str
+
+
+class BaselineUpload(BaseModel):
+    """Accepted findings for PUT /baselines/{name}: fingerprints, or findings from an earlier scan, or both."""
+    fingerprints: List[str]     = []
+    findings:     List[Finding] = []
+
+
+class BaselineInfo(BaseModel):
+    name:    str
+    entries: int
+
+
+class HistoryScan(BaseModel):
+    """One recorded scan, with its finding counts by severity."""
+    history_id:  str
+    ref:         Optional[str]
+    kind:        str
+    created_at:  float
+    findings:    int
+    risk_score:  int
+    by_severity: Dict[str, int] = {}
+
+
+class HistoryFinding(BaseModel):
+    fingerprint: str
+    rule_id:     Optional[str]
+    detector:    str
+    severity:    Severity
+    file:        Optional[str]
+    line:        Optional[int]
+
+
+class HistoryComparison(BaseModel):
+    """Findings in `head` but not `base` (new), and in `base` but not `head` (fixed), by fingerprint."""
+    base:  HistoryScan
+    head:  HistoryScan
+    new:   List[HistoryFinding]
+    fixed: List[HistoryFinding]
+
+
+class HistoryTopEntry(BaseModel):
+    key:      Optional[str] = Field(description="The rule id or file.")
+    findings: int
+
+
+class RepoScanResponse(ScanResponse):
+    """Response returned by /scan-repo."""
+    target:        str = Field(description="The working tree, a commit, or a base..head range.")
+    files:         int
+    blobs_scanned: int
+    blobs_reused:  int = Field(description="Files whose blob was scanned before under this ruleset.")
+    files_skipped: int = Field(description="Oversized or unreadable files, and binary files not seen before.")
+
+
+class LineEdit(BaseModel):
+    """Replace lines start_line..end_line (1-based, inclusive) with `lines`."""
+    start_line: int       = Field(ge=1)
+    end_line:   int       = Field(ge=0, description="start_line - 1 inserts before start_line.")
+    lines:      List[str] = Field(default_factory=list, description="Replacement lines, without line breaks.")
+
+
+class RescanRequest(BaseModel):
+    """Payload sent to /scan/{scan_id}/edits."""
+    edits:    List[LineEdit] = Field(min_length=1, description="Applied in order, each to the result of the previous one.")
+    revision: Optional[int]  = Field(None, description="Revision the edits were made against; 409 if it moved on.")
+
+
+class JobFile(BaseModel):
+    filename: str
+    code:     str
+
+
+class JobRequest(BaseModel):
+    """Payload sent to /jobs: every file of a repository or unpacked archive."""
+    files: List[JobFile] = Field(min_length=1)
+
+
+class ShardRequest(BaseModel):
+    """Sent by a cluster coordinator to a worker's /internal/scan-shard."""
+    files: List[JobFile] = Field(min_length=1)
+
+
+class ShardResponse(BaseModel):
+    findings: List[List[Finding]] = Field(description="One list per file, in request order.")
+
+
+JobState = Literal["queued", "running", "done", "failed"]
+
+
+class JobStatus(BaseModel):
+    """Returned by /jobs and /jobs/{job_id}. Findings grow while the job runs."""
+    job_id:          str
+    status:          JobState
+    files_total:     int
+    files_done:      int
+    bytes_total:     int
+    bytes_done:      int
+    findings:        List[Finding] = Field(description="Findings from findings_offset on.")
+    findings_offset: int           = 0
+    findings_total:  int           = 0
+    risk_score:      Optional[int] = Field(None, description="Set once the job is done.")
+    summary:         Optional[str] = None
+    error:           Optional[str] = None
+    created_at:      float
+    started_at:      Optional[float] = None
+    finished_at:     Optional[float] = None
+    expires_at:      Optional[float] = None
+
+
+class RuleProfile(BaseModel):
+    """One rule regex as the scan evaluated it: searches run, searches that matched, time."""
+    rule:        str
+    rule_id:     Optional[str] = None
+    evaluations: int
+    hits:        int
+    seconds:     float
+
+
+class DetectorProfile(BaseModel):
+    detector: str
+    seconds:  float
+    findings: int
+    rules:    List[RuleProfile]
+
+
+class ScanProfile(BaseModel):
+    """Timing breakdown returned by /scan and /scan-diff when ?profile=true."""
+    total_seconds: float
+    lines:         int
+    detectors:     List[DetectorProfile]
+    cprofile:      Optional[str] = None
+
+
+class ProfiledScanResponse(ScanResponse):
+    profile: ScanProfile
 
 
 class DiffScanRequest(BaseModel):
@@ -0,0 +1,429 @@
+"""
+Scan a local git repository without the caller assembling any text.
+
+Three targets:
+
+  scan_repo(repo)                    the working tree, uncommitted edits included
+  scan_repo(repo, "v1.2")            every file in a commit
+  scan_repo(repo, "main..feature")   lines added between two commits
+                                     ("a...b" diffs from their merge base)
+
+Files are scanned as git blobs. Results are cached by (blob SHA, ruleset
+version, file type from the path), so a blob that did not change since the
+last scan is never read or scanned again, and a rescan of a mostly
+unchanged repository costs in proportion to the changed blobs. Blobs come
+from one long-running `git cat-file --batch`; only working-tree files that
+differ from the index are read from disk (and hashed with `git
+hash-object`, so their results are cached the same way).
+
+Findings get `file` (path from the repository root) and `line` (in the
+file at that revision). For a range, only findings on added lines are
+kept; the whole file is still scanned, so a finding that depends on context
+(a comment opened above the hunk, say) is judged the same as in a full scan.
+Lines are numbered as str.splitlines does and mapped to git's "\n"-only
+numbering to match them against the diff.
+
+The cache is in memory (GIT_SCAN_CACHE_ENTRIES blobs). With
+GIT_SCAN_CACHE_DB set it is also kept in that SQLite file, so nightly runs
+in fresh processes reuse each other's results. Blobs above
+GIT_SCAN_MAX_FILE_MB, binary blobs, symlinks and submodules are skipped.
+
+    python -m backend.app.ai_devsec.gitscan [repo] [--rev A..B]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .baseline import attribute
+from .filetypes import classify, from_filename
+from .findings import Finding, RepoScanResponse
+from .ruleset import get_ruleset
+from .service import run_detectors, scan_response
+from . import metrics
+
+
+MB = 1024 * 1024
+
+_SKIP_MODES = {"120000", "160000"}      # symlinks, submodules
+
+CacheKey = Tuple[str, str, str]         # (blob sha, ruleset version, file type from path)
+
+
+class GitError(RuntimeError):
+    """git is missing, the path is not a repository, or a revision does not resolve to a commit."""
+
+
+def _git(repo: str, *args: str, input: Optional[bytes] = None) -> bytes:
+    try:
+        proc = subprocess.run(["git", "-C", repo, *args], input=input, capture_output=True)
+    except FileNotFoundError:
+        raise GitError("git is not installed")
+    if proc.returncode != 0:
+        raise GitError(proc.stderr.decode("utf-8", "replace").strip() or f"git {args[0]} failed")
+    return proc.stdout
+
+
+def _fields(output: bytes) -> List[str]:
+    return [os.fsdecode(p) for p in output.split(b"\0") if p]
+
+
+# 1. Which blobs make up the target
+
+class Entry:
+    __slots__ = ("path", "sha", "size", "on_disk")
+
+    def __init__(self, path: str, sha: str, size: int = -1, on_disk: bool = False):
+        self.path = path
+        self.sha = sha
+        self.size = size            # -1 when unknown until read
+        self.on_disk = on_disk      # working-tree file that differs from the index
+
+
+def tree_entries(repo: str, rev: str) -> List[Entry]:
+    entries = []
+    for item in _fields(_git(repo, "ls-tree", "-r", "-l", "-z", "--full-tree", rev, "--")):
+        meta, path = item.split("\t", 1)
+        mode, kind, sha, size = meta.split()
+        if kind == "blob" and mode not in _SKIP_MODES:
+            entries.append(Entry(path, sha, int(size)))
+    return entries
+
+
+def worktree_entries(repo: str) -> List[Entry]:
+    index: Dict[str, Entry] = {}
+    conflicted: Set[str] = set()
+    for item in _fields(_git(repo, "ls-files", "-s", "-z")):
+        meta, path = item.split("\t", 1)
+        mode, sha, stage = meta.split()
+        if mode in _SKIP_MODES:
+            continue
+        if stage != "0":
+            conflicted.add(path)
+        index[path] = Entry(path, sha)
+
+    dirty = set(conflicted)
+    for item in _fields(_git(repo, "status", "--porcelain=v1", "-z", "--untracked-files=all",
+                             "--no-renames", "--ignore-submodules")):
+        dirty.add(item[3:])
+
+    changed: List[str] = []
+    for path in sorted(dirty):
+        full = os.path.join(repo, path)
+        if os.path.isfile(full) and not os.path.islink(full) and "\n" not in path:
+            changed.append(path)
+        elif path in index and not os.path.exists(full):
+            del index[path]         # deleted in the working tree
+    if changed:
+        shas = _git(repo, "hash-object", "--stdin-paths",
+                    input="".join(p + "\n" for p in changed).encode()).split()
+        for path, sha in zip(changed, shas):
+            index[path] = Entry(path, sha.decode(), on_disk=True)
+
+    entries = []
+    for path in sorted(index):
+        entry = index[path]
+        try:
+            entry.size = os.path.getsize(os.path.join(repo, path))
+        except OSError:
+            continue                # in the index but not checked out (sparse, deleted)
+        entries.append(entry)
+    return entries
+
+
+def range_entries(repo: str, base: str, head: str) -> Tuple[List[Entry], Dict[str, Set[int]]]:
+    """Blobs added or modified in base..head, and the added line numbers per path."""
+    entries = []
+    fields = _fields(_git(repo, "diff", "--raw", "-z", "-M", "--no-abbrev", base, head, "--"))
+    i = 0
+    while i < len(fields):
+        _, new_mode, _, new_sha, status = fields[i].lstrip(":").split()
+        paths = 2 if status[0] in "RC" else 1
+        path = fields[i + paths]
+        i += 1 + paths
+        if status[0] != "D" and new_mode not in _SKIP_MODES:
+            entries.append(Entry(path, new_sha))
+
+    added: Dict[str, Set[int]] = {}
+    current: Optional[Set[int]] = None
+    diff = _git(repo, "-c", "core.quotePath=false", "diff", "-U0", "-M", "--no-color",
+                "--no-ext-diff", "--src-prefix=a/", "--dst-prefix=b/", base, head, "--")
+    for raw in diff.split(b"\n"):
+        if raw.startswith(b"+++ "):
+            path = os.fsdecode(raw[4:])
+            if path.startswith('"') and path.endswith('"'):
+                path = path[1:-1]
+            current = None if path == "/dev/null" else added.setdefault(path[2:], set())
+        elif raw.startswith(b"@@ ") and current is not None:
+            new = raw.split(b" ")[2][1:]                    # +start[,count]
+            start, _, count = new.partition(b",")
+            start = int(start)
+            current.update(range(start, start + (int(count) if count else 1)))
+    return entries, added
+
+
+def _commit(repo: str, rev: str) -> str:
+    """The commit SHA a revision names. Only resolved SHAs reach later git commands."""
+    if rev.startswith("-"):
+        raise GitError(f"Invalid revision {rev!r}.")
+    try:
+        return _git(repo, "rev-parse", "--verify", "--end-of-options", rev + "^{commit}").decode().strip()
+    except GitError:
+        raise GitError(f"Unknown revision {rev!r}.")
+
+
+def _resolve(repo: str, rev: Optional[str]) -> Tuple[List[Entry], Optional[Dict[str, Set[int]]]]:
+    if not rev:
+        return worktree_entries(repo), None
+    if "..." in rev:
+        base, head = rev.split("...", 1)
+        head = _commit(repo, head or "HEAD")
+        base = _git(repo, "merge-base", _commit(repo, base or "HEAD"), head).decode().strip()
+        return range_entries(repo, base, head)
+    if ".." in rev:
+        base, head = rev.split("..", 1)
+        return range_entries(repo, _commit(repo, base or "HEAD"), _commit(repo, head or "HEAD"))
+    return tree_entries(repo, _commit(repo, rev)), None
+
+
+# 2. Reading blobs
+
+def read_blobs(repo: str, shas: List[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+    """Stream blob contents from one `git cat-file --batch`; None for missing objects."""
+    proc = subprocess.Popen(["git", "-C", repo, "cat-file", "--batch"],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def feed():
+        # written from a thread so git never blocks on a full stdout pipe while we still write
+        try:
+            for sha in shas:
+                proc.stdin.write(sha.encode() + b"\n")
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        for sha in shas:
+            header = proc.stdout.readline().split()
+            if len(header) != 3:
+                yield sha, None
+                continue
+            data = proc.stdout.read(int(header[2]))
+            proc.stdout.read(1)
+            yield sha, data if header[1] == b"blob" else None
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+        writer.join()
+
+
+# 3. Result cache
+
+class BlobCache:
+    """Findings per blob, without `file`. LRU in memory, optionally backed by SQLite."""
+
+    def __init__(self, max_entries: int = 50_000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, List[Finding]]" = OrderedDict()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS blob_findings ("
+                " sha TEXT NOT NULL, ruleset TEXT NOT NULL, file_type TEXT NOT NULL, findings TEXT NOT NULL,"
+                " PRIMARY KEY (sha, ruleset, file_type)) WITHOUT ROWID"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "BlobCache":
+        return cls(
+            max_entries=int(os.getenv("GIT_SCAN_CACHE_ENTRIES", "50000")),
+            path=os.getenv("GIT_SCAN_CACHE_DB") or None,
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[List[Finding]]:
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+                return found
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT findings FROM blob_findings WHERE sha = ? AND ruleset = ? AND file_type = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        found = [Finding(**f) for f in json.loads(row[0])]
+        self._remember(key, found)
+        return found
+
+    def put_many(self, items: List[Tuple[CacheKey, List[Finding]]]) -> None:
+        for key, found in items:
+            self._remember(key, found)
+        if self._db is not None and items:
+            rows = [(*key, json.dumps([f.model_dump() for f in found])) for key, found in items]
+            with self._lock:
+                self._db.executemany("INSERT OR REPLACE INTO blob_findings VALUES (?, ?, ?, ?)", rows)
+                self._db.commit()
+
+    def _remember(self, key: CacheKey, found: List[Finding]) -> None:
+        with self._lock:
+            self._entries[key] = found
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+CACHE = BlobCache.from_env()
+
+
+# 4. Scanning
+
+def _is_binary(data: bytes) -> bool:
+    return b"\0" in data[:8000]
+
+
+def _git_lines(code: str) -> Optional[List[int]]:
+    """
+    The line git's diff gives each splitlines() line of `code`, or None when
+    the two agree. git counts only "\n"; a lone "\r", "\f" or U+2028 starts
+    a new line for the detectors but not for git.
+    """
+    lines = code.splitlines(True)
+    if len(lines) == code.count("\n") + (not code.endswith("\n") and bool(code)):
+        return None
+    numbers = []
+    n = 1
+    for line in lines:
+        numbers.append(n)
+        n += line.endswith("\n")
+    return numbers
+
+
+def _blobs(repo: str, misses: List[Entry]) -> Iterator[Tuple[Entry, Optional[bytes]]]:
+    from_git = [e for e in misses if not e.on_disk]
+    for entry in misses:
+        if entry.on_disk:
+            try:
+                with open(os.path.join(repo, entry.path), "rb") as fh:
+                    yield entry, fh.read()
+            except OSError:
+                yield entry, None
+    by_sha = {}
+    for entry in from_git:
+        by_sha.setdefault(entry.sha, []).append(entry)
+    for sha, data in read_blobs(repo, list(by_sha)):
+        for entry in by_sha[sha]:
+            yield entry, data
+
+
+def scan_repo(repo: str, rev: Optional[str] = None, cache: Optional[BlobCache] = None) -> RepoScanResponse:
+    cache = CACHE if cache is None else cache
+    root = _git(repo, "rev-parse", "--show-toplevel").decode().strip()
+    entries, added = _resolve(root, rev)
+    max_size = int(float(os.getenv("GIT_SCAN_MAX_FILE_MB", "2")) * MB)
+    version = get_ruleset().version
+
+    results: Dict[str, List[Finding]] = {}
+    misses: List[Entry] = []
+    hits: List[Entry] = []
+    skipped = reused = scanned = 0
+    for entry in entries:
+        if entry.size > max_size:
+            skipped += 1
+            continue
+        found = cache.get((entry.sha, version, from_filename(entry.path) or ""))
+        metrics.record_cache("git_blob", found is not None)
+        if found is None:
+            misses.append(entry)
+        else:
+            results[entry.path] = found
+            hits.append(entry)
+            reused += 1
+
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    fresh: List[Tuple[CacheKey, List[Finding]]] = []
+    done: Set[CacheKey] = set()
+    git_lines: Dict[str, Optional[List[int]]] = {}
+    # a range also reads its cached blobs, only to number their lines as git does
+    renumber = {e.path for e in hits} if added is not None else set()
+    for entry, data in _blobs(root, misses + [e for e in hits if e.path in renumber]):
+        if entry.path in renumber:
+            if data is not None:
+                git_lines[entry.path] = _git_lines(data.decode("utf-8", "replace"))
+            continue
+        if data is None or len(data) > max_size:
+            skipped += 1
+            continue
+        key = (entry.sha, version, from_filename(entry.path) or "")
+        if _is_binary(data):
+            found = []
+            skipped += 1
+        else:
+            code = data.decode("utf-8", "replace")
+            found = run_detectors(code, seconds, counts, classify(entry.path, code))
+            if added is not None:
+                git_lines[entry.path] = _git_lines(code)
+            scanned += 1
+        if key not in done:
+            done.add(key)
+            fresh.append((key, found))
+        results[entry.path] = found
+    metrics.record_detectors(seconds, counts)
+    cache.put_many(fresh)
+
+    findings: List[Finding] = []
+    for entry in entries:
+        lines = added.get(entry.path, set()) if added is not None else None
+        numbers = git_lines.get(entry.path)
+        for f in results.get(entry.path, ()):
+            if lines is None or (numbers[f.line - 1] if numbers else f.line) in lines:
+                findings.append(attribute(f.model_copy(), entry.path))
+
+    resp = scan_response(findings)
+    return RepoScanResponse(
+        **resp.model_dump(exclude={"scan_id", "revision"}),
+        target=rev or "working tree",
+        files=len(entries),
+        blobs_scanned=scanned,
+        blobs_reused=reused,
+        files_skipped=skipped,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scan a git working tree, commit or commit range.")
+    parser.add_argument("repo", nargs="?", default=".")
+    parser.add_argument("--rev", help="A commit, or a base..head / base...head range (default: working tree).")
+    args = parser.parse_args(argv)
+    try:
+        resp = scan_repo(args.repo, args.rev)
+    except GitError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(resp.model_dump_json(indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Scan history: an optional SQLite record of scans and their findings.
+
+Enabled by HISTORY_DB (a file path). Scans sent with ?project= (and
+usually ?ref=, a branch or commit) are recorded under an id returned as
+`history_id`, and can then be queried without rescanning anything:
+
+  - trend: finding counts by severity over a project's (or ref's) scans;
+  - compare: findings new in one scan and fixed since another, matched by
+    fingerprint ("what's new on this branch compared to main");
+  - top: the rules or files with the most findings in a scan.
+
+Every query is answered from an index: scans (which carry their counts by
+severity) by (project, ref, time), and findings by (scan, fingerprint),
+(scan, rule) and (scan, file).
+
+Writes never happen on the request path. `record` puts the scan on a
+bounded queue (HISTORY_QUEUE_MAX; a full queue drops the scan and counts
+it) and a writer thread inserts queued scans in batches, one transaction
+per batch of up to HISTORY_BATCH scans gathered over HISTORY_FLUSH_MS.
+Queries flush the queue first, so a scan is visible as soon as its
+response is.
+"""
+
+import atexit
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .findings import HistoryComparison, HistoryFinding, HistoryScan, HistoryTopEntry, ScanResponse
+from . import metrics
+
+
+TOP_COLUMNS = {"rule": "rule_id", "file": "file"}
+
+SEVERITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+# (history id, project, ref, kind, created at, response)
+Entry = Tuple[str, str, Optional[str], str, float, ScanResponse]
+
+
+def _signed(fingerprint: str) -> int:
+    """A 16-hex-digit fingerprint as SQLite's signed 64-bit integer."""
+    key = int(fingerprint, 16)
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def _hex(key: int) -> str:
+    return format(key & ((1 << 64) - 1), "016x")
+
+
+class HistoryNotFound(LookupError):
+    pass
+
+
+class HistoryStore:
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS scans (
+        history_id TEXT PRIMARY KEY, project TEXT NOT NULL, ref TEXT, kind TEXT NOT NULL,
+        created_at REAL NOT NULL, findings_total INTEGER NOT NULL, risk_score INTEGER NOT NULL,
+        low INTEGER NOT NULL, medium INTEGER NOT NULL, high INTEGER NOT NULL, critical INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS scans_by_project ON scans (project, created_at);
+    CREATE INDEX IF NOT EXISTS scans_by_ref ON scans (project, ref, created_at);
+    CREATE TABLE IF NOT EXISTS scan_findings (
+        history_id TEXT NOT NULL, fingerprint INTEGER NOT NULL, rule_id TEXT, detector TEXT NOT NULL,
+        severity TEXT NOT NULL, file TEXT, line INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS findings_by_fingerprint ON scan_findings (history_id, fingerprint);
+    CREATE INDEX IF NOT EXISTS findings_by_rule ON scan_findings (history_id, rule_id);
+    CREATE INDEX IF NOT EXISTS findings_by_file ON scan_findings (history_id, file);
+    """
+
+    _FINDING_COLUMNS = "fingerprint, rule_id, detector, severity, file, line"
+
+    def __init__(self, path: str, batch: int = 256, flush_s: float = 0.2, queue_max: int = 1024):
+        self.path = path
+        self.batch = max(1, batch)
+        self.flush_s = flush_s
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+        self._queue: "queue.Queue[Entry]" = queue.Queue(maxsize=queue_max)
+        self._writer: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["HistoryStore"]:
+        path = os.getenv("HISTORY_DB")
+        if not path:
+            return None
+        return cls(
+            path,
+            batch=int(os.getenv("HISTORY_BATCH", "256")),
+            flush_s=float(os.getenv("HISTORY_FLUSH_MS", "200")) / 1000,
+            queue_max=int(os.getenv("HISTORY_QUEUE_MAX", "1024")),
+        )
+
+    # 1. Writes
+
+    def record(self, project: str, ref: Optional[str], kind: str, resp: ScanResponse) -> Optional[str]:
+        """Queue a scan for writing and return its history id; None if the queue was full."""
+        self._start()
+        history_id = secrets.token_urlsafe(12)
+        try:
+            self._queue.put_nowait((history_id, project, ref, kind, time.time(), resp))
+        except queue.Full:
+            metrics.HISTORY_SCANS.inc(event="dropped")
+            return None
+        metrics.HISTORY_SCANS.inc(event="queued")
+        return history_id
+
+    def flush(self) -> None:
+        """Block until every queued scan has been written (or has failed to)."""
+        self._queue.join()
+
+    def _start(self) -> None:
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="scan-history", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_s
+            while len(batch) < self.batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                metrics.HISTORY_SCANS.inc(len(batch), event="written")
+            except sqlite3.Error:
+                metrics.HISTORY_SCANS.inc(len(batch), event="failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Entry]) -> None:
+        scans = []
+        findings = []
+        for history_id, project, ref, kind, created_at, resp in batch:
+            by_severity = dict.fromkeys(SEVERITIES, 0)
+            for f in resp.findings:
+                by_severity[f.severity] += 1
+            scans.append((history_id, project, ref, kind, created_at, len(resp.findings), resp.risk_score,
+                          *by_severity.values()))
+            findings.extend(
+                (history_id, _signed(f.fingerprint), f.rule_id, f.detector, f.severity, f.file, f.line)
+                for f in resp.findings if f.fingerprint is not None
+            )
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("INSERT INTO scans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", scans)
+                self._db.executemany(f"INSERT INTO scan_findings (history_id, {self._FINDING_COLUMNS}) "
+                                     "VALUES (?, ?, ?, ?, ?, ?, ?)", findings)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # 2. Queries
+
+    def _query(self, sql: str, args: tuple) -> list:
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def resolve(self, project: str, scan: Optional[str] = None) -> str:
+        """A history id, or the latest scan of a ref (or of the project, for None), to a history id."""
+        self.flush()
+        if scan is None:
+            rows = self._query("SELECT history_id FROM scans WHERE project = ? "
+                               "ORDER BY created_at DESC LIMIT 1", (project,))
+        else:
+            rows = self._query("SELECT history_id FROM scans WHERE project = ? AND history_id = ?", (project, scan))
+            if not rows:
+                rows = self._query("SELECT history_id FROM scans WHERE project = ? AND ref = ? "
+                                   "ORDER BY created_at DESC LIMIT 1", (project, scan))
+        if not rows:
+            raise HistoryNotFound(f"No recorded scan {scan!r} in project {project!r}."
+                                  if scan is not None else f"No recorded scans in project {project!r}.")
+        return rows[0][0]
+
+    def _scans(self, where: str, args: tuple) -> List[HistoryScan]:
+        rows = self._query("SELECT history_id, ref, kind, created_at, findings_total, risk_score, "
+                           f"low, medium, high, critical FROM scans WHERE {where}", args)
+        return [
+            HistoryScan(history_id=r[0], ref=r[1], kind=r[2], created_at=r[3], findings=r[4], risk_score=r[5],
+                        by_severity={sev: n for sev, n in zip(SEVERITIES, r[6:]) if n})
+            for r in rows
+        ]
+
+    def trend(self, project: str, ref: Optional[str] = None, limit: int = 50) -> List[HistoryScan]:
+        """The latest `limit` scans of a project (or one ref of it), oldest first."""
+        self.flush()
+        if ref is None:
+            scans = self._scans("project = ? ORDER BY created_at DESC LIMIT ?", (project, limit))
+        else:
+            scans = self._scans("project = ? AND ref = ? ORDER BY created_at DESC LIMIT ?", (project, ref, limit))
+        return scans[::-1]
+
+    def _only_in(self, history_id: str, other_id: str) -> List[HistoryFinding]:
+        rows = self._query(
+            f"SELECT {self._FINDING_COLUMNS} FROM scan_findings AS f WHERE f.history_id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM scan_findings AS o WHERE o.history_id = ? AND o.fingerprint = f.fingerprint) "
+            "ORDER BY f.file, f.line", (history_id, other_id))
+        return [HistoryFinding(fingerprint=_hex(r[0]), rule_id=r[1], detector=r[2], severity=r[3], file=r[4], line=r[5])
+                for r in rows]
+
+    def compare(self, project: str, base: str, head: Optional[str] = None) -> HistoryComparison:
+        """Findings new in `head` (default: the project's latest scan) and fixed since `base`."""
+        base_id = self.resolve(project, base)
+        head_id = self.resolve(project, head)
+        scans = {s.history_id: s for s in self._scans("history_id IN (?, ?)", (base_id, head_id))}
+        return HistoryComparison(
+            base=scans[base_id], head=scans[head_id],
+            new=self._only_in(head_id, base_id), fixed=self._only_in(base_id, head_id),
+        )
+
+    def top(self, project: str, by: str = "rule", scan: Optional[str] = None, limit: int = 10) -> List[HistoryTopEntry]:
+        """The rules (or files) with the most findings in a scan (default: the project's latest)."""
+        column = TOP_COLUMNS[by]
+        history_id = self.resolve(project, scan)
+        rows = self._query(f"SELECT {column}, COUNT(*) AS n FROM scan_findings WHERE history_id = ? "
+                           f"GROUP BY {column} ORDER BY n DESC, {column} LIMIT ?", (history_id, limit))
+        return [HistoryTopEntry(key=r[0], findings=r[1]) for r in rows]
+
+
+STORE = HistoryStore.from_env()
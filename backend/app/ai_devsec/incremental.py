@@ -0,0 +1,294 @@
+"""
+Incremental re-scans for editor-style clients.
+
+Every /scan opens a session: the scanned buffer, its tokenized ScanContext
+and its findings are kept under a random scan id. A follow-up request with
+line-range edits splices them into the buffer, re-tokenizes from the edit
+until the token stream lines up with the old one again, and runs the
+detectors only over the lines whose text or comment/string state changed.
+Findings above that range are kept, findings below it are shifted by the
+change in line count. The result is identical to a full scan of the edited
+buffer; the buffer itself is still spliced and re-split (memcpy-speed), but
+regex work is proportional to the edit.
+
+A full rescan happens instead when the file type sniffed from the new
+buffer differs, or the ruleset was reloaded since the last scan.
+
+Sessions live in process memory, bounded by count (SCAN_SESSIONS_MAX),
+total buffer size (SCAN_SESSIONS_MAX_MB) and idle time (SCAN_SESSION_TTL_S);
+the least recently used session is evicted first. A client that gets a 404
+simply sends the whole buffer to /scan again.
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .baseline import attribute
+from .context import ScanContext
+from .filetypes import classify
+from .findings import Finding, LineEdit, RescanRequest, ScanRequest, ScanResponse
+from .ruleset import Ruleset, get_ruleset
+from .service import run_context, scan_response
+from . import metrics
+
+
+class SessionNotFound(LookupError):
+    """The scan id is unknown, expired or was evicted."""
+
+
+class RevisionConflict(RuntimeError):
+    """The edits were made against an older revision of the buffer."""
+
+
+# Sessions
+
+class ScanSession:
+    __slots__ = ("scan_id", "filename", "ctx", "findings", "ids", "ruleset_version",
+                 "revision", "lock", "last_rescan", "_next_id")
+
+    def __init__(self, scan_id: str, filename: Optional[str], ctx: ScanContext,
+                 findings: List[Finding], ruleset_version: str):
+        self.scan_id = scan_id
+        self.filename = filename
+        self.ctx = ctx
+        self.findings = findings
+        # ids[i] identifies findings[i] for as long as it survives edits (it may move lines)
+        self._next_id = 0
+        self.ids: List[int] = [self.new_id() for _ in findings]
+        self.ruleset_version = ruleset_version
+        self.revision = 0
+        self.lock = threading.Lock()
+        # 0-based [first, last) line range the last update rescanned
+        self.last_rescan: Tuple[int, int] = (0, len(ctx.lines))
+
+    def new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    @property
+    def size(self) -> int:
+        return len(self.ctx.code)
+
+
+class SessionStore:
+    """LRU + TTL map of scan id -> session, bounded by count and buffer bytes."""
+
+    def __init__(self, max_sessions: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 900.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Tuple[ScanSession, float]]" = OrderedDict()
+        self._bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        return cls(
+            max_sessions=int(os.getenv("SCAN_SESSIONS_MAX", "256")),
+            max_bytes=int(float(os.getenv("SCAN_SESSIONS_MAX_MB", "64")) * 1024 * 1024),
+            ttl=float(os.getenv("SCAN_SESSION_TTL_S", "900")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def put(self, session: ScanSession) -> None:
+        with self._lock:
+            self._drop(session.scan_id)
+            self._sessions[session.scan_id] = (session, time.monotonic())
+            self._bytes += session.size
+            self._evict()
+
+    def get(self, scan_id: str) -> Optional[ScanSession]:
+        with self._lock:
+            entry = self._sessions.get(scan_id)
+            if entry is None:
+                return None
+            session, touched = entry
+            if time.monotonic() - touched > self.ttl:
+                self._drop(scan_id)
+                return None
+            self._sessions[scan_id] = (session, time.monotonic())
+            self._sessions.move_to_end(scan_id)
+            return session
+
+    def resize(self, session: ScanSession, old_size: int) -> None:
+        """Account for a session whose buffer changed size in place."""
+        with self._lock:
+            if session.scan_id in self._sessions:
+                self._bytes += session.size - old_size
+                self._evict()
+
+    def _drop(self, scan_id: str) -> None:
+        entry = self._sessions.pop(scan_id, None)
+        if entry is not None:
+            self._bytes -= entry[0].size
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            oldest_id, (oldest, touched) = next(iter(self._sessions.items()))
+            over = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if not over and now - touched <= self.ttl:
+                break
+            self._drop(oldest_id)
+
+
+STORE = SessionStore.from_env()
+
+
+# Scanning
+
+def _finish(session: ScanSession) -> ScanResponse:
+    resp = scan_response(session.findings)
+    resp.scan_id = session.scan_id
+    resp.revision = session.revision
+    return resp
+
+
+def _scan(ctx: ScanContext, filename: Optional[str], ruleset: Ruleset) -> List[Finding]:
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    findings = run_context(ctx, seconds, counts, ruleset)
+    for f in findings:
+        attribute(f, filename)
+    metrics.record_detectors(seconds, counts)
+    return findings
+
+
+def new_session(code: str, filename: Optional[str]) -> ScanSession:
+    """Full scan of `code`, kept as a session that later edits can rescan incrementally."""
+    ruleset = get_ruleset()
+    ctx = ScanContext(code, classify(filename, code))
+    return ScanSession(secrets.token_urlsafe(12), filename, ctx,
+                       _scan(ctx, filename, ruleset), ruleset.version)
+
+
+def open_session(req: ScanRequest) -> ScanResponse:
+    session = new_session(req.code, req.filename)
+    STORE.put(session)
+    return _finish(session)
+
+
+def _has_break(text: str) -> bool:
+    return text != "".join(text.splitlines())
+
+
+def splice(code: str, edits: List[LineEdit]) -> Tuple[str, int, int]:
+    """
+    Apply line-range edits in order. Returns the new buffer plus the length
+    of the prefix and of the suffix it shares with `code`, so the caller
+    knows exactly which characters changed.
+    """
+    pieces = code.splitlines(True)
+    old_pieces = len(pieces)
+    keep_head = keep_tail = old_pieces
+    for edit in edits:
+        n = len(pieces)
+        s, e = edit.start_line - 1, edit.end_line
+        if not (0 <= s <= n and s <= e <= n):
+            raise ValueError(
+                f"edit {edit.start_line}-{edit.end_line} is outside the {n}-line buffer"
+            )
+        if any(_has_break(line) for line in edit.lines):
+            raise ValueError("replacement lines must not contain line breaks")
+        inserted = [line + "\n" for line in edit.lines]
+        if e == n and pieces and not _has_break(pieces[-1]):
+            if s == e:
+                # appending after an unterminated last line: that line gains a break
+                s -= 1
+                inserted.insert(0, pieces[-1] + "\n")
+            if inserted:
+                inserted[-1] = inserted[-1][:-1]
+                if not inserted[-1]:
+                    inserted.pop()
+        tail = n - e
+        # a lone "\r" line ending followed by a "\n" line is one "\r\n" line to splitlines()
+        if s > 0 and pieces[s - 1].endswith("\r") and (inserted or pieces[e:])[:1] == ["\n"]:
+            s -= 1
+            inserted.insert(0, pieces[s] + "\n")
+            if len(inserted) == 1:
+                e += 1
+                tail -= 1
+            else:
+                inserted.pop(1)
+        if inserted and inserted[-1].endswith("\r") and pieces[e:e + 1] == ["\n"]:
+            inserted[-1] += "\n"
+            e += 1
+            tail -= 1
+        pieces[s:e] = inserted
+        keep_head = min(keep_head, s)
+        keep_tail = min(keep_tail, tail)
+
+    new_code = "".join(pieces)
+    head = sum(map(len, pieces[:keep_head]))
+    tail = sum(map(len, pieces[len(pieces) - keep_tail:])) if keep_tail else 0
+    # an edit can touch the line just before or after the kept ranges (e.g. undo a break)
+    head = min(head, len(code), len(new_code))
+    tail = min(tail, len(code) - head, len(new_code) - head)
+    return new_code, head, tail
+
+
+def rescan(session: ScanSession, new_code: str, head: int, tail: int) -> None:
+    """
+    Move `session` to `new_code`, which shares `head` leading and `tail`
+    trailing characters with the session's buffer, rescanning only what
+    changed. Callers hold session.lock.
+    """
+    old = session.ctx
+    ruleset = get_ruleset()
+    ctx = ScanContext(new_code, classify(session.filename, new_code))
+
+    if ctx.file_type != old.file_type or ruleset.version != session.ruleset_version:
+        findings = _scan(ctx, session.filename, ruleset)
+        ids = [session.new_id() for _ in findings]
+        session.last_rescan = (0, len(ctx.lines))
+    else:
+        first, last = ctx.retokenize(old, head, len(old.code) - tail)
+        ctx.set_window(first, last)
+        fresh = _scan(ctx, session.filename, ruleset)
+        line_delta = len(ctx.lines) - len(old.lines)
+        old_last = last - line_delta
+        kept: List[Tuple[int, Finding]] = []
+        for fid, f in zip(session.ids, session.findings):
+            if f.line <= first:
+                kept.append((fid, f))
+            elif f.line > old_last:
+                kept.append((fid, f.model_copy(update={"line": f.line + line_delta})))
+        # same order as a full scan: detector by detector, then by line
+        order = {d.name: i for i, (d, _) in enumerate(ruleset.route(ctx.file_type))}
+        merged = sorted(
+            kept + [(session.new_id(), f) for f in fresh],
+            key=lambda p: (order.get(p[1].detector, len(order)), p[1].line),
+        )
+        ids = [fid for fid, _ in merged]
+        findings = [f for _, f in merged]
+        session.last_rescan = (first, last)
+        ctx.set_window(0, len(ctx.lines))
+
+    session.ctx = ctx
+    session.findings = findings
+    session.ids = ids
+    session.ruleset_version = ruleset.version
+    session.revision += 1
+
+
+def apply_edits(scan_id: str, req: RescanRequest) -> ScanResponse:
+    session = STORE.get(scan_id)
+    metrics.record_cache("scan_session", session is not None)
+    if session is None:
+        raise SessionNotFound(scan_id)
+
+    with session.lock:
+        if req.revision is not None and req.revision != session.revision:
+            raise RevisionConflict(
+                f"edits are against revision {req.revision}, the buffer is at {session.revision}"
+            )
+        old_size = session.size
+        rescan(session, *splice(session.ctx.code, req.edits))
+        STORE.resize(session, old_size)
+        return _finish(session)
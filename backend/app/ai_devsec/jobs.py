@@ -0,0 +1,474 @@
+"""
+Asynchronous scan jobs, for inputs too large to scan inside one request.
+
+POST /jobs stores the files and returns a job id straight away. Job ids wait
+in a bounded in-process queue (JOBS_QUEUE_MAX); when it is full a
+submission is rejected instead of buffered. JOBS_WORKERS dispatcher threads
+take jobs off the queue and feed them, batch by batch (JOBS_BATCH_MB of
+code per batch), to a pool of as many worker processes. After every batch
+the job's progress and findings are written to the store, so GET
+/jobs/{job_id} shows partial results while the job runs. Finished jobs are
+kept for JOBS_RESULT_TTL_S.
+
+The pool and dispatchers start with the first submission (or, with JOBS_DB,
+when the app starts), never on a status poll. If a worker process dies
+(OOM-killed, say) the pool breaks and every batch in flight on it fails;
+the pool is replaced and each of those batches is retried on the new one,
+up to JOBS_POOL_RETRIES times, so only a job that keeps killing workers
+fails. Workers are started with forkserver (spawn where that is missing),
+never forked from the threaded server process itself.
+
+The store is behind the JobStore interface. The default keeps everything in
+memory; with JOBS_DB set, jobs live in that SQLite file, and jobs that a
+stopped process left queued or running are picked up again, from the first
+file without results, when the next process starts.
+"""
+
+import copy
+import multiprocessing
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .findings import Finding, JobStatus, ScanRequest
+from .service import run_scan, scan_response
+from . import metrics
+
+
+MB = 1024 * 1024
+
+FileEntry = Tuple[str, str]     # (filename, code)
+
+
+class QueueFull(RuntimeError):
+    """The job queue is at capacity; retry later."""
+
+
+class JobsUnavailable(RuntimeError):
+    """Jobs are disabled (JOBS_WORKERS=0) or the queue is shutting down."""
+
+
+class Job:
+    __slots__ = ("job_id", "status", "files_total", "files_done", "bytes_total", "bytes_done",
+                 "findings_total", "risk_score", "summary", "error",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, job_id: str, files_total: int, bytes_total: int, created_at: float, **fields):
+        self.job_id = job_id
+        self.status = "queued"
+        self.files_total = files_total
+        self.files_done = 0
+        self.bytes_total = bytes_total
+        self.bytes_done = 0
+        self.findings_total = 0
+        self.risk_score: Optional[int] = None
+        self.summary: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = created_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+
+# 1. Stores
+
+class JobStore(ABC):
+    """Where jobs, their pending files and their findings are kept. Thread-safe."""
+
+    @abstractmethod
+    def add(self, job: Job, files: List[FileEntry]) -> None: ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """A snapshot of the job; later changes are not reflected in it."""
+
+    @abstractmethod
+    def files(self, job_id: str, start: int = 0) -> List[FileEntry]:
+        """The job's files from index `start` on; empty once the job finished."""
+
+    @abstractmethod
+    def findings(self, job_id: str, offset: int = 0) -> List[Finding]: ...
+
+    @abstractmethod
+    def start(self, job_id: str, now: float) -> None: ...
+
+    @abstractmethod
+    def progress(self, job_id: str, files: int, size: int, findings: List[Finding]) -> None:
+        """Record one finished batch: its file count, size and findings, atomically."""
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, now: float, error: Optional[str] = None,
+               risk_score: Optional[int] = None, summary: Optional[str] = None) -> None:
+        """Mark the job done or failed and drop its files."""
+
+    @abstractmethod
+    def unfinished(self) -> List[str]:
+        """Ids of queued or running jobs, oldest first."""
+
+    @abstractmethod
+    def purge(self, finished_before: float) -> int:
+        """Delete jobs that finished before the given time; returns how many."""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._files: Dict[str, List[FileEntry]] = {}
+        self._findings: Dict[str, List[Finding]] = {}
+
+    def add(self, job, files):
+        with self._lock:
+            self._jobs[job.job_id] = copy.copy(job)
+            self._files[job.job_id] = list(files)
+            self._findings[job.job_id] = []
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.copy(job) if job is not None else None
+
+    def files(self, job_id, start=0):
+        with self._lock:
+            return self._files.get(job_id, [])[start:]
+
+    def findings(self, job_id, offset=0):
+        with self._lock:
+            return self._findings.get(job_id, [])[offset:]
+
+    def start(self, job_id, now):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status = "running"
+            job.started_at = job.started_at or now
+
+    def progress(self, job_id, files, size, findings):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.files_done += files
+            job.bytes_done += size
+            job.findings_total += len(findings)
+            self._findings[job_id].extend(findings)
+
+    def finish(self, job_id, status, now, error=None, risk_score=None, summary=None):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status, job.finished_at, job.error = status, now, error
+            job.risk_score, job.summary = risk_score, summary
+            self._files.pop(job_id, None)
+
+    def unfinished(self):
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j.status in ("queued", "running")]
+        return [j.job_id for j in sorted(jobs, key=lambda j: j.created_at)]
+
+    def purge(self, finished_before):
+        with self._lock:
+            expired = [jid for jid, j in self._jobs.items()
+                       if j.finished_at is not None and j.finished_at < finished_before]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._findings.pop(job_id, None)
+        return len(expired)
+
+
+class SqliteJobStore(JobStore):
+    """Jobs in a SQLite file, so queued and running jobs survive a restart."""
+
+    _COLUMNS = Job.__slots__
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY, status TEXT NOT NULL,
+        files_total INTEGER NOT NULL, files_done INTEGER NOT NULL,
+        bytes_total INTEGER NOT NULL, bytes_done INTEGER NOT NULL,
+        findings_total INTEGER NOT NULL, risk_score INTEGER, summary TEXT, error TEXT,
+        created_at REAL NOT NULL, started_at REAL, finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+    CREATE INDEX IF NOT EXISTS jobs_by_finished ON jobs (finished_at);
+    CREATE TABLE IF NOT EXISTS job_files (
+        job_id TEXT NOT NULL, seq INTEGER NOT NULL, filename TEXT NOT NULL, code TEXT NOT NULL,
+        PRIMARY KEY (job_id, seq)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS job_findings (
+        job_id TEXT NOT NULL, seq INTEGER NOT NULL, finding TEXT NOT NULL,
+        PRIMARY KEY (job_id, seq)
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self._SCHEMA)
+
+    def _write(self, *statements: Tuple[str, object]) -> None:
+        """Run statements in one transaction; a list of argument tuples means executemany."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, args in statements:
+                    if isinstance(args, list):
+                        self._db.executemany(sql, args)
+                    else:
+                        self._db.execute(sql, args)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _query(self, sql: str, args: tuple) -> list:
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def add(self, job, files):
+        cols = ", ".join(self._COLUMNS)
+        marks = ", ".join("?" for _ in self._COLUMNS)
+        self._write(
+            (f"INSERT INTO jobs ({cols}) VALUES ({marks})", tuple(getattr(job, c) for c in self._COLUMNS)),
+            ("INSERT INTO job_files VALUES (?, ?, ?, ?)",
+             [(job.job_id, i, name, code) for i, (name, code) in enumerate(files)]),
+        )
+
+    def get(self, job_id):
+        rows = self._query(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        fields = dict(zip(self._COLUMNS, rows[0]))
+        return Job(fields.pop("job_id"), fields.pop("files_total"), fields.pop("bytes_total"),
+                   fields.pop("created_at"), **fields)
+
+    def files(self, job_id, start=0):
+        rows = self._query(
+            "SELECT filename, code FROM job_files WHERE job_id = ? AND seq >= ? ORDER BY seq",
+            (job_id, start),
+        )
+        return [tuple(r) for r in rows]
+
+    def findings(self, job_id, offset=0):
+        rows = self._query(
+            "SELECT finding FROM job_findings WHERE job_id = ? AND seq >= ? ORDER BY seq",
+            (job_id, offset),
+        )
+        return [Finding.model_validate_json(r[0]) for r in rows]
+
+    def start(self, job_id, now):
+        self._write(("UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) "
+                     "WHERE job_id = ?", (now, job_id)))
+
+    def progress(self, job_id, files, size, findings):
+        self._write(
+            ("INSERT INTO job_findings SELECT ?, findings_total + ?, ? FROM jobs WHERE job_id = ?",
+             [(job_id, i, f.model_dump_json(), job_id) for i, f in enumerate(findings)]),
+            ("UPDATE jobs SET files_done = files_done + ?, bytes_done = bytes_done + ?, "
+             "findings_total = findings_total + ? WHERE job_id = ?",
+             (files, size, len(findings), job_id)),
+        )
+
+    def finish(self, job_id, status, now, error=None, risk_score=None, summary=None):
+        self._write(
+            ("UPDATE jobs SET status = ?, finished_at = ?, error = ?, risk_score = ?, summary = ? "
+             "WHERE job_id = ?", (status, now, error, risk_score, summary, job_id)),
+            ("DELETE FROM job_files WHERE job_id = ?", (job_id,)),
+        )
+
+    def unfinished(self):
+        rows = self._query(
+            "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at", ()
+        )
+        return [r[0] for r in rows]
+
+    def purge(self, finished_before):
+        with self._lock:
+            expired = [r[0] for r in self._db.execute(
+                "SELECT job_id FROM jobs WHERE finished_at < ?", (finished_before,)
+            )]
+        if expired:
+            self._write(
+                ("DELETE FROM job_findings WHERE job_id = ?", [(j,) for j in expired]),
+                ("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired]),
+            )
+        return len(expired)
+
+
+# 2. Worker processes
+
+def _scan_files(files: List[FileEntry]) -> List[dict]:
+    """Runs in a pool process: scan each file on its own, return plain dicts."""
+    found: List[dict] = []
+    for filename, code in files:
+        if code.strip():
+            found.extend(f.model_dump() for f in run_scan(ScanRequest(code=code, filename=filename)).findings)
+    return found
+
+
+def _batches(files: List[FileEntry], batch_bytes: int) -> Iterator[List[FileEntry]]:
+    batch: List[FileEntry] = []
+    size = 0
+    for entry in files:
+        batch.append(entry)
+        size += len(entry[1])
+        if size >= batch_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+# 3. Queue and dispatchers
+
+class JobManager:
+    def __init__(self, store: JobStore, workers: int = 2, queue_max: int = 32, ttl: float = 3600.0,
+                 batch_bytes: int = MB, max_bytes: int = 64 * MB, pool_retries: int = 2):
+        self.store = store
+        self.workers = workers
+        self.pool_retries = pool_retries
+        self.ttl = ttl
+        self.batch_bytes = batch_bytes
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_max)
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+        self._state = "new"      # new -> running -> stopped
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        path = os.getenv("JOBS_DB")
+        return cls(
+            SqliteJobStore(path) if path else MemoryJobStore(),
+            workers=int(os.getenv("JOBS_WORKERS", "2")),
+            queue_max=int(os.getenv("JOBS_QUEUE_MAX", "32")),
+            ttl=float(os.getenv("JOBS_RESULT_TTL_S", "3600")),
+            batch_bytes=int(float(os.getenv("JOBS_BATCH_MB", "1")) * MB),
+            max_bytes=int(float(os.getenv("JOBS_MAX_MB", "64")) * MB),
+            pool_retries=int(os.getenv("JOBS_POOL_RETRIES", "2")),
+        )
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # a plain fork would copy locks other threads hold (store, metrics) into the worker
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+
+    def start(self) -> None:
+        """Start the pool and dispatchers, and requeue jobs a previous process left unfinished."""
+        with self._lock:
+            if self._state != "new" or self.workers < 1:
+                return
+            self._pool = self._new_pool()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work, name=f"scan-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._state = "running"
+            for job_id in self.store.unfinished():
+                try:
+                    self._queue.put_nowait(job_id)
+                except queue.Full:
+                    self.store.finish(job_id, "failed", time.time(),
+                                      error="job queue was full when resuming after a restart")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop taking jobs. Jobs still queued or mid-run stay unfinished in the store."""
+        with self._lock:
+            if self._state != "running":
+                self._state = "stopped"
+                return
+            self._state = "stopped"
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, files: List[FileEntry]) -> Job:
+        self.start()
+        if self._state != "running":
+            raise JobsUnavailable(
+                "scan jobs are disabled (JOBS_WORKERS=0)" if self.workers < 1 else "the job queue is shutting down"
+            )
+        size = sum(len(code) for _, code in files)
+        if size > self.max_bytes:
+            raise ValueError(f"job is {size / MB:.1f} MB, the limit is {self.max_bytes / MB:.0f} MB")
+        self.store.purge(time.time() - self.ttl)
+        with self._lock:
+            # only dispatchers take from the queue, so it cannot fill up between these lines
+            if self._queue.full():
+                metrics.JOBS.inc(event="rejected")
+                raise QueueFull(f"{self._queue.maxsize} jobs are already waiting")
+            job = Job(secrets.token_urlsafe(12), len(files), size, time.time())
+            self.store.add(job, files)
+            self._queue.put_nowait(job.job_id)
+        metrics.JOBS.inc(event="submitted")
+        return job
+
+    def status(self, job_id: str, offset: int = 0) -> Optional[JobStatus]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        expires_at = job.finished_at + self.ttl if job.finished_at is not None else None
+        if expires_at is not None and expires_at < time.time():
+            return None
+        fields = {name: getattr(job, name) for name in Job.__slots__}
+        return JobStatus(
+            **fields, expires_at=expires_at,
+            findings=self.store.findings(job_id, offset), findings_offset=offset,
+        )
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            if self._state != "running":
+                continue        # left queued in the store for the next process
+            try:
+                self._run(job_id)
+            except Exception as e:      # one bad job must not take a dispatcher down
+                self.store.finish(job_id, "failed", time.time(), error=f"{type(e).__name__}: {e}")
+                metrics.JOBS.inc(event="failed")
+
+    def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return
+        self.store.start(job_id, time.time())
+        for batch in _batches(self.store.files(job_id, job.files_done), self.batch_bytes):
+            if self._state != "running":
+                return          # resumes from files_done next time
+            found = self._scan_batch(batch)
+            self.store.progress(job_id, len(batch), sum(len(code) for _, code in batch),
+                                [Finding(**f) for f in found])
+        resp = scan_response(self.store.findings(job_id))
+        self.store.finish(job_id, "done", time.time(), risk_score=resp.risk_score, summary=resp.summary)
+        metrics.JOBS.inc(event="done")
+
+    def _scan_batch(self, batch: List[FileEntry]) -> List[dict]:
+        """Scan one batch in the pool, on a fresh pool if a worker death broke the current one."""
+        for attempt in range(self.pool_retries + 1):
+            pool = self._pool
+            try:
+                return pool.submit(_scan_files, batch).result()
+            except BrokenProcessPool:
+                # whichever job's batch killed the worker, every batch in flight lands here
+                with self._lock:
+                    if self._pool is pool and self._state == "running":
+                        self._pool = self._new_pool()
+                if attempt == self.pool_retries or self._state != "running":
+                    raise
+                metrics.JOBS.inc(event="retried")
+
+
+MANAGER = JobManager.from_env()
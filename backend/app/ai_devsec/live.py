@@ -0,0 +1,225 @@
+"""
+Live scanning over a WebSocket, for editor integrations.
+
+One connection carries any number of open documents. Messages are JSON:
+
+  client -> server
+    {"type": "open",  "doc": "a.py", "text": "...", "filename": "a.py"}
+    {"type": "edit",  "doc": "a.py", "version": 7, "edits": [LineEdit, ...]}
+    {"type": "close", "doc": "a.py"}
+
+  server -> client
+    {"type": "findings", "doc": "a.py", "version": 7,
+     "added": [{"id": 12, ...Finding}], "removed": [3, 4], "moved": [{"id": 9, "line": 41}],
+     "risk_score": 80, "summary": "..."}
+    {"type": "error", "doc": "a.py", "message": "..."}
+
+Edits are the same line-range replacements as /scan/{scan_id}/edits and
+are spliced into the document as they arrive, so a bad range is reported
+straight away. Scanning is debounced (LIVE_DEBOUNCE_MS): every edit
+restarts the timer, and edits that arrive while a scan is running make
+that scan superseded — its result is folded into the document but not
+sent, and the newer text is scanned right after. Scans run in a worker
+thread on the incremental engine, so only changed lines are rescanned,
+and events are diffs against what the client was last sent: finding ids
+stay stable while a finding only changes line.
+
+Per connection, at most LIVE_MAX_DOCS documents and LIVE_MAX_MB of
+document text are held; a message above LIVE_MAX_MESSAGE_MB closes the
+connection with 1009.
+"""
+
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import TypeAdapter, ValidationError
+
+from .findings import LineEdit
+from .incremental import ScanSession, new_session, rescan, splice
+from .service import scan_response
+
+
+_EDITS = TypeAdapter(List[LineEdit])
+
+
+class _Limits:
+    def __init__(self):
+        self.debounce = float(os.getenv("LIVE_DEBOUNCE_MS", "75")) / 1000
+        self.max_docs = int(os.getenv("LIVE_MAX_DOCS", "16"))
+        self.max_bytes = int(float(os.getenv("LIVE_MAX_MB", "16")) * 1024 * 1024)
+        self.max_message = int(float(os.getenv("LIVE_MAX_MESSAGE_MB", "4")) * 1024 * 1024)
+
+
+class LiveDoc:
+    """One open document: its scan session, unscanned edits and what the client has seen."""
+
+    def __init__(self, name: str, session: ScanSession):
+        self.name = name
+        self.session = session
+        self.text = session.ctx.code        # latest text, including unscanned edits
+        self.version: Optional[int] = None
+        # Unscanned change relative to the session's buffer: (base length, head, tail)
+        self.pending: Optional[tuple] = None
+        self.task: Optional[asyncio.Task] = None
+        self.scanning = False
+        self.sent: Dict[int, int] = {}      # finding id -> line, as last sent
+
+    def edit(self, edits: List[LineEdit]) -> None:
+        new_text, head, tail = splice(self.text, edits)
+        if self.pending is None:
+            base_len = len(self.text)
+        else:
+            base_len, h, t = self.pending
+            head, tail = min(head, h), min(tail, t)
+        head = min(head, base_len, len(new_text))
+        tail = min(tail, base_len - head, len(new_text) - head)
+        self.text = new_text
+        self.pending = (base_len, head, tail)
+
+    def events(self) -> dict:
+        session = self.session
+        current = dict(zip(session.ids, session.findings))
+        added = [
+            {"id": fid, **f.model_dump()} for fid, f in current.items() if fid not in self.sent
+        ]
+        removed = [fid for fid in self.sent if fid not in current]
+        moved = [
+            {"id": fid, "line": f.line}
+            for fid, f in current.items()
+            if fid in self.sent and self.sent[fid] != f.line
+        ]
+        self.sent = {fid: f.line for fid, f in current.items()}
+        resp = scan_response(session.findings)
+        return {
+            "type": "findings", "doc": self.name, "version": self.version,
+            "added": added, "removed": removed, "moved": moved,
+            "risk_score": resp.risk_score, "summary": resp.summary,
+        }
+
+
+def _rescan(session: ScanSession, text: str, head: int, tail: int) -> None:
+    with session.lock:
+        rescan(session, text, head, tail)
+
+
+class LiveConnection:
+    def __init__(self, websocket: WebSocket):
+        self.ws = websocket
+        self.limits = _Limits()
+        self.docs: Dict[str, LiveDoc] = {}
+
+    def _bytes(self, doc_name: str = "", extra: int = 0) -> int:
+        return sum(len(d.text) for name, d in self.docs.items() if name != doc_name) + extra
+
+    async def _error(self, doc: Optional[str], message: str) -> None:
+        await self.ws.send_json({"type": "error", "doc": doc, "message": message})
+
+    async def _scan_later(self, doc: LiveDoc) -> None:
+        await asyncio.sleep(self.limits.debounce)    # cancelled by a newer edit
+        # From here on the task is never cancelled by edits; it loops until caught up.
+        doc.scanning = True
+        try:
+            while doc.pending is not None:
+                # snapshot on the event loop; edits arriving meanwhile start a new pending change
+                (_, head, tail), text = doc.pending, doc.text
+                doc.pending = None
+                await asyncio.to_thread(_rescan, doc.session, text, head, tail)
+                if doc.pending is not None:
+                    continue                           # superseded while scanning: don't send
+                await self.ws.send_json(doc.events())
+        finally:
+            doc.scanning = False
+
+    def _schedule(self, doc: LiveDoc) -> None:
+        if doc.scanning:
+            return                                     # the running loop picks the edit up
+        if doc.task is not None and not doc.task.done():
+            doc.task.cancel()
+        doc.task = asyncio.create_task(self._scan_later(doc))
+
+    async def handle(self, msg: dict) -> None:
+        kind, name = msg.get("type"), msg.get("doc")
+        if not isinstance(name, str) or not name:
+            await self._error(None, "every message needs a 'doc' name")
+            return
+
+        if kind == "open":
+            text = msg.get("text")
+            if not isinstance(text, str):
+                await self._error(name, "'open' needs the document 'text'")
+                return
+            filename = msg.get("filename")
+            if filename is not None and not isinstance(filename, str):
+                await self._error(name, "'filename' must be a string")
+                return
+            if name not in self.docs and len(self.docs) >= self.limits.max_docs:
+                await self._error(name, f"at most {self.limits.max_docs} open documents per connection")
+                return
+            if self._bytes(name, len(text)) > self.limits.max_bytes:
+                await self._error(name, "connection memory limit exceeded")
+                return
+            self._close(name)
+            session = await asyncio.to_thread(new_session, text, filename)
+            doc = self.docs[name] = LiveDoc(name, session)
+            doc.version = msg.get("version")
+            await self.ws.send_json(doc.events())
+
+        elif kind == "edit":
+            doc = self.docs.get(name)
+            if doc is None:
+                await self._error(name, "document is not open")
+                return
+            try:
+                edits = _EDITS.validate_python(msg.get("edits"))
+                previous = (doc.text, doc.pending)
+                doc.edit(edits)
+            except (ValidationError, ValueError) as e:
+                await self._error(name, f"edit rejected: {e}")
+                return
+            if self._bytes() > self.limits.max_bytes:
+                doc.text, doc.pending = previous
+                await self._error(name, "connection memory limit exceeded")
+                return
+            doc.version = msg.get("version")
+            self._schedule(doc)
+
+        elif kind == "close":
+            self._close(name)
+
+        else:
+            await self._error(name, f"unknown message type {kind!r}")
+
+    def _close(self, name: str) -> None:
+        doc = self.docs.pop(name, None)
+        if doc is not None and doc.task is not None:
+            doc.task.cancel()
+
+    async def serve(self) -> None:
+        await self.ws.accept()
+        try:
+            while True:
+                raw = await self.ws.receive_text()
+                if len(raw) > self.limits.max_message:
+                    await self.ws.close(code=1009)
+                    return
+                try:
+                    msg = json.loads(raw)
+                except json.JSONDecodeError:
+                    await self._error(None, "messages must be JSON")
+                    continue
+                if not isinstance(msg, dict):
+                    await self._error(None, "messages must be JSON objects")
+                    continue
+                await self.handle(msg)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for name in list(self.docs):
+                self._close(name)
+
+
+async def serve(websocket: WebSocket) -> None:
+    await LiveConnection(websocket).serve()
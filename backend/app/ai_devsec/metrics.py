@@ -0,0 +1,216 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+A deliberately tiny Counter/Histogram implementation so the service does
+not need prometheus_client. Every metric keeps one lock; hot paths (the
+scan loop) accumulate locally and record once per scan, so the cost on
+the detector path is one perf_counter pair per detector.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+
+LabelValues = Tuple[str, ...]
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Input size buckets, in characters (1 KB .. 16 MB)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(8))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def inc_many(self, amounts: Dict[str, float], label: str) -> None:
+        """Add several values keyed by a single label, under one lock."""
+        with self._lock:
+            for value, amount in amounts.items():
+                key = self._key({label: value})
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labels, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][idx] += 1
+            series[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        out: List[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % _fmt_value(bound)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# Metric definitions
+
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "ai_devsec_http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+))
+
+SCAN_INPUT_CHARS = REGISTRY.register(Histogram(
+    "ai_devsec_scan_input_chars",
+    "Size of scan request bodies in characters.",
+    ["endpoint"],
+    buckets=SIZE_BUCKETS,
+))
+
+DETECTOR_SECONDS = REGISTRY.register(Counter(
+    "ai_devsec_detector_seconds_total",
+    "Wall time spent inside each detector.",
+    ["detector"],
+))
+
+DETECTOR_FINDINGS = REGISTRY.register(Counter(
+    "ai_devsec_detector_findings_total",
+    "Findings produced by each detector.",
+    ["detector"],
+))
+
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "ai_devsec_cache_lookups_total",
+    "Cache lookups by cache name and result (hit/miss).",
+    ["cache", "result"],
+))
+
+JOBS = REGISTRY.register(Counter(
+    "ai_devsec_jobs_total",
+    "Scan jobs by event (submitted/rejected/retried/done/failed).",
+    ["event"],
+))
+
+HISTORY_SCANS = REGISTRY.register(Counter(
+    "ai_devsec_history_scans_total",
+    "Scans sent to the history store, by event (queued/dropped/written/failed).",
+    ["event"],
+))
+
+CLUSTER_SHARDS = REGISTRY.register(Counter(
+    "ai_devsec_cluster_shards_total",
+    "Shards sent to cluster workers, by event (done/retried/failed).",
+    ["event"],
+))
+
+CLAUDE_LATENCY = REGISTRY.register(Histogram(
+    "ai_devsec_claude_request_duration_seconds",
+    "Latency of upstream Anthropic Messages API calls.",
+    ["status"],
+))
+
+CLAUDE_TOKENS = REGISTRY.register(Counter(
+    "ai_devsec_claude_tokens_total",
+    "Tokens reported by the Anthropic API, by direction (input/output).",
+    ["direction"],
+))
+
+
+def record_detectors(seconds: Dict[str, float], findings: Dict[str, int]) -> None:
+    """Flush one scan's per-detector accumulators."""
+    DETECTOR_SECONDS.inc_many(seconds, "detector")
+    DETECTOR_FINDINGS.inc_many(findings, "detector")
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
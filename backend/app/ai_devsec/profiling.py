@@ -0,0 +1,128 @@
+"""
+On-demand scan profiling.
+
+Only reached when a request opts in with ?profile=true, so the normal scan
+path carries no extra cost. Detector timings and per-rule numbers both come
+from the real scan: each routed rule's regexes (and its exclude/requires
+helpers) are swapped for counting wrappers for this one scan, so
+`evaluations` is how many times the engine actually ran a regex, after the
+anchor prefilter, comment skipping and first-match early exits. A rule the
+prefilter ruled out everywhere shows 0. The wrappers' own overhead is
+included in the per-rule seconds, so those run a little above an
+unprofiled scan.
+"""
+
+import cProfile
+import io
+import pstats
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .baseline import attribute
+from .detectors import RegexProfile
+from .filetypes import classify
+from .findings import (
+    DetectorProfile, Finding, ProfiledScanResponse, RuleProfile, ScanProfile,
+)
+from .ruleset import Ruleset, get_ruleset
+from .service import (
+    diff_findings, diff_scan_response, extract_added_lines, run_detectors, scan_response,
+)
+from . import metrics
+
+
+def _routed(ruleset: Ruleset, file_types: Iterable[str]) -> RegexProfile:
+    """A counter for every regex routed to `file_types`, so rules the scan never evaluated show 0."""
+    profile: RegexProfile = {}
+    for file_type in file_types:
+        for detector, rules in ruleset.route(file_type):
+            for rule in rules:
+                detector.counting(rule, profile)
+    return profile
+
+
+def _rule_profiles(ruleset: Ruleset, profile: RegexProfile) -> Dict[str, List[RuleProfile]]:
+    by_detector: Dict[str, List[RuleProfile]] = {d.name: [] for d in ruleset.detectors}
+    for (name, label, rule_id), counter in profile.items():
+        by_detector.setdefault(name, []).append(RuleProfile(
+            rule=label, rule_id=rule_id, evaluations=counter.evaluations, hits=counter.hits,
+            seconds=round(counter.seconds, 6),
+        ))
+    return by_detector
+
+
+def _cprofile_summary(prof: cProfile.Profile, top: int) -> str:
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def _profiled(
+    scan,
+    lines_by_type: Dict[str, List[str]],
+    with_cprofile: bool,
+    cprofile_top: int,
+) -> Tuple[List[Finding], ScanProfile]:
+    ruleset = get_ruleset()
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    prof: Optional[cProfile.Profile] = cProfile.Profile() if with_cprofile else None
+
+    regexes = _routed(ruleset, lines_by_type)
+    t0 = time.perf_counter()
+    if prof is not None:
+        prof.enable()
+    try:
+        findings = scan(seconds, counts, regexes)
+    finally:
+        if prof is not None:
+            prof.disable()
+    total = time.perf_counter() - t0
+    metrics.record_detectors(seconds, counts)
+
+    rules = _rule_profiles(ruleset, regexes)
+    profile = ScanProfile(
+        total_seconds=round(total, 6),
+        lines=sum(len(lines) for lines in lines_by_type.values()),
+        detectors=[
+            DetectorProfile(
+                detector=d.name,
+                seconds=round(seconds.get(d.name, 0.0), 6),
+                findings=counts.get(d.name, 0),
+                rules=rules[d.name],
+            )
+            for d in ruleset.detectors
+        ],
+        cprofile=_cprofile_summary(prof, cprofile_top) if prof is not None else None,
+    )
+    return findings, profile
+
+
+def profile_scan(
+    code: str,
+    filename: Optional[str] = None,
+    with_cprofile: bool = False,
+    cprofile_top: int = 25,
+) -> ProfiledScanResponse:
+    file_type = classify(filename, code)
+    findings, profile = _profiled(
+        lambda s, c, p: run_detectors(code, s, c, file_type, profile=p),
+        {file_type: code.splitlines()}, with_cprofile, cprofile_top,
+    )
+    for f in findings:
+        attribute(f, filename)
+    resp = scan_response(findings)
+    return ProfiledScanResponse(**resp.model_dump(), profile=profile)
+
+
+def profile_diff_scan(diff_text: str, with_cprofile: bool = False, cprofile_top: int = 25) -> ProfiledScanResponse:
+    lines_by_type: Dict[str, List[str]] = {}
+    for entry in extract_added_lines(diff_text):
+        if entry["code"].strip():
+            lines_by_type.setdefault(classify(entry["file"]), []).append(entry["code"])
+    findings, profile = _profiled(
+        lambda s, c, p: diff_findings(diff_text, s, c, profile=p),
+        lines_by_type, with_cprofile, cprofile_top,
+    )
+    resp = diff_scan_response(findings)
+    return ProfiledScanResponse(**resp.model_dump(), profile=profile)
@@ -0,0 +1,398 @@
+"""
+The optional AST tier for Python inputs (/scan?ast=true, run_scan(python_ast=True)).
+
+Regex rules see text: they cannot tell that `run(cmd)` is os.system under
+an alias, or that the `name` passed to open() came from request.args three
+lines up. This tier parses the input once and runs every check in a single
+visitor pass over the tree:
+
+  - calls to eval/exec/os.system/os.popen, or subprocess with shell=True,
+    made through an import alias the regex rules cannot see;
+  - user input (request.args/form/..., input(), sys.argv) flowing through
+    assignments, f-strings, concatenation and .format() into a shell
+    command or eval, a file-system path, or a SQL execute().
+
+Taint is tracked per function, in statement order, and is not
+interprocedural; int()/float()/os.path.basename()/shlex.quote() and
+similar clean a value. The regex tier always runs as well: AST findings
+are added where no regex finding of the same detector sits on the same
+line. Inputs that do not parse, exceed AST_MAX_MB, or nest too deeply for
+the recursive visitor (a long `a + b + ...` chain, say) get the regex tier
+only.
+
+Parsed trees, and the visitor's hits once computed, are cached by content
+hash (AST_CACHE_ENTRIES, LRU): rescanning an unchanged input costs a hash
+and a lookup on top of the regex tier.
+"""
+
+import ast
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .baseline import Suppression, content_key, to_hex
+from .findings import Finding, truncate_line
+from . import metrics
+
+
+DETECTOR = "python_ast"
+
+CACHE_ENTRIES = int(os.getenv("AST_CACHE_ENTRIES", "64"))
+MAX_BYTES = int(float(os.getenv("AST_MAX_MB", "2")) * 1024 * 1024)
+
+# rule id: (reported detector, severity, confidence, message, recommendation)
+RULES: Dict[str, Tuple[str, str, float, str, str]] = {
+    "dangerous_exec.ast_aliased_call": (
+        "dangerous_exec", "HIGH", 0.85,
+        "{sink}() called through an import alias.",
+        "Avoid shell and eval sinks; use subprocess.run([...]) with an argument list and shell=False.",
+    ),
+    "dangerous_exec.ast_tainted_command": (
+        "dangerous_exec", "CRITICAL", 0.9,
+        "User input reaches {sink}().",
+        "Never pass user input to a shell or eval. Use an argument list with shell=False and an allow-list of commands.",
+    ),
+    "path_traversal.ast_tainted_path": (
+        "path_traversal", "HIGH", 0.85,
+        "User input reaches the file-system call {sink}().",
+        "Sanitize with os.path.basename() and verify the final path stays inside BASE_DIR.",
+    ),
+    "sql_injection.ast_tainted_query": (
+        "sql_injection", "CRITICAL", 0.9,
+        "SQL built from user input reaches {sink}().",
+        "Use parameterized queries: cursor.execute('SELECT ... WHERE id = %s', (user_id,)).",
+    ),
+}
+
+EXEC_SINKS = frozenset({"eval", "exec", "builtins.eval", "builtins.exec", "os.system", "os.popen"})
+SHELL_SINKS = frozenset({
+    "subprocess.run", "subprocess.call", "subprocess.Popen", "subprocess.check_call",
+    "subprocess.check_output", "subprocess.getoutput", "subprocess.getstatusoutput",
+})
+PATH_SINKS = frozenset({
+    "open", "io.open", "builtins.open", "os.open", "os.path.join", "os.remove", "os.unlink", "os.rename",
+    "os.listdir", "os.scandir", "os.mkdir", "os.makedirs", "os.rmdir", "os.stat", "os.chmod",
+    "shutil.rmtree", "shutil.copy", "shutil.copyfile", "shutil.move", "pathlib.Path",
+    "flask.send_file", "flask.send_from_directory",
+})
+SQL_METHODS = frozenset({"execute", "executemany", "executescript", "raw"})
+
+REQUEST_FIELDS = frozenset({
+    "args", "form", "json", "data", "values", "files", "cookies", "headers",
+    "GET", "POST", "query_params", "path_params",
+})
+SOURCE_CALLS = frozenset({
+    "input", "builtins.input", "request.get_json", "request.get_data",
+    "flask.request.get_json", "flask.request.get_data",
+})
+SANITIZERS = frozenset({
+    "int", "float", "bool", "len", "os.path.basename", "shlex.quote", "werkzeug.utils.secure_filename",
+    "secure_filename", "uuid.UUID",
+})
+# methods returning a value derived from their receiver or arguments
+PROPAGATING_METHODS = frozenset({
+    "get", "getlist", "format", "join", "strip", "lstrip", "rstrip", "lower", "upper", "replace",
+    "split", "encode", "decode", "read", "format_map",
+})
+
+
+# 1. Parse cache
+
+class Parsed:
+    """One input's tree (None: it does not parse) and, once checked, its hits."""
+
+    __slots__ = ("tree", "hits")
+
+    def __init__(self, tree: Optional[ast.Module]):
+        self.tree = tree
+        self.hits: Optional[List[Tuple[int, int, str, str]]] = None
+
+
+class ParseCache:
+    """Parsed inputs by content hash, LRU."""
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Parsed]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def parse(self, code: str) -> Parsed:
+        key = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+        metrics.record_cache("python_ast", found is not None)
+        if found is not None:
+            return found
+        try:
+            found = Parsed(ast.parse(code))
+        except (SyntaxError, ValueError, RecursionError, MemoryError):
+            found = Parsed(None)
+        with self._lock:
+            self._entries[key] = found
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return found
+
+
+CACHE = ParseCache()
+
+
+# 2. The visitor
+
+def _dotted(node: ast.AST) -> Optional[str]:
+    """`a.b.c` as written, for Name/Attribute chains."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+class Checker(ast.NodeVisitor):
+    """Every AST check in one pass. `hits` collects (line, column, rule id, sink name)."""
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}
+        self.tainted: Set[str] = set()
+        self.hits: List[Tuple[int, int, str, str]] = []
+
+    # Names
+
+    def resolve(self, node: ast.AST) -> Optional[str]:
+        """The canonical dotted name of a Name/Attribute chain, through import aliases."""
+        written = _dotted(node)
+        if written is None:
+            return None
+        head, _, rest = written.partition(".")
+        head = self.aliases.get(head, head)
+        return f"{head}.{rest}" if rest else head
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname:
+                self.aliases[alias.asname] = alias.name
+            else:
+                top = alias.name.split(".")[0]
+                self.aliases[top] = top
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        if node.module and not node.level:
+            for alias in node.names:
+                if alias.name != "*":
+                    self.aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+
+    # Taint
+
+    def is_tainted(self, node: Optional[ast.AST]) -> bool:
+        if node is None:
+            return False
+        if isinstance(node, ast.Name):
+            return node.id in self.tainted
+        if isinstance(node, ast.Attribute):
+            name = self.resolve(node)
+            if name is not None:
+                parts = name.split(".")
+                # request.args, or flask.request.args after `from flask import request`
+                at = 1 if parts[0] == "request" else 2 if parts[1:2] == ["request"] else 0
+                if name == "sys.argv" or (at and parts[at:at + 1] and parts[at] in REQUEST_FIELDS):
+                    return True
+            return self.is_tainted(node.value)
+        if isinstance(node, ast.Subscript):
+            return self.is_tainted(node.value)
+        if isinstance(node, ast.Call):
+            name = self.resolve(node.func)
+            if name in SOURCE_CALLS:
+                return True
+            if name in SANITIZERS:
+                return False
+            if name in ("str", "repr"):
+                return any(self.is_tainted(a) for a in node.args)
+            if isinstance(node.func, ast.Attribute) and node.func.attr in PROPAGATING_METHODS:
+                return self.is_tainted(node.func.value) or any(self.is_tainted(a) for a in node.args)
+            return False
+        if isinstance(node, ast.JoinedStr):
+            return any(self.is_tainted(v.value) for v in node.values if isinstance(v, ast.FormattedValue))
+        if isinstance(node, ast.BinOp):
+            return self.is_tainted(node.left) or self.is_tainted(node.right)
+        if isinstance(node, ast.BoolOp):
+            return any(self.is_tainted(v) for v in node.values)
+        if isinstance(node, ast.IfExp):
+            return self.is_tainted(node.body) or self.is_tainted(node.orelse)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return any(self.is_tainted(e) for e in node.elts)
+        if isinstance(node, ast.Starred):
+            return self.is_tainted(node.value)
+        return False
+
+    def _bind(self, target: ast.AST, tainted: bool) -> None:
+        if isinstance(target, ast.Name):
+            if tainted:
+                self.tainted.add(target.id)
+            else:
+                self.tainted.discard(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind(elt, tainted)
+        elif isinstance(target, ast.Starred):
+            self._bind(target.value, tainted)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.value)
+        tainted = self.is_tainted(node.value)
+        for target in node.targets:
+            self._bind(target, tainted)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if node.value is not None:
+            self.visit(node.value)
+            self._bind(node.target, self.is_tainted(node.value))
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self.visit(node.value)
+        if self.is_tainted(node.value):
+            self._bind(node.target, True)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
+        self.visit(node.value)
+        self._bind(node.target, self.is_tainted(node.value))
+
+    def visit_For(self, node: ast.For) -> None:
+        self.visit(node.iter)
+        self._bind(node.target, self.is_tainted(node.iter))
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def _scope(self, node: ast.AST) -> None:
+        """Function bodies start from the enclosing taint; their own bindings stay local."""
+        outer = set(self.tainted)
+        self.generic_visit(node)
+        self.tainted = outer
+
+    visit_FunctionDef = _scope
+    visit_AsyncFunctionDef = _scope
+    visit_Lambda = _scope
+
+    # Sinks
+
+    def visit_Call(self, node: ast.Call) -> None:
+        name = self.resolve(node.func)
+        if name is not None:
+            self._check_call(node, name)
+        elif isinstance(node.func, ast.Attribute) and node.func.attr in SQL_METHODS:
+            self._check_sql(node, node.func.attr)
+        self.generic_visit(node)
+
+    def _check_call(self, node: ast.Call, name: str) -> None:
+        args = list(node.args) + [k.value for k in node.keywords if k.arg is None]
+        shell = name in SHELL_SINKS and any(
+            k.arg == "shell" and isinstance(k.value, ast.Constant) and k.value.value is True
+            for k in node.keywords
+        )
+        if name in EXEC_SINKS or shell:
+            if args and self.is_tainted(args[0]):
+                self.hits.append((node.lineno, node.col_offset, "dangerous_exec.ast_tainted_command", name))
+            elif _dotted(node.func) != name:
+                self.hits.append((node.lineno, node.col_offset, "dangerous_exec.ast_aliased_call", name))
+        elif name in PATH_SINKS:
+            if any(self.is_tainted(a) for a in args):
+                self.hits.append((node.lineno, node.col_offset, "path_traversal.ast_tainted_path", name))
+        elif isinstance(node.func, ast.Attribute) and node.func.attr in SQL_METHODS:
+            self._check_sql(node, node.func.attr)
+
+    def _check_sql(self, node: ast.Call, method: str) -> None:
+        if node.args and self.is_tainted(node.args[0]):
+            self.hits.append((node.lineno, node.col_offset, "sql_injection.ast_tainted_query", method))
+
+
+# 3. Findings
+
+def check(tree: ast.Module) -> List[Tuple[int, int, str, str]]:
+    """(line, column, rule id, sink) for every AST hit in the module, in line order."""
+    checker = Checker()
+    checker.visit(tree)
+    return sorted(set(checker.hits))
+
+
+_PY_BREAKS = re.compile(r"\r\n?|\n")
+
+# line breaks to str.splitlines (and so to the regex tier) that Python's tokenizer does not count
+_OTHER_BREAKS = re.compile("[\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+
+
+def _line_numbers(code: str, hits: List[Tuple[int, int, str, str]]) -> List[int]:
+    """
+    The splitlines() line of each hit. AST line numbers count only "\n",
+    "\r\n" and "\r"; a "\f" or U+2028 shifts every later line by one.
+    """
+    if not _OTHER_BREAKS.search(code):
+        return [lineno for lineno, _, _, _ in hits]
+    py_lines = _PY_BREAKS.split(code)
+    first = []
+    n = 1
+    for line in py_lines:
+        first.append(n)
+        n += 1 + len(_OTHER_BREAKS.findall(line))
+    numbers = []
+    for lineno, col, _, _ in hits:
+        # col_offset counts UTF-8 bytes
+        before = py_lines[lineno - 1].encode("utf-8", "surrogatepass")[:col].decode("utf-8", "ignore")
+        numbers.append(first[lineno - 1] + len(_OTHER_BREAKS.findall(before)))
+    return numbers
+
+
+def ast_findings(code: str, seconds: Dict[str, float], counts: Dict[str, int],
+                 skip: Iterable[Tuple[str, int]] = (), suppress: Optional[Suppression] = None,
+                 cache: Optional[ParseCache] = None) -> List[Finding]:
+    """
+    Findings of the AST tier for `code`, leaving out (detector, line) pairs
+    in `skip` (what the regex tier already reported). Returns [] when the
+    code does not parse or is too deeply nested to check.
+    """
+    t0 = time.perf_counter()
+    found: List[Finding] = []
+    parsed = (cache if cache is not None else CACHE).parse(code) if len(code) <= MAX_BYTES else None
+    if parsed is not None and parsed.tree is not None:
+        if parsed.hits is None:
+            try:
+                parsed.hits = check(parsed.tree)
+            except RecursionError:
+                parsed.hits = []
+        skip = set(skip)
+        lines: Optional[List[str]] = None
+        for (_, _, rule_id, sink), lineno in zip(parsed.hits, _line_numbers(code, parsed.hits)):
+            detector, severity, confidence, message, recommendation = RULES[rule_id]
+            if (detector, lineno) in skip:
+                continue
+            if lines is None:
+                lines = code.splitlines()
+            line = lines[lineno - 1] if lineno <= len(lines) else ""
+            key = content_key(rule_id, line)
+            if suppress is not None and suppress.hides(key):
+                continue
+            skip.add((detector, lineno))
+            found.append(Finding(
+                detector=detector, severity=severity, confidence=confidence,
+                message=message.format(sink=sink), line=lineno, evidence=truncate_line(line),
+                recommendation=recommendation, rule_id=rule_id, fingerprint=to_hex(key),
+            ))
+    seconds[DETECTOR] = seconds.get(DETECTOR, 0.0) + (time.perf_counter() - t0)
+    counts[DETECTOR] = counts.get(DETECTOR, 0) + len(found)
+    return found
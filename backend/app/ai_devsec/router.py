@@ -1,15 +1,74 @@
-from fastapi import APIRouter, Query, HTTPException, Body
-from typing import Optional, Annotated
+import hmac
+import os
 
-from .findings import ScanRequest, ScanResponse, ChatRequest, ChatResponse
-from .service import run_scan, run_diff_scan
-from .claude import chat_with_claude
+from fastapi import APIRouter, Query, HTTPException, Body, Header, Request, WebSocket
+from typing import List, Literal, Optional, Annotated, Union
+
+from .findings import (
+    ScanRequest, ScanResponse, ProfiledScanResponse, RescanRequest, ChatRequest, ChatResponse,
+    JobRequest, JobStatus, RepoScanResponse, GateResponse, Severity, BaselineUpload, BaselineInfo,
+    HistoryComparison, HistoryScan, HistoryTopEntry, ShardRequest, ShardResponse,
+)
+from .service import dedupe_recommendations, run_diff_scan
+from . import metrics
 
 
 router = APIRouter(prefix="/api/ai-devsec", tags=["ai-devsec"])
 
 
-@router.post("/scan", response_model=ScanResponse)
+def require_admin(token: Optional[str]) -> None:
+    """Admin-only features are disabled entirely unless ADMIN_TOKEN is set."""
+    expected = os.getenv("ADMIN_TOKEN", "")
+    if not expected or not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+BASELINE_QUERY = Query(
+    None, description="Name of an uploaded baseline (PUT /baselines/{name}); its findings are left out.",
+)
+
+
+DEDUPE_QUERY = Query(
+    False, description="Return each rule's recommendation once, in `recommendations` keyed by rule_id, "
+                       "instead of repeating it in every finding.",
+)
+
+
+def require_cluster(token: Optional[str]) -> None:
+    """Worker endpoints are disabled entirely unless CLUSTER_TOKEN is set."""
+    expected = os.getenv("CLUSTER_TOKEN", "")
+    if not expected or not token or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Cluster token required.")
+
+
+PROJECT_QUERY = Query(
+    None, pattern=r"^[A-Za-z0-9._/-]{1,128}$",
+    description="Record this scan in the scan history under this project (when HISTORY_DB is set).",
+)
+REF_QUERY = Query(None, max_length=256, description="With project: the branch, tag or commit scanned.")
+
+
+def record_history(project: Optional[str], ref: Optional[str], kind: str, resp):
+    """Queue the scan for the history store (history.py); sets resp.history_id."""
+    if project is not None:
+        from .history import STORE
+        if STORE is not None:
+            resp.history_id = STORE.record(project, ref, kind, resp)
+    return resp
+
+
+def load_baseline(name: Optional[str]):
+    if name is None:
+        return None
+    from .baseline import STORE
+
+    baseline = STORE.get(name)
+    if baseline is None:
+        raise HTTPException(status_code=404, detail=f"Unknown baseline {name!r}.")
+    return baseline
+
+
+@router.post("/scan", response_model=Union[ProfiledScanResponse, ScanResponse, GateResponse])
 async def scan(
     code: Annotated[
         str,
@@ -20,14 +79,87 @@ async def scan(
         ),
     ],
     filename: Optional[str] = Query(None, description="Optional filename for context (e.g. app.py)"),
+    baseline: Optional[str] = BASELINE_QUERY,
+    gate: Optional[Severity] = Query(
+        None, description="Fail-fast: stop at the first finding at or above this severity and return only a verdict.",
+    ),
+    ast: bool = Query(False, description="Python only: also run the AST tier (aliased sinks, user input flowing into sinks)."),
+    dedupe: bool = DEDUPE_QUERY,
+    project: Optional[str] = PROJECT_QUERY,
+    ref: Optional[str] = REF_QUERY,
+    profile: bool = Query(False, description="Admin only: include a per-detector/per-rule timing breakdown."),
+    cprofile: bool = Query(False, description="Admin only: with profile, also include a cProfile summary."),
+    x_admin_token: Optional[str] = Header(None),
 ):
     """Scan a code snippet for security vulnerabilities."""
     if not code or not code.strip():
         raise HTTPException(status_code=422, detail="Request body must not be empty.")
-    return run_scan(ScanRequest(code=code, filename=filename))
+    metrics.SCAN_INPUT_CHARS.observe(len(code), endpoint="scan")
+    accepted = load_baseline(baseline)
+    if gate:
+        from .service import run_gate
+        return run_gate(ScanRequest(code=code, filename=filename), gate, accepted, python_ast=ast)
+    if profile:
+        require_admin(x_admin_token)
+        from .profiling import profile_scan
+        resp = profile_scan(code, filename, with_cprofile=cprofile)
+    elif accepted is not None or ast:
+        # baselined and AST scans are one-off: no incremental session is kept
+        from .service import run_scan
+        resp = run_scan(ScanRequest(code=code, filename=filename), accepted, python_ast=ast)
+    else:
+        from .incremental import open_session
+        resp = open_session(ScanRequest(code=code, filename=filename))
+    record_history(project, ref, "scan", resp)
+    return dedupe_recommendations(resp) if dedupe else resp
+
+
+@router.post("/scan/{scan_id}/edits", response_model=ScanResponse)
+async def scan_edits(scan_id: str, req: RescanRequest):
+    """
+    Apply line-range edits to a previous /scan and rescan only what changed.
+    Returns the full, merged result for the edited buffer.
+    """
+    from .incremental import RevisionConflict, SessionNotFound, apply_edits
+
+    try:
+        return apply_edits(scan_id, req)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Unknown or expired scan id; send the full buffer to /scan.")
+    except RevisionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
-@router.post("/scan-diff", response_model=ScanResponse)
+@router.post(
+    "/scan-bytes",
+    response_model=ScanResponse,
+    openapi_extra={"requestBody": {"content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}}},
+)
+async def scan_bytes(
+    request: Request,
+    filename: Optional[str] = Query(None, description="Optional filename for context (e.g. app.py)"),
+    baseline: Optional[str] = BASELINE_QUERY,
+    dedupe: bool = DEDUPE_QUERY,
+    project: Optional[str] = PROJECT_QUERY,
+    ref: Optional[str] = REF_QUERY,
+):
+    """
+    Scan a raw request body as bytes. Nothing is decoded except the lines
+    that produce findings, so logs and dumps with invalid UTF-8 still scan.
+    """
+    data = await request.body()
+    if not data.strip():
+        raise HTTPException(status_code=422, detail="Request body must not be empty.")
+    metrics.SCAN_INPUT_CHARS.observe(len(data), endpoint="scan-bytes")
+    accepted = load_baseline(baseline)
+    from .service import run_bytes_scan
+    resp = record_history(project, ref, "bytes", run_bytes_scan(data, filename, accepted))
+    return dedupe_recommendations(resp) if dedupe else resp
+
+
+@router.post("/scan-diff", response_model=Union[ProfiledScanResponse, ScanResponse, GateResponse])
 async def scan_diff(
     diff: Annotated[
         str,
@@ -37,11 +169,233 @@ async def scan_diff(
             examples=["diff --git a/app.py b/app.py\n+++ b/app.py\n@@ -1,1 +1,2 @@\n+password = 'hunter2'\n"],
         ),
     ],
+    baseline: Optional[str] = BASELINE_QUERY,
+    gate: Optional[Severity] = Query(
+        None, description="Fail-fast: stop at the first finding at or above this severity and return only a verdict.",
+    ),
+    dedupe: bool = DEDUPE_QUERY,
+    project: Optional[str] = PROJECT_QUERY,
+    ref: Optional[str] = REF_QUERY,
+    profile: bool = Query(False, description="Admin only: include a per-detector/per-rule timing breakdown."),
+    cprofile: bool = Query(False, description="Admin only: with profile, also include a cProfile summary."),
+    x_admin_token: Optional[str] = Header(None),
 ):
     """Scan only the added lines from a git diff for security vulnerabilities."""
     if not diff or not diff.strip():
         raise HTTPException(status_code=422, detail="Request body must not be empty.")
-    return run_diff_scan(diff)
+    metrics.SCAN_INPUT_CHARS.observe(len(diff), endpoint="scan-diff")
+    accepted = load_baseline(baseline)
+    if gate:
+        from .service import run_diff_gate
+        return run_diff_gate(diff, gate, accepted)
+    if profile:
+        require_admin(x_admin_token)
+        from .profiling import profile_diff_scan
+        resp = profile_diff_scan(diff, with_cprofile=cprofile)
+    else:
+        resp = run_diff_scan(diff, accepted)
+    record_history(project, ref, "diff", resp)
+    return dedupe_recommendations(resp) if dedupe else resp
+
+
+@router.post("/scan-repo", response_model=RepoScanResponse)
+def scan_repo(
+    path: str = Query(..., description="Path of a git repository on this server."),
+    rev: Optional[str] = Query(None, description="A commit, or a base..head range. Default: the working tree."),
+    project: Optional[str] = PROJECT_QUERY,
+    ref: Optional[str] = Query(None, max_length=256, description="With project: the ref to record. Default: rev."),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Admin only: scan a local git repository directly. Unchanged blobs reuse
+    earlier results, so repeated scans cost in proportion to what changed.
+    """
+    require_admin(x_admin_token)
+    from .gitscan import GitError, scan_repo as run_repo_scan
+
+    try:
+        resp = run_repo_scan(path, rev)
+    except GitError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return record_history(project, ref or rev, "repo", resp)
+
+
+@router.put("/baselines/{name}", response_model=BaselineInfo)
+async def put_baseline(name: str, req: BaselineUpload, x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin only: store (or replace) a baseline of accepted findings. Scans
+    with ?baseline=name leave out findings whose fingerprint is in it.
+    """
+    require_admin(x_admin_token)
+    from .baseline import STORE, Baseline, BaselineError
+
+    fingerprints = req.fingerprints + [f.fingerprint for f in req.findings if f.fingerprint]
+    try:
+        accepted = Baseline.parse(name, fingerprints)
+        STORE.put(accepted)
+    except BaselineError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return BaselineInfo(name=name, entries=len(accepted))
+
+
+@router.get("/baselines/{name}", response_model=BaselineInfo)
+async def get_baseline(name: str):
+    return BaselineInfo(name=name, entries=len(load_baseline(name)))
+
+
+@router.delete("/baselines/{name}", status_code=204)
+async def delete_baseline(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Admin only: remove a baseline."""
+    require_admin(x_admin_token)
+    from .baseline import STORE
+
+    if not STORE.delete(name):
+        raise HTTPException(status_code=404, detail=f"Unknown baseline {name!r}.")
+
+
+def history_store():
+    from .history import STORE
+
+    if STORE is None:
+        raise HTTPException(status_code=404, detail="Scan history is not enabled (set HISTORY_DB).")
+    return STORE
+
+
+# The history queries are plain `def`: they wait on SQLite (and on queued
+# writes being flushed) in the threadpool, not on the event loop.
+
+@router.get("/history/{project:path}/trend", response_model=List[HistoryScan])
+def history_trend(
+    project: str,
+    ref: Optional[str] = Query(None, description="Only scans of this ref."),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Finding counts by severity over a project's latest scans, oldest first."""
+    return history_store().trend(project, ref, limit)
+
+
+@router.get("/history/{project:path}/compare", response_model=HistoryComparison)
+def history_compare(
+    project: str,
+    base: str = Query(..., description="A history id, or a ref (its latest scan)."),
+    head: Optional[str] = Query(None, description="A history id or ref. Default: the project's latest scan."),
+):
+    """Findings new in `head` and fixed since `base`, matched by fingerprint."""
+    from .history import HistoryNotFound
+
+    try:
+        return history_store().compare(project, base, head)
+    except HistoryNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/history/{project:path}/top", response_model=List[HistoryTopEntry])
+def history_top(
+    project: str,
+    by: Literal["rule", "file"] = Query("rule"),
+    scan: Optional[str] = Query(None, description="A history id or ref. Default: the project's latest scan."),
+    limit: int = Query(10, ge=1, le=1000),
+):
+    """The rules or files with the most findings in one scan."""
+    from .history import HistoryNotFound
+
+    try:
+        return history_store().top(project, by, scan, limit)
+    except HistoryNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(req: JobRequest):
+    """
+    Queue a scan of many files (a repository, an unpacked archive) and return
+    at once. Poll /jobs/{job_id} for progress, partial findings and the result.
+    """
+    from .jobs import MANAGER, JobsUnavailable, QueueFull
+
+    try:
+        job = MANAGER.submit([(f.filename, f.code) for f in req.files])
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Job queue is full: {e}.", headers={"Retry-After": "5"})
+    except JobsUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return MANAGER.status(job.job_id)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Only return findings from this index on (for incremental polling)."),
+):
+    """Status, progress and findings so far of a scan job."""
+    from .jobs import MANAGER
+
+    status = MANAGER.status(job_id, offset)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id.")
+    return status
+
+
+@router.post("/cluster/scan", response_model=ScanResponse)
+async def cluster_scan(req: JobRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin only: scan many files (a repository, an unpacked archive) across
+    the worker instances in CLUSTER_WORKERS and return the merged result.
+    """
+    require_admin(x_admin_token)
+    from .cluster import ClusterError, Coordinator, configured_workers
+
+    if not configured_workers():
+        raise HTTPException(status_code=503, detail="No cluster workers configured (CLUSTER_WORKERS).")
+    try:
+        return await Coordinator.from_env().scan_async([(f.filename, f.code) for f in req.files])
+    except ClusterError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@router.post("/internal/scan-shard", response_model=ShardResponse, include_in_schema=False)
+def scan_shard(req: ShardRequest, x_cluster_token: Optional[str] = Header(None)):
+    """Cluster worker side: scan one shard of a coordinator's files (cluster.py)."""
+    require_cluster(x_cluster_token)
+    from .service import run_scan
+
+    return ShardResponse(findings=[
+        run_scan(ScanRequest(code=f.code, filename=f.filename)).findings if f.code.strip() else []
+        for f in req.files
+    ])
+
+
+@router.websocket("/live")
+async def live(websocket: WebSocket):
+    """Live scanning for editors: open documents, stream edits, receive finding diffs."""
+    from .live import serve
+    await serve(websocket)
+
+
+@router.get("/rules")
+async def rules():
+    """Version and rule counts of the ruleset this worker is serving."""
+    from .ruleset import get_ruleset
+    return get_ruleset().summary()
+
+
+@router.post("/rules/reload")
+async def rules_reload(
+    force: bool = Query(False, description="Reload even if no rule source changed."),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Admin only: re-read the rule packs (or artifact) in this worker without a restart."""
+    require_admin(x_admin_token)
+    from .ruleset import RulesetError, get_ruleset, reload_ruleset
+
+    previous = get_ruleset().version
+    try:
+        ruleset = reload_ruleset(force=force)
+    except RulesetError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {**ruleset.summary(), "previous_version": previous, "changed": ruleset.version != previous}
 
 
 @router.post("/chat", response_model=ChatResponse, tags=["ai-chat"])
@@ -50,6 +404,9 @@ async def chat(req: ChatRequest):
     Send a message to the Claude AI assistant.
     The assistant already knows what was found in the last scan.
     """
+    # The chat stack (httpx, TLS, certifi) is only imported once /chat is hit
+    from .claude import chat_with_claude
+
     try:
         reply = await chat_with_claude(
             findings=req.findings,
@@ -0,0 +1,369 @@
+"""
+Rule packs: loading, validation, versioning and hot reload.
+
+Every detector is a JSON pack in rules/ (one file per detector, applied in
+filename order). Extra directories listed in RULES_DIRS (os.pathsep
+separated) are loaded after the built-in packs; a pack naming an existing
+detector adds its rules to it, anything else becomes a new detector.
+
+Packs are validated and resolved (pack defaults filled into every rule)
+into a `Ruleset` whose version is a hash of the resolved rules, so
+formatting-only edits keep the version. Regexes are compiled lazily, per
+rule, the first time a file type that routes to it is scanned.
+
+    python -m backend.app.ai_devsec.ruleset build -o ruleset.json
+
+writes the resolved ruleset as one file; pointing RULESET_ARTIFACT at it
+skips directory walking and validation at startup. (Compiled regexes cannot
+be persisted from Python, so compilation stays lazy either way.)
+
+`get_ruleset()` returns the current ruleset. `reload_ruleset()` swaps in a
+fresh one if the sources changed; scans already running keep the ruleset
+they started with. With RULES_RELOAD_SECONDS set, every worker also checks
+its sources for changes at most that often, on the scan path.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .detectors import EVIDENCE, RuleDetector, Rule, compile_flags, REGEX_FLAGS
+from .filetypes import FILE_TYPES
+
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")
+
+ARTIFACT_FORMAT = 1
+
+SEVERITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+_ID_RX = re.compile(r"^[a-z0-9_]+\.[a-z0-9_]+$")
+
+# Keys a pack may set on itself; rule defaults may also be set per rule
+_PACK_BEHAVIOUR = ("file_types", "skip_comments", "code_only", "first_match", "evidence")
+_RULE_DEFAULTS  = ("severity", "confidence", "message", "recommendation")
+_PACK_KEYS = {"detector", "description", "rules", *_PACK_BEHAVIOUR, *_RULE_DEFAULTS}
+_RULE_KEYS = {
+    "id", "label", "pattern", "flags", "anchors", "file_types",
+    "exclude", "exclude_flags", "requires", "requires_flags", *_RULE_DEFAULTS,
+}
+
+
+class RulesetError(ValueError):
+    """A rule pack or ruleset artifact failed validation."""
+
+
+# Validation
+
+def _fail(source: str, msg: str) -> None:
+    raise RulesetError(f"{source}: {msg}")
+
+
+def _check_regex(source: str, pattern, flags) -> None:
+    if not isinstance(pattern, str) or not pattern:
+        _fail(source, "pattern must be a non-empty string")
+    if not isinstance(flags, list) or any(f not in REGEX_FLAGS for f in flags):
+        _fail(source, f"flags must be a list of {sorted(REGEX_FLAGS)}")
+    try:
+        re.compile(pattern, compile_flags(flags))
+    except re.error as e:
+        _fail(source, f"invalid regex: {e}")
+
+
+def _check_file_types(source: str, value) -> None:
+    if value is None:
+        return
+    if not isinstance(value, list) or not value or any(v not in FILE_TYPES for v in value):
+        _fail(source, f"file_types must be null or a non-empty list of {sorted(FILE_TYPES)}")
+
+
+def _resolve_rule(raw, defaults: dict, detector: str, source: str) -> dict:
+    if not isinstance(raw, dict):
+        _fail(source, "each rule must be an object")
+    rule_id = raw.get("id")
+    if not isinstance(rule_id, str) or not _ID_RX.match(rule_id):
+        _fail(source, f"rule id {rule_id!r} must look like 'detector.rule_name'")
+    if rule_id.split(".", 1)[0] != detector:
+        _fail(source, f"rule id {rule_id!r} must start with '{detector}.'")
+    where = f"{source} [{rule_id}]"
+    unknown = set(raw) - _RULE_KEYS
+    if unknown:
+        _fail(where, f"unknown keys {sorted(unknown)}")
+
+    rule = {k: raw.get(k, defaults.get(k)) for k in _RULE_DEFAULTS}
+    rule.update(id=rule_id, label=raw.get("label", rule_id))
+    if not isinstance(rule["label"], str) or not rule["label"]:
+        _fail(where, "label must be a non-empty string")
+    if rule["severity"] not in SEVERITIES:
+        _fail(where, f"severity must be one of {list(SEVERITIES)}")
+    if not isinstance(rule["confidence"], (int, float)) or not 0 <= rule["confidence"] <= 1:
+        _fail(where, "confidence must be a number between 0 and 1")
+    for key in ("message", "recommendation"):
+        if not isinstance(rule[key], str) or not rule[key]:
+            _fail(where, f"{key} is required (on the rule or the pack)")
+    rule["message"] = rule["message"].replace("{label}", rule["label"])
+
+    rule["pattern"] = raw.get("pattern")
+    rule["flags"] = raw.get("flags", [])
+    _check_regex(where, rule["pattern"], rule["flags"])
+    for helper in ("exclude", "requires"):
+        if helper in raw:
+            rule[helper] = raw[helper]
+            rule[f"{helper}_flags"] = raw.get(f"{helper}_flags", [])
+            _check_regex(f"{where} {helper}", rule[helper], rule[f"{helper}_flags"])
+
+    anchors = raw.get("anchors", [])
+    if not isinstance(anchors, list) or not all(isinstance(a, str) and a for a in anchors):
+        _fail(where, "anchors must be a list of non-empty strings")
+    if any(len(a.splitlines()) != 1 or a.splitlines()[0] != a for a in anchors):
+        _fail(where, "anchors must not contain line breaks")
+    if anchors:
+        rule["anchors"] = anchors
+
+    if raw.get("file_types") is not None:
+        _check_file_types(where, raw["file_types"])
+        rule["file_types"] = sorted(raw["file_types"])
+    return rule
+
+
+def resolve_pack(raw, source: str) -> dict:
+    """Validate one pack and return it with pack defaults filled into every rule."""
+    if not isinstance(raw, dict):
+        _fail(source, "a rule pack must be a JSON object")
+    unknown = set(raw) - _PACK_KEYS
+    if unknown:
+        _fail(source, f"unknown keys {sorted(unknown)}")
+    name = raw.get("detector")
+    if not isinstance(name, str) or not re.match(r"^[a-z0-9_]+$", name):
+        _fail(source, "detector must be a lowercase identifier")
+    _check_file_types(source, raw.get("file_types"))
+    for flag in ("skip_comments", "code_only", "first_match"):
+        if not isinstance(raw.get(flag, False), bool):
+            _fail(source, f"{flag} must be true or false")
+    if raw.get("evidence", "truncate") not in EVIDENCE:
+        _fail(source, f"evidence must be one of {sorted(EVIDENCE)}")
+    rules = raw.get("rules")
+    if not isinstance(rules, list) or not rules:
+        _fail(source, "rules must be a non-empty list")
+
+    pack = {"detector": name}
+    for key in _PACK_BEHAVIOUR:
+        if key in raw:
+            pack[key] = sorted(raw[key]) if key == "file_types" and raw[key] is not None else raw[key]
+    pack["rules"] = [_resolve_rule(r, raw, name, source) for r in rules]
+    return pack
+
+
+def merge_packs(packs: List[Tuple[str, dict]]) -> List[dict]:
+    """
+    Combine resolved packs in order. A later pack for an existing detector
+    may only add rules: its defaults apply to its own rules, but the
+    detector's behaviour (file types, comment handling, ...) is fixed by
+    the first pack.
+    """
+    merged: Dict[str, dict] = {}
+    seen_ids: Dict[str, str] = {}
+    for source, pack in packs:
+        for rule in pack["rules"]:
+            if rule["id"] in seen_ids:
+                _fail(source, f"duplicate rule id {rule['id']!r} (first defined in {seen_ids[rule['id']]})")
+            seen_ids[rule["id"]] = source
+        existing = merged.get(pack["detector"])
+        if existing is None:
+            merged[pack["detector"]] = {**pack, "rules": list(pack["rules"])}
+            continue
+        overrides = [k for k in _PACK_BEHAVIOUR if k in pack]
+        if overrides:
+            _fail(source, f"pack extends '{pack['detector']}' and cannot redefine {overrides}")
+        existing["rules"].extend(pack["rules"])
+    return list(merged.values())
+
+
+def ruleset_version(detectors: List[dict]) -> str:
+    canonical = json.dumps(detectors, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+# Ruleset
+
+class Ruleset:
+    """Validated detectors plus a per-file-type routing table built on demand."""
+
+    def __init__(self, detectors: List[dict], version: Optional[str] = None,
+                 sources: Tuple[str, ...] = ()):
+        self.spec = detectors
+        self.version = version or ruleset_version(detectors)
+        self.sources = sources
+        self.detectors: List[RuleDetector] = [RuleDetector(d) for d in detectors]
+        self._routes: Dict[str, List[Tuple[RuleDetector, List[Rule]]]] = {}
+
+    def route(self, file_type: str) -> List[Tuple[RuleDetector, List[Rule]]]:
+        """[(detector, routed rules)] for one file type; detectors with no rules are left out."""
+        routed = self._routes.get(file_type)
+        if routed is None:
+            routed = []
+            for detector in self.detectors:
+                if not detector.applies_to(file_type):
+                    continue
+                rules = detector.rules_for(file_type)
+                if rules:
+                    routed.append((detector, rules))
+            self._routes[file_type] = routed
+        return routed
+
+    @property
+    def rule_count(self) -> int:
+        return sum(len(d.rules) for d in self.detectors)
+
+    def summary(self) -> dict:
+        return {
+            "version":   self.version,
+            "detectors": {d.name: len(d.rules) for d in self.detectors},
+            "rules":     self.rule_count,
+            "sources":   list(self.sources),
+        }
+
+    def to_artifact(self) -> dict:
+        return {"format": ARTIFACT_FORMAT, "version": self.version, "detectors": self.spec}
+
+
+# Loading
+
+def rule_dirs() -> List[str]:
+    extra = [d for d in os.getenv("RULES_DIRS", "").split(os.pathsep) if d]
+    return [RULES_DIR, *extra]
+
+
+def _pack_files(dirs: List[str]) -> List[str]:
+    files: List[str] = []
+    for d in dirs:
+        if not os.path.isdir(d):
+            raise RulesetError(f"{d}: rules directory does not exist")
+        files.extend(os.path.join(d, f) for f in sorted(os.listdir(d)) if f.endswith(".json"))
+    return files
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, json.JSONDecodeError) as e:
+        raise RulesetError(f"{path}: {e}") from e
+
+
+def load_packs(dirs: Optional[List[str]] = None) -> Ruleset:
+    files = _pack_files(rule_dirs() if dirs is None else dirs)
+    packs = [(path, resolve_pack(_read_json(path), path)) for path in files]
+    return Ruleset(merge_packs(packs), sources=tuple(files))
+
+
+def load_artifact(path: str) -> Ruleset:
+    data = _read_json(path)
+    if not isinstance(data, dict) or data.get("format") != ARTIFACT_FORMAT:
+        raise RulesetError(f"{path}: not a ruleset artifact (format {ARTIFACT_FORMAT})")
+    detectors = data.get("detectors")
+    if not isinstance(detectors, list) or ruleset_version(detectors) != data.get("version"):
+        raise RulesetError(f"{path}: artifact content does not match its version hash")
+    return Ruleset(detectors, version=data["version"], sources=(path,))
+
+
+def _signature(paths: List[str]) -> Tuple:
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.append((p, st.st_mtime_ns, st.st_size))
+        except OSError:
+            sig.append((p, None, None))
+    return tuple(sig)
+
+
+class RuleStore:
+    """Holds the live ruleset and swaps it when its sources change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ruleset: Optional[Ruleset] = None
+        self._signature: Tuple = ()
+        self._checked = 0.0
+
+    def _watched(self) -> List[str]:
+        artifact = os.getenv("RULESET_ARTIFACT")
+        if artifact:
+            return [artifact]
+        dirs = rule_dirs()
+        # directories too, so added or removed packs change the signature
+        return dirs + _pack_files(dirs)
+
+    def _load(self) -> Ruleset:
+        artifact = os.getenv("RULESET_ARTIFACT")
+        return load_artifact(artifact) if artifact else load_packs()
+
+    def get(self) -> Ruleset:
+        ruleset = self._ruleset
+        if ruleset is None:
+            return self.reload()
+        interval = float(os.getenv("RULES_RELOAD_SECONDS", "0") or 0)
+        if interval > 0 and time.monotonic() - self._checked >= interval:
+            try:
+                return self.reload()
+            except RulesetError:
+                # keep serving the last good ruleset; /rules/reload reports the error
+                return self._ruleset
+        return ruleset
+
+    def reload(self, force: bool = False) -> Ruleset:
+        """Load the sources again if they changed (or `force`). Raises RulesetError on bad packs."""
+        with self._lock:
+            self._checked = time.monotonic()
+            signature = _signature(self._watched())
+            if self._ruleset is not None and not force and signature == self._signature:
+                return self._ruleset
+            ruleset = self._load()
+            self._ruleset, self._signature = ruleset, signature
+            return ruleset
+
+
+STORE = RuleStore()
+
+
+def get_ruleset() -> Ruleset:
+    return STORE.get()
+
+
+def reload_ruleset(force: bool = False) -> Ruleset:
+    return STORE.reload(force)
+
+
+# CLI
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate rule packs or build a ruleset artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write the resolved ruleset to a single JSON file.")
+    build.add_argument("-o", "--out", required=True)
+    build.add_argument("dirs", nargs="*", help="Rule directories (default: built-in packs + RULES_DIRS).")
+    check = sub.add_parser("check", help="Validate rule packs and print the ruleset version.")
+    check.add_argument("dirs", nargs="*")
+    args = parser.parse_args(argv)
+
+    try:
+        ruleset = load_packs(args.dirs or None)
+    except RulesetError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if args.command == "build":
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(ruleset.to_artifact(), fh, indent=1, sort_keys=True, ensure_ascii=False)
+    print(f"{ruleset.version}: {ruleset.rule_count} rules in {len(ruleset.detectors)} detectors")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
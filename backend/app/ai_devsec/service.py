@@ -1,16 +1,27 @@
 """
-Core scan logic. Imports the detector list from detectors.py and the
-data models from findings.py.
+Core scan logic. Takes the live ruleset from ruleset.py and the data
+models from findings.py.
+
+The rule engine, context and file-type modules (and the rule packs) are
+imported on the first scan rather than at app import; serverless cold
+starts that only serve /healthz or /chat never pay for them.
 """
 
-from typing import List
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .findings import Finding, GateResponse, ScanRequest, ScanResponse
+from . import metrics
+
 
-from .findings import Finding, ScanRequest, ScanResponse
-from .detectors import DETECTORS
+UNKNOWN = "unknown"   # filetypes.UNKNOWN, repeated to keep this module import-light
 
 
 WEIGHTS = {"LOW": 10, "MEDIUM": 25, "HIGH": 45, "CRITICAL": 70}
 
+# Most severe first
+SEVERITIES = sorted(WEIGHTS, key=WEIGHTS.get, reverse=True)
+
 
 def compute_risk_score(findings: List[Finding]) -> int:
     """Sum (weight x confidence) for every finding, capped at 100."""
@@ -18,11 +29,44 @@ def compute_risk_score(findings: List[Finding]) -> int:
     return min(score, 100)
 
 
-def run_scan(req: ScanRequest) -> ScanResponse:
+def run_detectors(
+    code: str,
+    seconds: Dict[str, float],
+    counts: Dict[str, int],
+    file_type: str = UNKNOWN,
+    suppress=None,
+    profile=None,
+) -> List[Finding]:
+    """
+    Run the detectors routed to `file_type` over `code`, accumulating
+    per-detector time and finding counts. The ScanContext is built once
+    here and shared by every detector. `suppress` (baseline.Suppression)
+    drops baselined findings; `profile` (detectors.RegexProfile) counts
+    every regex evaluation.
+    """
+    from .context import ScanContext
+
+    return run_context(ScanContext(code, file_type), seconds, counts, suppress=suppress, profile=profile)
+
+
+def run_context(ctx, seconds: Dict[str, float], counts: Dict[str, int], ruleset=None,
+                suppress=None, profile=None) -> List[Finding]:
+    """Run the detectors routed to ctx.file_type over the lines in ctx.window."""
+    if ruleset is None:
+        from .ruleset import get_ruleset
+        ruleset = get_ruleset()
+
     findings: List[Finding] = []
-    for detector in DETECTORS:
-        findings.extend(detector.run(req.code))
+    for detector, rules in ruleset.route(ctx.file_type):
+        t0 = time.perf_counter()
+        found = detector.run(ctx, rules, suppress, profile)
+        seconds[detector.name] = seconds.get(detector.name, 0.0) + (time.perf_counter() - t0)
+        counts[detector.name] = counts.get(detector.name, 0) + len(found)
+        findings.extend(found)
+    return findings
+
 
+def scan_response(findings: List[Finding]) -> ScanResponse:
     risk_score = compute_risk_score(findings)
 
     if not findings:
@@ -34,6 +78,159 @@ def run_scan(req: ScanRequest) -> ScanResponse:
     return ScanResponse(risk_score=risk_score, findings=findings, summary=summary)
 
 
+def dedupe_recommendations(resp: ScanResponse) -> ScanResponse:
+    """
+    A copy of `resp` with each rule's recommendation moved into
+    resp.recommendations (keyed by rule_id) instead of repeated per finding.
+    The findings are copied, so cached results (scan sessions) are untouched.
+    """
+    table: Dict[str, str] = {}
+    findings = []
+    for f in resp.findings:
+        if f.rule_id is not None and f.recommendation is not None \
+                and table.setdefault(f.rule_id, f.recommendation) == f.recommendation:
+            f = f.model_copy(update={"recommendation": None})
+        findings.append(f)
+    return resp.model_copy(update={"findings": findings, "recommendations": table})
+
+
+def gate_contexts(contexts: Sequence, threshold: str, seconds: Dict[str, float], counts: Dict[str, int],
+                  ruleset=None, suppressions: Optional[Sequence] = None) -> Optional[Tuple[int, Finding]]:
+    """
+    The first finding at or above `threshold` in any of `contexts`, as
+    (context index, finding), or None. Rules run one severity level at a
+    time, most severe first, across every context, so a CRITICAL anywhere is
+    found before any HIGH rule runs; rules below the threshold never run.
+    `suppressions` holds a baseline.Suppression (or None) per context.
+    """
+    if ruleset is None:
+        from .ruleset import get_ruleset
+        ruleset = get_ruleset()
+
+    routes = [ruleset.route(ctx.file_type) for ctx in contexts]
+    for severity in SEVERITIES:
+        if WEIGHTS[severity] < WEIGHTS[threshold]:
+            break
+        for k, ctx in enumerate(contexts):
+            for detector, rules in routes[k]:
+                level = [r for r in rules if r.severity == severity]
+                if not level:
+                    continue
+                t0 = time.perf_counter()
+                hit = None
+                suppress = suppressions[k] if suppressions is not None else None
+                for f in detector.iter_findings(ctx, level, suppress):
+                    # with first_match an earlier, less severe rule may own the line
+                    if not detector.first_match or detector.first_hit(ctx, rules, f.line).severity == severity:
+                        hit = f
+                        break
+                seconds[detector.name] = seconds.get(detector.name, 0.0) + (time.perf_counter() - t0)
+                if hit is not None:
+                    counts[detector.name] = counts.get(detector.name, 0) + 1
+                    return k, hit
+    return None
+
+
+def gate_response(threshold: str, hit: Optional[Finding]) -> GateResponse:
+    if hit is None:
+        return GateResponse(passed=True, threshold=threshold, summary=f"No findings at or above {threshold}.")
+    where = f"{hit.file}:{hit.line}" if hit.file else f"line {hit.line}"
+    return GateResponse(
+        passed=False, threshold=threshold, finding=hit,
+        summary=f"Failed: {hit.severity} {hit.detector} finding at {where}.",
+    )
+
+
+def _ast_gate(code: str, threshold: str, seconds: Dict[str, float], counts: Dict[str, int],
+              suppress=None) -> Optional[Finding]:
+    """
+    The most severe AST-tier finding at or above `threshold` that run_scan
+    would report. Only when there is one does the full regex tier run, since
+    a regex finding of any severity on the same line takes its place.
+    """
+    from .filetypes import PYTHON
+    from .pyast import ast_findings
+
+    if not any(WEIGHTS[f.severity] >= WEIGHTS[threshold] for f in ast_findings(code, {}, {})):
+        return None
+    regex = run_detectors(code, seconds, counts, PYTHON, suppress)
+    found = [f for f in ast_findings(code, seconds, counts, ((f.detector, f.line) for f in regex), suppress)
+             if WEIGHTS[f.severity] >= WEIGHTS[threshold]]
+    return min(found, key=lambda f: (-WEIGHTS[f.severity], f.line), default=None)
+
+
+def run_gate(req: ScanRequest, threshold: str, baseline=None, python_ast: bool = False) -> GateResponse:
+    """
+    Fail-fast run_scan: stop at the first finding at or above `threshold`.
+    With python_ast, a Python input the regex rules pass is also gated on
+    the AST tier.
+    """
+    from .baseline import attribute
+    from .context import ScanContext
+    from .filetypes import PYTHON, classify
+
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    file_type = classify(req.filename, req.code)
+    suppress = baseline.for_file(req.filename) if baseline is not None else None
+    found = gate_contexts([ScanContext(req.code, file_type)], threshold, seconds, counts,
+                          suppressions=[suppress] if baseline is not None else None)
+    hit = found[1] if found is not None else None
+    if hit is None and python_ast and file_type == PYTHON:
+        hit = _ast_gate(req.code, threshold, seconds, counts, suppress)
+    metrics.record_detectors(seconds, counts)
+    if hit is not None:
+        attribute(hit, req.filename)
+    return gate_response(threshold, hit)
+
+
+def _suppressed(resp: ScanResponse, baseline, suppressions: List) -> ScanResponse:
+    if baseline is not None:
+        resp.suppressed = sum(s.hidden for s in suppressions)
+    return resp
+
+
+def run_scan(req: ScanRequest, baseline=None, python_ast: bool = False) -> ScanResponse:
+    """
+    Scan one input. With a baseline.Baseline, baselined findings are left
+    out and counted. With python_ast, Python inputs also get the AST tier
+    (pyast.py).
+    """
+    from .baseline import attribute
+    from .filetypes import PYTHON, classify
+
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    file_type = classify(req.filename, req.code)
+    suppress = baseline.for_file(req.filename) if baseline is not None else None
+    findings = run_detectors(req.code, seconds, counts, file_type, suppress)
+    if python_ast and file_type == PYTHON:
+        from .pyast import ast_findings
+        findings += ast_findings(req.code, seconds, counts, ((f.detector, f.line) for f in findings), suppress)
+    for f in findings:
+        attribute(f, req.filename)
+    metrics.record_detectors(seconds, counts)
+    return _suppressed(scan_response(findings), baseline, [suppress])
+
+
+def run_bytes_scan(data, filename: Optional[str] = None, baseline=None) -> ScanResponse:
+    """
+    run_scan for raw bytes (bytes, memoryview or mmap), scanned without
+    decoding the whole input; see bytescan.py.
+    """
+    from .baseline import attribute
+    from .bytescan import classify_buffer, run_buffer
+
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    suppress = baseline.for_file(filename) if baseline is not None else None
+    findings = run_buffer(data, classify_buffer(filename, data), seconds, counts, suppress=suppress)
+    for f in findings:
+        attribute(f, filename)
+    metrics.record_detectors(seconds, counts)
+    return _suppressed(scan_response(findings), baseline, [suppress])
+
+
 def extract_added_lines(diff_text: str) -> list:
     current_file = None
     new_line_number = 0
@@ -58,18 +255,77 @@ def extract_added_lines(diff_text: str) -> list:
     return extracted
 
 
-def run_diff_scan(diff_text: str) -> ScanResponse:
-    """Scan only the added lines in a git diff."""
+def _diff_inputs(diff_text: str) -> List[Tuple[Optional[str], List[dict], str]]:
+    """
+    (file, added-line entries, joined code) for each run of consecutive
+    added lines with something non-blank in it. Runs are tokenized apart, so
+    a docstring or "/*" opened on an edited line cannot hide a later hunk.
+    """
+    runs: List[List[dict]] = []
+    for entry in extract_added_lines(diff_text):
+        last = runs[-1][-1] if runs else None
+        if last is None or last["file"] != entry["file"] or last["line"] + 1 != entry["line"]:
+            runs.append([])
+        runs[-1].append(entry)
+    inputs = []
+    for entries in runs:
+        code = "\n".join(e["code"] for e in entries)
+        if code.strip():
+            inputs.append((entries[0]["file"], entries, code))
+    return inputs
+
+
+def _attribute(f: Finding, file: Optional[str], entries: List[dict]) -> Finding:
+    """Map a finding on the joined added lines back to its file and new line number."""
+    from .baseline import attribute
+
+    entry = entries[f.line - 1]
+    attribute(f, file)
+    f.line = entry["line"]
+    f.message = f"{file}:{entry['line']} - {f.message}"
+    return f
+
+
+def diff_findings(diff_text: str, seconds: Dict[str, float], counts: Dict[str, int],
+                  suppressions: Optional[List] = None, baseline=None, profile=None) -> List[Finding]:
+    """
+    Findings for the added lines of a diff, attributed to file and new line
+    number. Each run of consecutive added lines is scanned as one input, so
+    the detectors and the comment tokenizer run once per hunk, not per line.
+    With a baseline, each run's Suppression is appended to `suppressions`.
+    """
+    from .filetypes import classify
+
     findings: List[Finding] = []
+    for file, entries, code in _diff_inputs(diff_text):
+        suppress = baseline.for_file(file) if baseline is not None else None
+        if suppress is not None and suppressions is not None:
+            suppressions.append(suppress)
+        for f in run_detectors(code, seconds, counts, classify(file), suppress, profile):
+            findings.append(_attribute(f, file, entries))
+    return findings
 
-    for entry in extract_added_lines(diff_text):
-        result = run_scan(ScanRequest(code=entry["code"]))
-        for f in result.findings:
-            f.file = entry["file"]
-            f.line = entry["line"]
-            f.message = f"{entry['file']}:{entry['line']} - {f.message}"
-            findings.append(f)
 
+def run_diff_gate(diff_text: str, threshold: str, baseline=None) -> GateResponse:
+    """Fail-fast run_diff_scan over every file of the diff at once; see gate_contexts."""
+    from .context import ScanContext
+    from .filetypes import classify
+
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    inputs = _diff_inputs(diff_text)
+    contexts = [ScanContext(code, classify(file)) for file, _, code in inputs]
+    suppressions = [baseline.for_file(file) for file, _, _ in inputs] if baseline is not None else None
+    found = gate_contexts(contexts, threshold, seconds, counts, suppressions=suppressions)
+    metrics.record_detectors(seconds, counts)
+    hit = None
+    if found is not None:
+        k, hit = found
+        _attribute(hit, inputs[k][0], inputs[k][1])
+    return gate_response(threshold, hit)
+
+
+def diff_scan_response(findings: List[Finding]) -> ScanResponse:
     risk_score = compute_risk_score(findings)
     summary = (
         "No risky patterns detected in diff."
@@ -77,3 +333,13 @@ def run_diff_scan(diff_text: str) -> ScanResponse:
         else f"{len(findings)} issue(s) detected across modified files."
     )
     return ScanResponse(risk_score=risk_score, findings=findings, summary=summary)
+
+
+def run_diff_scan(diff_text: str, baseline=None) -> ScanResponse:
+    """Scan only the added lines in a git diff."""
+    seconds: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    suppressions: List = []
+    findings = diff_findings(diff_text, seconds, counts, suppressions, baseline)
+    metrics.record_detectors(seconds, counts)
+    return _suppressed(diff_scan_response(findings), baseline, suppressions)
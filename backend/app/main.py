@@ -1,11 +1,55 @@
-from dotenv import load_dotenv
-load_dotenv()  # loads ANTHROPIC_API_KEY from .env before anything else imports it
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+
+def _load_dotenv() -> None:
+    """
+    Load ANTHROPIC_API_KEY etc. from the nearest .env, searching upwards from
+    here like load_dotenv() does. python-dotenv is only imported when a .env
+    actually exists, which it never does in the serverless deployment.
+    """
+    path = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(path, ".env")
+        if os.path.isfile(candidate):
+            from dotenv import load_dotenv
+            load_dotenv(candidate)
+            return
+        parent = os.path.dirname(path)
+        if parent == path:
+            return
+        path = parent
+
+
+_load_dotenv()  # before anything reads the environment
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from .ai_devsec.router import router as ai_devsec_router
+from .ai_devsec import metrics
+from .ai_devsec.compression import DecompressMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    With a durable job store, resume jobs a previous process left unfinished.
+    On shutdown, stop the job pool if anything started it.
+    """
+    if os.getenv("JOBS_DB"):
+        from .ai_devsec.jobs import MANAGER
+        MANAGER.start()
+    yield
+    jobs = sys.modules.get(__package__ + ".ai_devsec.jobs")
+    if jobs is not None:
+        jobs.MANAGER.shutdown()
 
-app = FastAPI(title="AI DevSec Platform", version="0.1.0")
+
+app = FastAPI(title="AI DevSec Platform", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,10 +58,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Responses over GZIP_MIN_BYTES are gzipped for clients that accept it;
+# gzip/zstd request bodies are decoded before any endpoint sees them
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")), compresslevel=6)
+app.add_middleware(DecompressMiddleware)
+
 app.include_router(ai_devsec_router)
 
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Observe per-route latency. Labels use the route template, never the raw path."""
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.observe(
+            time.perf_counter() - t0,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
 @app.get("/healthz", tags=["health"])
 def health_check():
     """Simple liveness probe."""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of service metrics."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
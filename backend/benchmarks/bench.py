@@ -0,0 +1,372 @@
+"""
+Detector throughput benchmarks.
+
+    python -m backend.benchmarks.bench --size-kb 512 --out bench.json
+    python -m backend.benchmarks.bench --baseline bench.json --threshold 0.15
+
+Measures MB/s and lines/s for every detector on every corpus kind, plus
+end-to-end `run_scan` / `run_diff_scan` throughput and peak traced memory,
+the CLI scanner's startup time and files/s over a generated tree, and the
+cost of the Python AST tier relative to regex-only scanning (cold and with
+the parse cache warm).
+Results are written as JSON; when a baseline file is given, any metric that
+regressed by more than `--threshold` (a fraction) fails the run with exit 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from backend.app.ai_devsec import cli, metrics, pyast
+from backend.app.ai_devsec.context import ScanContext
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.ruleset import get_ruleset
+from backend.app.ai_devsec.service import run_scan, run_diff_scan, run_detectors
+
+from .corpus import CORPORA, generate, python_module
+
+
+# Filenames passed with end-to-end scans so file-type routing is exercised
+FILENAMES = {
+    "python": "bench.py", "javascript": "bench.js", "shell": "bench.sh",
+    "sql": "bench.sql", "minified": "bench.min.js",
+}
+
+# Metrics compared against the baseline, and which direction is "better"
+HIGHER_IS_BETTER = {"mb_per_s", "lines_per_s", "files_per_s"}
+LOWER_IS_BETTER  = {"peak_bytes", "import_seconds", "first_scan_seconds", "startup_seconds",
+                    "cold_cost_ratio", "warm_cost_ratio"}
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_COLD_START_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import backend.app.main
+t1 = time.perf_counter()
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+run_scan(ScanRequest(code="x = 1", filename="a.py"))
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+"""
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    """Fastest of `repeat` runs, in seconds. Min is the least noisy estimator."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def peak_memory(fn: Callable[[], object]) -> int:
+    """Peak bytes allocated by Python while running `fn` once."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def throughput(seconds: float, text: str) -> Dict[str, float]:
+    size = len(text.encode("utf-8"))
+    lines = text.count("\n") or 1
+    seconds = max(seconds, 1e-9)
+    return {
+        "seconds":     round(seconds, 6),
+        "mb_per_s":    round(size / seconds / 1e6, 3),
+        "lines_per_s": round(lines / seconds, 1),
+    }
+
+
+# Suites
+
+def _context(text: str) -> ScanContext:
+    ctx = ScanContext(text)
+    ctx.comment_lines  # force tokenization
+    return ctx
+
+
+def bench_detectors(kind: str, text: str, repeat: int) -> Dict[str, dict]:
+    """Each detector on a prebuilt context; building the context is timed separately."""
+    results: Dict[str, dict] = {
+        f"{kind}/context": throughput(best_time(lambda: _context(text), repeat), text),
+    }
+    ctx = _context(text)
+    for detector in get_ruleset().detectors:
+        def run():
+            ctx.reset_prefilter()   # time the anchor prefilter too, not a cached result
+            detector.run(ctx)
+        secs = best_time(run, repeat)
+        results[f"{kind}/detector/{detector.name}"] = throughput(secs, text)
+    return results
+
+
+def bench_end_to_end(kind: str, text: str, repeat: int) -> Dict[str, dict]:
+    if kind == "diff":
+        name, fn = "run_diff_scan", (lambda: run_diff_scan(text))
+    else:
+        req = ScanRequest(code=text, filename=FILENAMES.get(kind))
+        name, fn = "run_scan", (lambda: run_scan(req))
+    entry = throughput(best_time(fn, repeat), text)
+    entry["peak_bytes"] = peak_memory(fn)
+    return {f"{kind}/{name}": entry}
+
+
+def bench_instrumentation(kind: str, text: str, repeat: int) -> Dict[str, dict]:
+    """Cost of the metrics hooks: bare detector loop vs the instrumented one."""
+    def bare():
+        ctx = ScanContext(text)
+        for detector in get_ruleset().detectors:
+            detector.run(ctx)
+
+    def instrumented():
+        seconds: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        run_detectors(text, seconds, counts)
+        metrics.record_detectors(seconds, counts)
+
+    bare_s = best_time(bare, repeat)
+    inst_s = best_time(instrumented, repeat)
+    return {f"{kind}/instrumentation": {
+        "bare_seconds":         round(bare_s, 6),
+        "instrumented_seconds": round(inst_s, 6),
+        "overhead_pct":         round((inst_s - bare_s) / max(bare_s, 1e-9) * 100, 2),
+    }}
+
+
+def bench_python_ast(size: int, repeat: int, seed: int = 0) -> Dict[str, dict]:
+    """
+    run_scan with the AST tier against regex-only, on Python that parses:
+    cold (every run parses) and warm (the parse cache hit, as on a rescan).
+    """
+    text = python_module(size, seed=seed)
+    req = ScanRequest(code=text, filename="bench.py")
+
+    def cold():
+        pyast.CACHE.clear()
+        run_scan(req, python_ast=True)
+
+    regex_s = best_time(lambda: run_scan(req), repeat)
+    cold_s = best_time(cold, repeat)
+    run_scan(req, python_ast=True)
+    warm_s = best_time(lambda: run_scan(req, python_ast=True), repeat)
+    entry = throughput(cold_s, text)
+    entry.update(
+        cold_cost_ratio=round(cold_s / max(regex_s, 1e-9), 3),
+        warm_cost_ratio=round(warm_s / max(regex_s, 1e-9), 3),
+    )
+    return {"python_module/run_scan_ast": entry}
+
+
+def _importtime_top(n: int) -> List[List]:
+    """Slowest modules by cumulative import time (python -X importtime), in microseconds."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.app.main"],
+        cwd=_REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append([parts[2].strip(), int(parts[1])])
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:n]
+
+
+def bench_cold_start(repeat: int, top: int = 15) -> Dict[str, dict]:
+    """
+    What a fresh serverless instance pays: importing the app, then the first
+    scan (which is when the rule engine modules get imported and compiled).
+    Each sample is a new interpreter.
+    """
+    imports, first_scans = [], []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _COLD_START_SCRIPT],
+            cwd=_REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        imp, scan = (float(x) for x in proc.stdout.split())
+        imports.append(imp)
+        first_scans.append(scan)
+    return {
+        "cold_start/import_app": {
+            "import_seconds": round(min(imports), 4),
+            "top_modules_us": _importtime_top(top),
+        },
+        "cold_start/first_scan": {"first_scan_seconds": round(min(first_scans), 4)},
+    }
+
+
+def bench_cli_startup(repeat: int) -> Dict[str, dict]:
+    """A pre-commit style run on one clean file, in a fresh interpreter each time."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clean.py")
+        with open(path, "w") as fh:
+            fh.write("x = 1\n")
+        cmd = [sys.executable, "-m", "backend.app.ai_devsec.cli", path]
+        secs = best_time(lambda: subprocess.run(cmd, cwd=_REPO_ROOT, capture_output=True, check=True), repeat)
+    return {"cli/startup": {"startup_seconds": round(secs, 4)}}
+
+
+def bench_cli_files(kinds: List[str], size: int, repeat: int, seed: int = 0, files: int = 200) -> Dict[str, dict]:
+    """The CLI's walk + read + scan over a tree of `files` small files, in-process and with a pool."""
+    kinds = [k for k in kinds if k in FILENAMES] or ["python"]
+    per_file = max(size // files, 256)
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        total = 0
+        for i in range(files):
+            kind = kinds[i % len(kinds)]
+            sub = os.path.join(tmp, f"pkg{i % 10}")
+            os.makedirs(sub, exist_ok=True)
+            text = generate(kind, per_file, seed=seed + i)
+            total += len(text.encode("utf-8"))
+            with open(os.path.join(sub, f"f{i}{os.path.splitext(FILENAMES[kind])[1]}"), "w") as fh:
+                fh.write(text)
+        for name, jobs in (("serial", 1), ("pool", max(os.cpu_count() or 1, 2))):
+            secs = max(best_time(lambda: cli.scan_paths([tmp], jobs=jobs), repeat), 1e-9)
+            results[f"cli/scan_tree/{name}"] = {
+                "seconds":     round(secs, 6),
+                "files_per_s": round(files / secs, 1),
+                "mb_per_s":    round(total / secs / 1e6, 3),
+            }
+    return results
+
+
+def run_suite(kinds: List[str], size: int, repeat: int = 3, seed: int = 0,
+              cold_start: bool = True) -> dict:
+    results: Dict[str, dict] = {}
+    if cold_start:
+        results.update(bench_cold_start(repeat))
+        results.update(bench_cli_startup(repeat))
+    results.update(bench_cli_files(kinds, size, repeat, seed))
+    if "python" in kinds:
+        results.update(bench_python_ast(size, repeat, seed))
+    for kind in kinds:
+        text = generate(kind, size, seed=seed)
+        if kind != "diff":
+            results.update(bench_detectors(kind, text, repeat))
+            results.update(bench_instrumentation(kind, text, repeat))
+        results.update(bench_end_to_end(kind, text, repeat))
+    return {
+        "meta": {
+            "python":   platform.python_version(),
+            "platform": platform.platform(),
+            "size":     size,
+            "repeat":   repeat,
+            "seed":     seed,
+        },
+        "results": results,
+    }
+
+
+# Baseline gating
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """
+    Return a human-readable line for every metric that regressed by more
+    than `threshold` relative to the baseline. Metrics missing on either
+    side are ignored so suites can grow without invalidating old baselines.
+    """
+    regressions: List[str] = []
+    cur_results = current.get("results", {})
+    for key, base_entry in sorted(baseline.get("results", {}).items()):
+        cur_entry = cur_results.get(key)
+        if cur_entry is None:
+            continue
+        for metric, base_val in base_entry.items():
+            cur_val = cur_entry.get(metric)
+            if cur_val is None or not base_val:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                change = (base_val - cur_val) / base_val
+            elif metric in LOWER_IS_BETTER:
+                change = (cur_val - base_val) / base_val
+            else:
+                continue
+            if change > threshold:
+                regressions.append(
+                    f"{key} {metric}: {base_val} -> {cur_val} ({change:.1%} worse)"
+                )
+    return regressions
+
+
+def _print_table(report: dict) -> None:
+    for key, entry in report["results"].items():
+        if "overhead_pct" in entry:
+            print(f"{key:<50} {entry['overhead_pct']:>+8.2f}% metrics overhead")
+            continue
+        if "import_seconds" in entry:
+            print(f"{key:<50} {entry['import_seconds'] * 1000:>9.1f} ms")
+            for name, us in entry["top_modules_us"][:5]:
+                print(f"    {name:<46} {us / 1000:>9.1f} ms")
+            continue
+        if "first_scan_seconds" in entry:
+            print(f"{key:<50} {entry['first_scan_seconds'] * 1000:>9.1f} ms")
+            continue
+        if "startup_seconds" in entry:
+            print(f"{key:<50} {entry['startup_seconds'] * 1000:>9.1f} ms")
+            continue
+        if "cold_cost_ratio" in entry:
+            print(f"{key:<50} {entry['mb_per_s']:>9.2f} MB/s   x{entry['cold_cost_ratio']:.2f} cold"
+                  f"  x{entry['warm_cost_ratio']:.2f} warm vs regex-only")
+            continue
+        if "files_per_s" in entry:
+            print(f"{key:<50} {entry['mb_per_s']:>9.2f} MB/s {entry['files_per_s']:>12.0f} files/s")
+            continue
+        extra = f"  peak={entry['peak_bytes'] / 1e6:.1f}MB" if "peak_bytes" in entry else ""
+        print(f"{key:<50} {entry.get('mb_per_s', 0):>9.2f} MB/s {entry.get('lines_per_s', 0):>12.0f} lines/s{extra}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the AI DevSec detectors.")
+    parser.add_argument("--kinds", default=",".join(CORPORA),
+                        help="Comma-separated corpus kinds (default: all).")
+    parser.add_argument("--size-kb", type=int, default=256, help="Corpus size per kind, in KB.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per measurement (best is kept).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cold-start", action="store_true",
+                        help="Skip the fresh-interpreter import/first-scan measurements.")
+    parser.add_argument("--out", help="Write JSON results to this path.")
+    parser.add_argument("--baseline", help="Compare against a previous JSON results file.")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed regression as a fraction (default 0.15 = 15%%).")
+    args = parser.parse_args(argv)
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    report = run_suite(kinds, args.size_kb * 1024, repeat=args.repeat, seed=args.seed,
+                       cold_start=not args.no_cold_start)
+    _print_table(report)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print("  " + line, file=sys.stderr)
+            return 1
+        print(f"\nNo regressions above {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+A local stand-in for the Anthropic Messages API, for load tests.
+
+    python -m backend.benchmarks.fake_anthropic --port 8099 --latency-ms 800 --rate-limit-rate 0.02
+
+Point the app at it with ANTHROPIC_URL=http://127.0.0.1:8099/v1/messages
+(and any non-empty ANTHROPIC_API_KEY). Replies are canned, but latency,
+failures and response shapes behave like the real API:
+
+  - every reply waits `latency_ms` +/- `jitter_ms` (uniform);
+  - a fraction `error_rate` of requests fail with 500 api_error, and a
+    fraction `rate_limit_rate` with 429 rate_limit_error and a retry-after
+    header;
+  - `"stream": true` requests get the server-sent event sequence
+    (message_start ... message_stop), the latency spread over the chunks.
+
+GET /stats returns how many requests were served, by status.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+REPLY = (
+    "This finding is a real risk: untrusted input reaches a dangerous sink. "
+    "Validate the input against an allow-list and use the safe API shown in the recommendation."
+)
+
+
+class FakeOptions:
+    __slots__ = ("latency_ms", "jitter_ms", "error_rate", "rate_limit_rate", "chunks", "seed")
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, chunks: int = 8, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunks = max(1, chunks)
+        self.seed = seed
+
+
+def _error(status: int, kind: str, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"type": "error", "error": {"type": kind, "message": message}},
+                        status_code=status, headers=headers)
+
+
+def _message(model: str, text: str, input_tokens: int) -> dict:
+    return {
+        "id": "msg_fake", "type": "message", "role": "assistant", "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn", "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": len(text.split())},
+    }
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def _stream(message: dict, delay: float, chunks: int):
+    text = message["content"][0]["text"]
+    start = {**message, "content": [], "stop_reason": None,
+             "usage": {**message["usage"], "output_tokens": 0}}
+    yield _sse("message_start", {"type": "message_start", "message": start})
+    yield _sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                       "content_block": {"type": "text", "text": ""}})
+    step = -(-len(text) // chunks)
+    for i in range(0, len(text), step):
+        await asyncio.sleep(delay / chunks)
+        yield _sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                           "delta": {"type": "text_delta", "text": text[i:i + step]}})
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse("message_delta", {"type": "message_delta",
+                                 "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                 "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def create_app(options: Optional[FakeOptions] = None) -> FastAPI:
+    options = options or FakeOptions()
+    rng = random.Random(options.seed)
+    stats: Dict[str, int] = {}
+    lock = threading.Lock()
+    app = FastAPI(title="Fake Anthropic Messages API")
+
+    def count(status: int) -> None:
+        with lock:
+            stats[str(status)] = stats.get(str(status), 0) + 1
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        if not request.headers.get("x-api-key"):
+            count(401)
+            return _error(401, "authentication_error", "x-api-key header is required")
+        try:
+            payload = await request.json()
+            prompt: List[dict] = payload["messages"]
+        except (ValueError, KeyError, TypeError):
+            count(400)
+            return _error(400, "invalid_request_error", "messages: field required")
+
+        delay = max(0.0, options.latency_ms + rng.uniform(-options.jitter_ms, options.jitter_ms)) / 1000
+        roll = rng.random()
+        if roll < options.rate_limit_rate:
+            count(429)
+            return _error(429, "rate_limit_error", "Number of requests has exceeded your rate limit.",
+                          headers={"retry-after": "1"})
+        if roll < options.rate_limit_rate + options.error_rate:
+            await asyncio.sleep(delay)
+            count(500)
+            return _error(500, "api_error", "Internal server error")
+
+        input_tokens = sum(len(str(m.get("content", "")).split()) for m in prompt)
+        input_tokens += len(str(payload.get("system", "")).split())
+        message = _message(payload.get("model", "fake"), REPLY, input_tokens)
+        count(200)
+        if payload.get("stream"):
+            return StreamingResponse(_stream(message, delay, options.chunks), media_type="text/event-stream")
+        await asyncio.sleep(delay)
+        return message
+
+    @app.get("/stats")
+    async def get_stats():
+        with lock:
+            return dict(stats)
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a fake Anthropic Messages API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Mean reply latency.")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="Uniform +/- jitter on the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests failing with 429.")
+    parser.add_argument("--chunks", type=int, default=8, help="Text deltas per streamed reply.")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    options = FakeOptions(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                          args.chunks, args.seed)
+    uvicorn.run(create_app(options), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Load test the service under mixed scan / diff / chat traffic.
+
+    python -m backend.benchmarks.load --rps 50 --duration 30 --out load.json
+    python -m backend.benchmarks.load --mix scan=1 --rps 200 --workers 4
+    python -m backend.benchmarks.load --app-url http://127.0.0.1:8000 --mix scan=3,diff=1
+
+Starts the app with uvicorn in a subprocess, pointed through ANTHROPIC_URL
+at a fake Messages API (fake_anthropic.py, another subprocess), so /chat is
+exercised without an API key and with a chosen upstream latency and
+failure rate. With --app-url an already running app is targeted instead.
+
+Requests are sent open-loop at the target rate: arrivals never wait for
+earlier responses, and latency is measured from each request's scheduled
+send time. A server that falls behind therefore shows up in the tail
+latencies and error rate, not as a quietly lower request rate.
+
+Reports requests, throughput (successful responses per second), error rate,
+status counts and p50/p95/p99/max latency per endpoint and overall.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from backend.app.ai_devsec.cluster import free_port, start_server, stop_server
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+
+from .corpus import generate, unified_diff
+
+
+API = "/api/ai-devsec"
+DEFAULT_MIX = "scan=6,diff=3,chat=1"
+
+# (endpoint, HTTP status or 0 for a transport error/timeout, seconds)
+Sample = Tuple[str, int, float]
+
+
+# 1. Traffic
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'scan=6,diff=3,chat=1' -> relative weights per endpoint."""
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("scan", "diff", "chat"):
+            raise ValueError(f"Unknown endpoint {name!r} in mix (expected scan, diff or chat).")
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f"Negative weight for {name!r}.")
+    if not sum(mix.values()):
+        raise ValueError("The traffic mix has no weight.")
+    return mix
+
+
+def build_payloads(size: int, seed: int = 0) -> Dict[str, List[Tuple[str, dict]]]:
+    """A few (path, httpx request kwargs) variants per endpoint, generated once up front."""
+    text = {"Content-Type": "text/plain"}
+    scans = [
+        (f"{API}/scan?filename=load.{ext}", {"content": generate(kind, size, seed=seed + k), "headers": text})
+        for k, (kind, ext) in enumerate([("python", "py"), ("javascript", "js"), ("shell", "sh")])
+    ]
+    diffs = [(f"{API}/scan-diff", {"content": unified_diff(size, seed=seed + k), "headers": text}) for k in range(3)]
+
+    code = generate("python", 2048, seed=seed, bad_rate=0.1)
+    findings = [f.model_dump() for f in run_scan(ScanRequest(code=code, filename="app.py")).findings]
+    chats = [
+        (f"{API}/chat", {"json": {"findings": findings, "scanned_code": code, "message": question,
+                                  "history": history}})
+        for question, history in [
+            ("Why is the first finding dangerous?", []),
+            ("Show me the fix.", [{"role": "user", "text": "Explain finding 1."},
+                                  {"role": "assistant", "text": "It runs a shell command."}]),
+        ]
+    ]
+    return {"scan": scans, "diff": diffs, "chat": chats}
+
+
+async def _send(client: httpx.AsyncClient, name: str, request: Tuple[str, dict], scheduled: float,
+                samples: List[Sample]) -> None:
+    path, kwargs = request
+    try:
+        status = (await client.post(path, **kwargs)).status_code
+    except httpx.HTTPError:
+        status = 0
+    samples.append((name, status, time.perf_counter() - scheduled))
+
+
+async def drive(app_url: str, rps: float, duration: float, mix: Dict[str, float],
+                payloads: Dict[str, List[Tuple[str, dict]]], seed: int = 0,
+                timeout: float = 60.0, connections: int = 100) -> Tuple[List[Sample], float]:
+    """Send rps * duration requests at evenly spaced times; (samples, seconds until the last reply)."""
+    rng = random.Random(seed)
+    names = [n for n in mix if mix[n] > 0]
+    weights = [mix[n] for n in names]
+    samples: List[Sample] = []
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        for i in range(max(1, int(rps * duration))):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = rng.choices(names, weights)[0]
+            tasks.append(asyncio.create_task(_send(client, name, rng.choice(payloads[name]), scheduled, samples)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+# 2. Reporting
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of an ascending sequence."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-round(q * len(ordered)) // 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, dict]:
+    """Per-endpoint (and "all") request counts, throughput, error rate and latency percentiles."""
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    groups["all"] = list(samples)
+
+    report = {}
+    for name, group in groups.items():
+        latencies = sorted(s[2] for s in group)
+        statuses: Dict[str, int] = {}
+        for s in group:
+            statuses[str(s[1])] = statuses.get(str(s[1]), 0) + 1
+        ok = sum(1 for s in group if 200 <= s[1] < 300)
+        report[name] = {
+            "requests": len(group),
+            "throughput_per_s": round(ok / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(1 - ok / len(group), 4) if group else 0.0,
+            "statuses": statuses,
+            **{f"p{int(q)}_ms": round(percentile(latencies, q) * 1000, 2) for q in (50, 95, 99)},
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+    return report
+
+
+# 3. Servers
+
+@contextmanager
+def servers(fake_args: Sequence[str] = (), workers: int = 1) -> Iterator[Tuple[str, str]]:
+    """Start the fake Messages API and the app; yields (app url, fake url)."""
+    fake_url = f"http://127.0.0.1:{free_port()}"
+    fake = start_server(["-m", "backend.benchmarks.fake_anthropic", "--port", fake_url.rsplit(":", 1)[1],
+                         *fake_args], f"{fake_url}/stats")
+    try:
+        app_port = str(free_port())
+        env = {"ANTHROPIC_URL": f"{fake_url}/v1/messages", "ANTHROPIC_API_KEY": "load-test"}
+        app = start_server(["-m", "uvicorn", "backend.app.main:app", "--host", "127.0.0.1", "--port", app_port,
+                            "--workers", str(workers), "--log-level", "warning"],
+                           f"http://127.0.0.1:{app_port}/healthz", env)
+        try:
+            yield f"http://127.0.0.1:{app_port}", fake_url
+        finally:
+            stop_server(app)
+    finally:
+        stop_server(fake)
+
+
+def run_load(app_url: str, rps: float, duration: float, mix: Dict[str, float], size: int,
+             seed: int = 0, timeout: float = 60.0, connections: int = 100) -> dict:
+    payloads = build_payloads(size, seed)
+    samples, elapsed = asyncio.run(drive(app_url, rps, duration, mix, payloads, seed, timeout, connections))
+    return {
+        "config": {"rps": rps, "duration_s": duration, "mix": mix, "payload_bytes": size, "seed": seed},
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": summarize(samples, elapsed),
+    }
+
+
+def _print_table(report: dict) -> None:
+    print(f"{'endpoint':<8} {'requests':>8} {'ok/s':>8} {'errors':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for name, row in report["endpoints"].items():
+        print(f"{name:<8} {row['requests']:>8} {row['throughput_per_s']:>8.1f} {row['error_rate']:>7.1%} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}  "
+              f"{json.dumps(row['statuses'], sort_keys=True)}")
+    if "upstream" in report:
+        print(f"fake Messages API statuses: {json.dumps(report['upstream'], sort_keys=True)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the AI DevSec API under mixed traffic.")
+    parser.add_argument("--rps", type=float, default=20.0, help="Target request rate.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of traffic to send.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Relative endpoint weights (default {DEFAULT_MIX}).")
+    parser.add_argument("--size-kb", type=int, default=16, help="Size of each scan / diff payload, in KB.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout, in seconds.")
+    parser.add_argument("--connections", type=int, default=100, help="Client connection pool size.")
+    parser.add_argument("--app-url", help="Target a running app instead of starting one (no fake upstream).")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started app.")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Fake Messages API mean latency.")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream 500s.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of upstream 429s.")
+    parser.add_argument("--out", help="Write JSON results to this path.")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    size = args.size_kb * 1024
+
+    if args.app_url:
+        report = run_load(args.app_url, args.rps, args.duration, mix, size, args.seed, args.timeout, args.connections)
+    else:
+        fake_args = ["--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                     "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+                     "--seed", str(args.seed)]
+        with servers(fake_args, args.workers) as (app_url, fake_url):
+            report = run_load(app_url, args.rps, args.duration, mix, size, args.seed, args.timeout, args.connections)
+            report["upstream"] = httpx.get(f"{fake_url}/stats").json()
+    _print_table(report)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
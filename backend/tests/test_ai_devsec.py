@@ -140,6 +140,41 @@ def test_diff_scan_ignores_removed_lines():
     assert resp.findings == []
 
 
+def test_diff_scan_tolerates_empty_added_lines():
+    diff = (
+        "+++ b/app.py\n"
+        "@@ -1,1 +1,3 @@\n"
+        "+\n"
+        '+os.system("whoami")\n'
+    )
+    resp = run_diff_scan(diff)
+    assert [f.line for f in resp.findings] == [2]
+
+
+def test_diff_scan_tokenizes_each_hunk_on_its_own():
+    diff = (
+        "+++ b/app.py\n"
+        "@@ -1,3 +1,3 @@\n"
+        " def handle(data):\n"
+        '-    """Old summary.\n'
+        '+    """Handle the request.\n'
+        "     Details.\n"
+        "@@ -40,2 +40,3 @@\n"
+        "     x = 1\n"
+        "+    obj = pickle.loads(data)\n"
+        "+++ b/app.js\n"
+        "@@ -1,1 +1,2 @@\n"
+        "+/* new header\n"
+        " * old text */\n"
+        "@@ -9,1 +10,2 @@\n"
+        " run();\n"
+        "+eval(req.query.code);\n"
+    )
+    found = {(f.file, f.detector, f.line) for f in run_diff_scan(diff).findings}
+    assert ("app.py", "insecure_deserialization", 41) in found
+    assert ("app.js", "dangerous_exec", 11) in found
+
+
 # ── sql_injection ─────────────────────────────────────────────────────────────
 
 def test_sql_injection_flags_fstring():
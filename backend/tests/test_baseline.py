@@ -0,0 +1,117 @@
+import json
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import baseline as bl
+from backend.app.ai_devsec import cli
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.ruleset import get_ruleset
+from backend.app.ai_devsec.service import run_bytes_scan, run_diff_scan, run_gate, run_scan
+from backend.app.main import app
+
+
+LEGACY = 'import os\nos.system("id")\npassword = "hunter2"\n'
+
+
+def _fingerprints(resp):
+    return [f.fingerprint for f in resp.findings]
+
+
+def test_fingerprints_survive_line_shifts_but_not_edits():
+    base = run_scan(ScanRequest(code=LEGACY, filename="app.py"))
+    assert all(f.rule_id and len(f.fingerprint) == 16 for f in base.findings)
+    assert base.findings[0].rule_id.startswith("dangerous_exec.")
+
+    shifted = run_scan(ScanRequest(code="\n\n# moved\n" + LEGACY.replace("os.system", "  os.system"), filename="app.py"))
+    assert [f.line for f in shifted.findings] != [f.line for f in base.findings]
+    assert _fingerprints(shifted) == _fingerprints(base)
+
+    assert _fingerprints(run_scan(ScanRequest(code=LEGACY, filename="other.py"))) != _fingerprints(base)
+    edited = run_scan(ScanRequest(code=LEGACY.replace('"id"', '"ls"'), filename="app.py"))
+    assert _fingerprints(edited)[0] != _fingerprints(base)[0] and _fingerprints(edited)[1] == _fingerprints(base)[1]
+
+    # every path to a finding agrees: bytes, diffs (re-attributed to their file)
+    assert _fingerprints(run_bytes_scan(LEGACY.encode(), "app.py")) == _fingerprints(base)
+    diff = "+++ b/app.py\n@@ -1,0 +7,3 @@\n" + "".join("+" + line + "\n" for line in LEGACY.splitlines())
+    assert _fingerprints(run_diff_scan(diff)) == _fingerprints(base)
+
+
+def test_baselined_findings_are_dropped_before_formatting(monkeypatch):
+    first = run_scan(ScanRequest(code=LEGACY, filename="app.py")).findings[0]
+    accepted = bl.Baseline("legacy", [int(first.fingerprint, 16)])
+    formatted = []
+    for detector in get_ruleset().detectors:
+        monkeypatch.setattr(detector, "evidence", lambda line, fmt=detector.evidence: formatted.append(line) or fmt(line))
+
+    code = LEGACY + "eval(x)\n"
+    resp = run_scan(ScanRequest(code=code, filename="app.py"), accepted)
+    assert resp.suppressed == 1
+    assert sorted(f.line for f in resp.findings) == [3, 4]
+    assert 'os.system("id")' not in formatted and len(formatted) == 2
+
+    # the same baseline does not apply to another file
+    assert run_scan(ScanRequest(code=code, filename="b.py"), accepted).suppressed == 0
+    assert run_bytes_scan(code.encode(), "app.py", accepted).suppressed == 1
+
+
+def test_large_baseline_diff_and_gate():
+    fps = _fingerprints(run_scan(ScanRequest(code=LEGACY, filename="app.py")))
+    rng = random.Random(0)
+    keys = {rng.getrandbits(64) for _ in range(100_000)} | {int(fp, 16) for fp in fps}
+    accepted = bl.Baseline("big", keys)
+
+    diff = "+++ b/app.py\n@@ -1,0 +1,4 @@\n" + "".join("+" + line + "\n" for line in LEGACY.splitlines()) + "+eval(y)\n"
+    resp = run_diff_scan(diff, accepted)
+    assert resp.suppressed == 2 and [(f.file, f.line) for f in resp.findings] == [("app.py", 4)]
+    assert run_gate(ScanRequest(code=LEGACY, filename="app.py"), "LOW", accepted).passed
+    assert not run_gate(ScanRequest(code=LEGACY, filename="app.py"), "LOW").passed
+
+
+def test_store_persists_packed_keys(tmp_path):
+    db = str(tmp_path / "baselines.db")
+    bl.BaselineStore(db).put(bl.Baseline.parse("team-a", ["00000000000000ff", "ffffffffffffffff"]))
+    fresh = bl.BaselineStore(db)
+    assert fresh.get("team-a").keys == {255, 2 ** 64 - 1} and fresh.names() == ["team-a"]
+    assert fresh.delete("team-a") and fresh.get("team-a") is None
+    with pytest.raises(bl.BaselineError):
+        bl.Baseline.parse("x", ["not-hex"])
+    with pytest.raises(bl.BaselineError):
+        fresh.put(bl.Baseline("../etc", []))
+
+
+def test_endpoints(monkeypatch):
+    monkeypatch.setattr(bl, "STORE", bl.BaselineStore())
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    admin = {"X-Admin-Token": "s3cret"}
+    client = TestClient(app)
+    text = {"Content-Type": "text/plain"}
+
+    full = client.post("/api/ai-devsec/scan?filename=app.py", content=LEGACY, headers=text).json()
+    assert client.put("/api/ai-devsec/baselines/legacy", json={"findings": full["findings"]}).status_code == 403
+    resp = client.put("/api/ai-devsec/baselines/legacy", json={"findings": full["findings"]}, headers=admin)
+    assert resp.json() == {"name": "legacy", "entries": 2}
+    assert client.get("/api/ai-devsec/baselines/legacy").json()["entries"] == 2
+
+    body = client.post("/api/ai-devsec/scan?filename=app.py&baseline=legacy", content=LEGACY + "eval(x)\n", headers=text).json()
+    assert body["suppressed"] == 2 and [f["line"] for f in body["findings"]] == [4]
+    assert client.post("/api/ai-devsec/scan?baseline=nope", content=LEGACY, headers=text).status_code == 404
+    bad = client.put("/api/ai-devsec/baselines/x", json={"fingerprints": ["zz"]}, headers=admin)
+    assert bad.status_code == 422
+
+    assert client.delete("/api/ai-devsec/baselines/legacy", headers=admin).status_code == 204
+    assert client.get("/api/ai-devsec/baselines/legacy").status_code == 404
+
+
+def test_cli_baseline(tmp_path, capsys):
+    (tmp_path / "app.py").write_text(LEGACY)
+    report = tmp_path / "report.json"
+    assert cli.main([str(tmp_path / "app.py"), "--format", "json", "-o", str(report)]) == 1
+    assert cli.main([str(tmp_path / "app.py"), "--baseline", str(report)]) == 0
+    assert "2 baselined finding(s) hidden" in capsys.readouterr().out
+
+    sarif = tmp_path / "out.sarif"
+    cli.main([str(tmp_path / "app.py"), "--format", "sarif", "-o", str(sarif)])
+    result = json.loads(sarif.read_text())["runs"][0]["results"][0]
+    assert result["partialFingerprints"]["devsecFingerprint/v1"] == json.loads(report.read_text())["findings"][0]["fingerprint"]
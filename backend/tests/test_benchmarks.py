@@ -0,0 +1,43 @@
+from backend.app.ai_devsec.context import ScanContext
+from backend.benchmarks.corpus import CORPORA, generate
+from backend.benchmarks.bench import bench_python_ast, compare, run_suite
+
+
+def test_corpus_is_deterministic_and_sized():
+    for kind in CORPORA:
+        a = generate(kind, 8_000, seed=1)
+        b = generate(kind, 8_000, seed=1)
+        assert a == b
+        assert len(a) >= 8_000
+
+
+def test_minified_bundle_has_no_comment_hiding_the_rest_of_a_line():
+    text = generate("minified", 64_000, seed=1)
+    ctx = ScanContext(text, "javascript")
+    for lineno, line in enumerate(ctx.lines, 1):
+        assert not ctx.in_comment(lineno, len(line) - 1)
+
+
+def test_run_suite_reports_detectors_and_end_to_end():
+    report = run_suite(["python", "diff"], 4_000, repeat=1, cold_start=False)
+    results = report["results"]
+    assert "python/detector/secrets" in results
+    assert results["python/run_scan"]["mb_per_s"] > 0
+    assert results["diff/run_diff_scan"]["peak_bytes"] > 0
+
+
+def test_compare_flags_only_regressions_above_threshold():
+    baseline = {"results": {"python/run_scan": {"mb_per_s": 10.0, "peak_bytes": 1000, "seconds": 1.0}}}
+    slower   = {"results": {"python/run_scan": {"mb_per_s": 7.0,  "peak_bytes": 1000, "seconds": 9.0}}}
+    noisy    = {"results": {"python/run_scan": {"mb_per_s": 9.5,  "peak_bytes": 1050, "seconds": 1.1}}}
+
+    regressions = compare(slower, baseline, threshold=0.15)
+    assert len(regressions) == 1 and "mb_per_s" in regressions[0]
+    assert compare(noisy, baseline, threshold=0.15) == []
+
+
+def test_python_ast_tier_is_benchmarked_against_regex_only():
+    [entry] = bench_python_ast(16_000, repeat=1).values()
+    assert entry["cold_cost_ratio"] > 0 and entry["warm_cost_ratio"] > 0
+    # a warm parse cache leaves only a hash and a lookup on top of the regex tier
+    assert entry["warm_cost_ratio"] < entry["cold_cost_ratio"]
@@ -0,0 +1,82 @@
+import mmap
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import bytescan
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_bytes_scan, run_scan
+from backend.app.main import app
+from backend.benchmarks.bench import FILENAMES
+from backend.benchmarks.corpus import generate
+
+
+TRICKY = '''"""
+Module docstring mentioning eval(x) and os.system("id").
+"""
+import os
+
+def f(cmd):
+    """eval(cmd) in a docstring"""   # and a comment
+    s = "eval(cmd) in a string"; eval(cmd)
+    x = """a
+    eval(y) inside a multi-line string""" ; os.system(cmd)
+    # os.system(cmd)
+    password = "hunter2"  # password = "other"
+    return pickle.loads(data)
+/* not python */ query = "SELECT * FROM t WHERE id = " + user_id
+'''
+
+
+def _where(resp):
+    return [(f.detector, f.severity, f.line, f.evidence, f.message) for f in resp.findings]
+
+
+@pytest.mark.parametrize("kind", sorted(FILENAMES))
+def test_matches_the_text_scanner_on_every_corpus(kind, monkeypatch):
+    text = generate(kind, 200_000, seed=3, bad_rate=0.05)
+    expected = _where(run_scan(ScanRequest(code=text, filename=FILENAMES[kind])))
+    assert expected
+    assert _where(run_bytes_scan(text.encode(), FILENAMES[kind])) == expected
+    # small chunks: lines, tokens and line numbers carried across chunk boundaries
+    monkeypatch.setattr(bytescan, "CHUNK_BYTES", 4096)
+    assert _where(run_bytes_scan(text.encode(), FILENAMES[kind])) == expected
+
+
+@pytest.mark.parametrize("filename", ["app.py", "app.js", "run.sh", "q.sql", None])
+def test_comments_strings_and_crlf(filename, monkeypatch):
+    monkeypatch.setattr(bytescan, "CHUNK_BYTES", 64)
+    for text in (TRICKY, TRICKY.replace("\n", "\r\n"), "-- eval(x)\n" + TRICKY):
+        expected = _where(run_scan(ScanRequest(code=text, filename=filename)))
+        assert _where(run_bytes_scan(text.encode(), filename)) == expected
+
+
+def test_mmap_memoryview_and_invalid_utf8(tmp_path):
+    data = b'x = "\xff\xfe"; eval(x)\nimport os\nos.system("\xc3(")\npassword = "hunter2"\n'
+    path = tmp_path / "dump.py"
+    path.write_bytes(data)
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mapped = run_bytes_scan(mm, "dump.py")
+    assert run_bytes_scan(memoryview(data), "dump.py") == mapped
+    assert [(f.line, f.detector) for f in mapped.findings] == [
+        (1, "dangerous_exec"), (3, "dangerous_exec"), (4, "hardcoded_creds"),
+    ]
+    # only the evidence lines are decoded, with replacement characters
+    assert mapped.findings[1].evidence == 'os.system("\ufffd(")' and mapped.findings[1].file == "dump.py"
+
+
+def test_endpoint():
+    client = TestClient(app)
+    resp = client.post("/api/ai-devsec/scan-bytes", params={"filename": "a.py"},
+                       content=b"import os\nos.system('\xff')\n",
+                       headers={"Content-Type": "application/octet-stream"})
+    assert resp.status_code == 200
+    [finding] = resp.json()["findings"]
+    assert (finding["line"], finding["file"]) == (2, "a.py")
+    assert client.post("/api/ai-devsec/scan-bytes", content=b" \n").status_code == 422
+
+
+def test_comment_ended_by_a_lone_carriage_return_hides_nothing():
+    found = run_bytes_scan(b"# note\reval(user_input)\r", "a.py").findings
+    assert [f.detector for f in found] == ["dangerous_exec"]
+    assert run_bytes_scan(b"# note eval(user_input)\r\n", "a.py").findings == []
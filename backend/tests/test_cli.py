@@ -0,0 +1,87 @@
+import json
+import subprocess
+import sys
+
+from backend.app.ai_devsec import cli
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+
+
+BAD = 'import os\nos.system("id")\n'
+
+
+def _tree(root, files):
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content)
+
+
+def test_walk_honours_ignore_files(tmp_path, monkeypatch):
+    (tmp_path / ".git").mkdir()
+    _tree(tmp_path, {
+        ".gitignore": "build/\n*.log\n/top.py\n!keep.log\n",
+        "src/.devsecignore": "vendor/**\n",
+        "src/app.py": BAD,
+        "src/vendor/lib/x.py": BAD,
+        "src/build": BAD,                 # a file: "build/" only ignores directories
+        "build/out.py": BAD,
+        "top.py": BAD,
+        "src/top.py": BAD,                # "/top.py" is anchored to the root
+        "debug.log": BAD,
+        "keep.log": BAD,
+        ".git/config": BAD,
+    })
+    monkeypatch.chdir(tmp_path)
+    assert list(cli.walk(["."])) == [".gitignore", "keep.log", "src/.devsecignore", "src/app.py", "src/build", "src/top.py"]
+    # ignore files above the walked directory still apply; explicit files are always scanned
+    assert list(cli.walk(["src", "debug.log"])) == ["src/.devsecignore", "src/app.py", "src/build", "src/top.py", "debug.log"]
+    assert "src/vendor/lib/x.py" in cli.walk(["."], use_ignore_files=False)
+
+
+def test_binary_empty_and_oversized_files_are_skipped(tmp_path):
+    _tree(tmp_path, {"a.py": BAD, "b.bin": b"\x7fELF\0\0eval(x)", "c.py": "", "d.py": BAD * 1000})
+    resp, scanned, skipped = cli.scan_paths([str(tmp_path)], jobs=1, max_bytes=1024)
+    assert (scanned, skipped) == (1, 3)
+    assert [(f.file, f.line) for f in resp.findings] == [(str(tmp_path / "a.py"), 2)]
+
+
+def test_pool_and_serial_runs_agree(tmp_path, monkeypatch):
+    files = {f"m{i:03}.py": BAD if i % 3 else "x = 1\n" for i in range(70)}
+    _tree(tmp_path, files)
+    serial, _, _ = cli.scan_paths([str(tmp_path)], jobs=1)
+    pooled, scanned, _ = cli.scan_paths([str(tmp_path)], jobs=2)
+    assert scanned == 70 and pooled == serial
+    assert len(serial.findings) == sum(1 for text in files.values() if text == BAD)
+    assert serial.findings[0] == run_scan(ScanRequest(code=BAD, filename=str(tmp_path / "m001.py"))).findings[0]
+
+
+def test_formats_and_exit_codes(tmp_path, capsys):
+    _tree(tmp_path, {"app.py": BAD, "ok.py": "x = 1\n"})
+    assert cli.main([str(tmp_path), "--format", "json"]) == 1
+    body = json.loads(capsys.readouterr().out)
+    assert body["files_scanned"] == 2 and body["findings"][0]["line"] == 2
+    score = body["risk_score"]
+    assert cli.main([str(tmp_path), "--fail-above", str(score - 1)]) == 1
+    assert cli.main([str(tmp_path), "--fail-above", str(score)]) == 0
+    assert "app.py:2: HIGH [dangerous_exec]" in capsys.readouterr().out
+    assert cli.main([str(tmp_path / "ok.py")]) == 0
+    capsys.readouterr()
+
+    out = tmp_path / "report.sarif"
+    cli.main([str(tmp_path / "app.py"), "--format", "sarif", "-o", str(out)])
+    run = json.loads(out.read_text())["runs"][0]
+    [result] = run["results"]
+    assert result["ruleId"] == "dangerous_exec" and result["level"] == "error"
+    assert result["locations"][0]["physicalLocation"]["region"] == {"startLine": 2}
+    assert [r["id"] for r in run["tool"]["driver"]["rules"]] == ["dangerous_exec"]
+
+
+def test_module_entry_point(tmp_path):
+    _tree(tmp_path, {"app.py": BAD})
+    proc = subprocess.run([sys.executable, "-m", "backend.app.ai_devsec.cli", str(tmp_path)],
+                          capture_output=True, text=True)
+    assert proc.returncode == 1 and "1 file(s) scanned" in proc.stdout
@@ -0,0 +1,127 @@
+import json
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import cli, cluster
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+from backend.app.main import app
+from backend.benchmarks.corpus import generate
+
+
+def _files(count=24, seed=0):
+    rng = random.Random(seed)
+    kinds = [("python", "py"), ("javascript", "js"), ("shell", "sh")]
+    files = []
+    for k in range(count):
+        kind, ext = kinds[k % 3]
+        files.append((f"src/m{k}.{ext}", generate(kind, rng.randint(1, 16) * 1024, seed=k, bad_rate=0.05)))
+    return files
+
+
+def _local(files):
+    return [f for name, code in files for f in run_scan(ScanRequest(code=code, filename=name)).findings]
+
+
+@pytest.fixture(scope="module")
+def workers():
+    with cluster.local_workers(2) as (urls, token):
+        yield urls, token
+
+
+def test_shards_are_balanced_and_cover_every_file():
+    files = [("big", "x" * 100_000)] + [(f"f{k}", "y" * (1000 + 37 * k)) for k in range(40)]
+    shards = cluster.shard(files, slots=4, shard_bytes=50_000)
+    assert sorted(i for s in shards for i in s) == list(range(len(files)))
+    assert [0] in shards and len(shards) == 4
+    sizes = sorted(sum(len(files[i][1]) for i in s) for s in shards if s != [0])
+    assert sizes[-1] - sizes[0] < 2000
+    assert len(cluster.shard(files[1:], slots=2, shard_bytes=10_000)) == 7   # 68,860 bytes
+    assert cluster.shard(files[:2], slots=8) == [[0], [1]]
+
+
+def test_merged_result_matches_a_local_scan(workers):
+    urls, token = workers
+    files = _files()
+    resp = cluster.Coordinator(urls, token, shard_bytes=32 * 1024).scan(files)
+    local = _local(files)
+    assert resp.findings == local and len(local) > 20
+    assert resp.risk_score == 100 and resp.summary.startswith(f"{len(local)} finding(s)")
+
+
+def test_dead_workers_are_retried_elsewhere_and_bad_tokens_fail_fast(workers):
+    urls, token = workers
+    files = _files(12, seed=1)
+    dead = f"http://127.0.0.1:{cluster.free_port()}"
+    resp = cluster.Coordinator([dead] + urls, token, shard_bytes=8 * 1024, backoff_s=0.01).scan(files)
+    assert resp.findings == _local(files)
+
+    with pytest.raises(cluster.ClusterError, match="every worker failed"):
+        cluster.Coordinator([dead], token, attempts=10, worker_failures=2, backoff_s=0.01).scan(files)
+    with pytest.raises(cluster.ClusterError, match="failed 2 times"):
+        cluster.Coordinator([dead], token, attempts=2, backoff_s=0.01).scan(files)
+    with pytest.raises(cluster.ClusterError, match="HTTP 403"):
+        cluster.Coordinator(urls, "wrong").scan(files)
+
+
+def test_endpoints(workers, monkeypatch):
+    urls, token = workers
+    client = TestClient(app)
+    files = _files(6, seed=2)
+    body = {"files": [{"filename": name, "code": code} for name, code in files] + [{"filename": "e.py", "code": " "}]}
+
+    monkeypatch.delenv("CLUSTER_TOKEN", raising=False)
+    assert client.post("/api/ai-devsec/internal/scan-shard", json=body, headers={"X-Cluster-Token": "t"}).status_code == 403
+    monkeypatch.setenv("CLUSTER_TOKEN", "t")
+    shard = client.post("/api/ai-devsec/internal/scan-shard", json=body, headers={"X-Cluster-Token": "t"}).json()
+    assert len(shard["findings"]) == 7 and shard["findings"][-1] == []
+
+    monkeypatch.setenv("ADMIN_TOKEN", "admin")
+    admin = {"X-Admin-Token": "admin"}
+    monkeypatch.delenv("CLUSTER_WORKERS", raising=False)
+    assert client.post("/api/ai-devsec/cluster/scan", json=body, headers=admin).status_code == 503
+    monkeypatch.setenv("CLUSTER_WORKERS", ",".join(urls))
+    monkeypatch.setenv("CLUSTER_TOKEN", token)
+    merged = client.post("/api/ai-devsec/cluster/scan", json=body, headers=admin).json()
+    assert [(f["file"], f["line"], f["fingerprint"]) for f in merged["findings"]] == \
+        [(f.file, f.line, f.fingerprint) for f in _local(files)]
+
+
+def test_a_worker_scans_shards_concurrently(monkeypatch):
+    from backend.app.ai_devsec import service
+
+    # each shard waits for the other: this passes only if neither holds the event loop
+    barrier = threading.Barrier(2, timeout=5)
+    real = service.run_scan
+
+    def run_scan_after_the_other(req):
+        barrier.wait()
+        return real(req)
+
+    monkeypatch.setattr(service, "run_scan", run_scan_after_the_other)
+    monkeypatch.setenv("CLUSTER_TOKEN", "t")
+    body = {"files": [{"filename": "a.py", "code": "eval(x)\n"}]}
+    with TestClient(app) as client, ThreadPoolExecutor(2) as pool:
+        post = lambda _: client.post("/api/ai-devsec/internal/scan-shard", json=body, headers={"X-Cluster-Token": "t"})
+        assert [r.status_code for r in pool.map(post, range(2))] == [200, 200]
+
+
+def test_cli_on_workers(workers, tmp_path, monkeypatch, capsys):
+    urls, token = workers
+    for name, code in _files(9, seed=3):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text(code)
+    (tmp_path / "src" / "blank.py").write_text("\n\n")
+
+    assert cli.main([str(tmp_path), "--format", "json"]) == 1
+    local = json.loads(capsys.readouterr().out)
+    monkeypatch.setenv("CLUSTER_TOKEN", token)
+    assert cli.main([str(tmp_path), "--format", "json", "--workers", ",".join(urls)]) == 1
+    remote = json.loads(capsys.readouterr().out)
+    key = lambda f: (f["file"], f["line"], f["rule_id"])
+    assert sorted(map(key, remote["findings"])) == sorted(map(key, local["findings"]))
+    assert (remote["files_scanned"], remote["files_skipped"]) == (9, 1) == (local["files_scanned"], local["files_skipped"])
@@ -0,0 +1,54 @@
+"""
+Cold-start budget for the serverless entry point (api/index.py).
+
+Runs in a fresh interpreter because this test process has long since
+imported everything. Override the budget with COLD_START_BUDGET_S on
+slow CI machines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BUDGET_S = float(os.getenv("COLD_START_BUDGET_S", "1.5"))
+
+# Modules that must stay out of the import path until a request needs them
+LAZY_MODULES = [
+    "httpx",
+    "backend.app.ai_devsec.claude",
+    "backend.app.ai_devsec.detectors",
+    "backend.app.ai_devsec.ruleset",
+    "backend.app.ai_devsec.context",
+    "backend.app.ai_devsec.profiling",
+    "backend.app.ai_devsec.incremental",
+    "backend.app.ai_devsec.live",
+    "backend.app.ai_devsec.jobs",
+    "backend.app.ai_devsec.gitscan",
+    "backend.app.ai_devsec.cli",
+    "backend.app.ai_devsec.bytescan",
+    "backend.app.ai_devsec.baseline",
+    "backend.app.ai_devsec.pyast",
+    "backend.app.ai_devsec.history",
+    "backend.app.ai_devsec.cluster",
+]
+
+SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import api.index
+elapsed = time.perf_counter() - t0
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def test_app_import_stays_under_budget_and_defers_heavy_modules():
+    proc = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout)
+    assert result["loaded"] == []
+    assert result["elapsed"] < BUDGET_S, f"import took {result['elapsed']:.3f}s (budget {BUDGET_S}s)"
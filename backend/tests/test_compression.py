@@ -0,0 +1,97 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import compression
+from backend.app.main import app
+from backend.benchmarks.corpus import unified_diff
+
+
+CODE = 'import os\nos.system("id")\nos.system(cmd)\npassword = "hunter2"\n'
+
+
+def _post(client, path, body, encoding, **headers):
+    return client.post(path, content=body, headers={"Content-Type": "text/plain", "Content-Encoding": encoding,
+                                                     **headers})
+
+
+def test_gzip_bodies_scan_like_plain_ones():
+    client = TestClient(app)
+    plain = client.post("/api/ai-devsec/scan?filename=a.py", content=CODE, headers={"Content-Type": "text/plain"})
+    packed = _post(client, "/api/ai-devsec/scan?filename=a.py", gzip.compress(CODE.encode()), "gzip")
+    assert packed.status_code == 200
+    assert packed.json()["findings"] == plain.json()["findings"]
+
+    diff = unified_diff(64 * 1024, seed=2, bad_rate=0.05)
+    # multi-member gzip (concatenated streams) decodes as one body
+    halves = gzip.compress(diff[:1000].encode()) + gzip.compress(diff[1000:].encode())
+    body = _post(client, "/api/ai-devsec/scan-diff", halves, "gzip").json()
+    assert body == client.post("/api/ai-devsec/scan-diff", content=diff, headers={"Content-Type": "text/plain"}).json()
+
+
+def test_zip_bombs_and_bad_bodies_are_rejected(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(compression, "MAX_BYTES", 1024 * 1024)
+    inflated = []
+    real = compression.GzipDecoder.decode
+    monkeypatch.setattr(compression.GzipDecoder, "decode",
+                        lambda self, data, budget: inflated.append(len(out := real(self, data, budget))) or out)
+
+    bomb = gzip.compress(b"\n" * (64 * 1024 * 1024))   # 64 MB of newlines in ~64 KB
+    resp = _post(TestClient(app), "/api/ai-devsec/scan", bomb, "gzip")
+    assert resp.status_code == 413 and "REQUEST_MAX_DECOMPRESSED_MB" in resp.json()["detail"]
+    assert sum(inflated) <= 1024 * 1024
+
+    assert _post(client, "/api/ai-devsec/scan", b"not gzip", "gzip").status_code == 400
+    assert _post(client, "/api/ai-devsec/scan", gzip.compress(CODE.encode())[:-12], "gzip").status_code == 400
+    assert _post(client, "/api/ai-devsec/scan", CODE.encode(), "br").status_code == 415
+
+
+def test_zstd_bodies():
+    zstandard = pytest.importorskip("zstandard")
+    client = TestClient(app)
+    packed = _post(client, "/api/ai-devsec/scan?filename=a.py", zstandard.ZstdCompressor().compress(CODE.encode()), "zstd")
+    assert packed.status_code == 200 and len(packed.json()["findings"]) == 3
+
+    bomb = zstandard.ZstdCompressor().compress(b"\n" * (128 * 1024 * 1024))
+    assert _post(client, "/api/ai-devsec/scan", bomb, "zstd").status_code == 413
+    # streamed frames carry no size: refused by the bounded reads instead
+    stream = zstandard.ZstdCompressor().compressobj()
+    bomb = stream.compress(b"\n" * (128 * 1024 * 1024)) + stream.flush()
+    assert zstandard.get_frame_parameters(bomb).content_size == zstandard.CONTENTSIZE_UNKNOWN
+    assert _post(client, "/api/ai-devsec/scan", bomb, "zstd").status_code == 413
+    assert _post(client, "/api/ai-devsec/scan", b"\x28\xb5\x2f\xfdjunk", "zstd").status_code == 400
+
+
+def test_large_responses_are_gzipped_and_recommendations_deduped():
+    client = TestClient(app)
+    code = CODE * 200
+    plain = client.post("/api/ai-devsec/scan?filename=a.py", content=code,
+                        headers={"Content-Type": "text/plain", "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    packed = client.post("/api/ai-devsec/scan?filename=a.py", content=code,
+                         headers={"Content-Type": "text/plain", "Accept-Encoding": "gzip"})
+    assert packed.headers["content-encoding"] == "gzip"
+    small = client.post("/api/ai-devsec/scan?filename=a.py", content="x = 1\n",
+                        headers={"Content-Type": "text/plain", "Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    full = plain.json()
+    deduped = client.post("/api/ai-devsec/scan?filename=a.py&dedupe=true", content=code,
+                          headers={"Content-Type": "text/plain", "Accept-Encoding": "identity"})
+    body = deduped.json()
+    assert full["recommendations"] is None and set(body["recommendations"]) == {f["rule_id"] for f in full["findings"]}
+    assert all(f["recommendation"] is None for f in body["findings"])
+    restored = [{**f, "recommendation": body["recommendations"][f["rule_id"]]} for f in body["findings"]]
+    assert restored == full["findings"]
+    assert len(deduped.content) < 0.8 * len(plain.content)
+
+    # the incremental session keeps its full findings
+    edited = client.post(f"/api/ai-devsec/scan/{body['scan_id']}/edits",
+                         json={"revision": body["revision"],
+                               "edits": [{"start_line": 1, "end_line": 1, "lines": ["import os"]}]}).json()
+    assert all(f["recommendation"] for f in edited["findings"])
+    diff = "+++ b/a.py\n@@ -1,0 +1,2 @@\n+os.system(x)\n+os.system(y)\n"
+    diffed = client.post("/api/ai-devsec/scan-diff?dedupe=true", content=diff, headers={"Content-Type": "text/plain"})
+    assert len(diffed.json()["recommendations"]) == 1
@@ -0,0 +1,90 @@
+from backend.app.ai_devsec.context import ScanContext
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+
+
+def test_python_docstrings_and_hash_comments_are_comment_lines():
+    code = (
+        'def f():\n'
+        '    """\n'
+        '    Example: pickle.loads(data)\n'
+        '    """\n'
+        '    x = "# not a comment"  # trailing\n'
+        '    # hashlib.md5(x)\n'
+    )
+    ctx = ScanContext(code, "python")
+    assert ctx.comment_lines == [False, True, True, True, False, True]
+    assert ctx.in_string(5, code.splitlines()[4].index("#"))
+    assert ctx.in_comment(5, code.splitlines()[4].index("# trailing"))
+
+
+def test_block_comments_and_assigned_strings():
+    js = "/* eval(x)\n   still comment */ run();\nconst s = '/* not a comment */';\n"
+    ctx = ScanContext(js, "javascript")
+    assert ctx.comment_lines == [True, False, False]
+
+    py = 'query = """\nSELECT * FROM t\n"""\n'
+    assert ScanContext(py, "python").comment_lines == [False, False, False]
+
+
+def test_offsets_match_line_starts():
+    code = "a\r\nbb\n\nccc"
+    ctx = ScanContext(code)
+    assert [code[o:o + len(l)] for o, l in zip(ctx.offsets, ctx.lines)] == ctx.lines
+    assert ctx.line_of(code.index("ccc")) == 4
+
+
+def test_detectors_skip_docstrings_and_block_comments():
+    code = '"""\nUsage: data = pickle.loads(blob)\n"""\n'
+    resp = run_scan(ScanRequest(code=code, filename="mod.py"))
+    assert resp.findings == []
+
+    code = "/*\n * const q = \"SELECT * FROM t WHERE id = \" + id\n */\n"
+    resp = run_scan(ScanRequest(code=code, filename="db.js"))
+    assert resp.findings == []
+
+
+def test_dangerous_exec_ignores_calls_inside_strings():
+    resp = run_scan(ScanRequest(code='print("never call eval(x) on input")', filename="a.py"))
+    assert not any(f.detector == "dangerous_exec" for f in resp.findings)
+
+
+def test_untyped_input_does_not_treat_slashes_as_comments():
+    code = "cp build/* /srv/www\nimport pickle\npickle.loads(data)\neval(user_input)\nDEBUG = True\n"
+    found = {(f.detector, f.line) for f in run_scan(ScanRequest(code=code)).findings}
+    assert {("insecure_deserialization", 3), ("dangerous_exec", 4), ("debug_misconfig", 5)} <= found
+
+    resp = run_scan(ScanRequest(code="n = total // 2; eval(expr)\n"))
+    assert any(f.detector == "dangerous_exec" for f in resp.findings)
+
+    # a line starting with // is still a comment, and an apostrophe opens no string
+    assert run_scan(ScanRequest(code='// q = "SELECT * FROM t WHERE id=" + x\n')).findings == []
+    assert [f.line for f in run_scan(ScanRequest(code="it's a trap; eval(x)\n")).findings] == [1]
+    assert run_scan(ScanRequest(code="x = 'eval(y)'\n")).findings == []
+
+
+def test_perl_ruby_and_lua_comments_are_not_c_style():
+    lua_open = 'f = io.open("../" .. name)'
+    cases = [
+        ("my $v = $x // 0; eval($input);\n", "a.pl", "dangerous_exec", 1),
+        ("# eval($input)\n", "a.pl", "dangerous_exec", 0),
+        ("# eval(input)\nx = y // z; eval(input)\n", "a.rb", "dangerous_exec", 1),
+        ("local n = a // 2; " + lua_open + "\n", "a.lua", "path_traversal", 1),
+        ("-- " + lua_open + "\n--[[\n" + lua_open + "\n]]\n" + lua_open + "\n", "a.lua", "path_traversal", 1),
+    ]
+    for code, filename, detector, expected in cases:
+        found = [f for f in run_scan(ScanRequest(code=code, filename=filename)).findings if f.detector == detector]
+        assert len(found) == expected, code
+
+
+def test_comments_and_strings_end_at_every_line_break():
+    cases = [
+        ("# note\reval(user_input)\r", "a.py", ("dangerous_exec", 2)),
+        ("x = 1\r# c\rimport os\ros.system(cmd)\r", "a.py", ("dangerous_exec", 4)),
+        ("// note\u2028eval(userInput)\n", "a.js", ("dangerous_exec", 2)),
+        ("// note\reval(x)", "a.js", ("dangerous_exec", 2)),
+        ("s = 'open\x0ceval(x)\n", "a.py", ("dangerous_exec", 2)),
+    ]
+    for code, filename, expected in cases:
+        found = [(f.detector, f.line) for f in run_scan(ScanRequest(code=code, filename=filename)).findings]
+        assert expected in found, code
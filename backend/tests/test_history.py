@@ -0,0 +1,105 @@
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import history
+from backend.app.ai_devsec.findings import Finding, ScanRequest
+from backend.app.ai_devsec.service import run_scan, scan_response
+from backend.app.main import app
+
+
+MAIN = 'import os\nos.system("id")\npassword = "hunter2"\n'
+BRANCH = 'import os\npassword = "hunter2"\nresult = eval(expr)\n'
+
+
+def _store(tmp_path, **kw):
+    return history.HistoryStore(str(tmp_path / "history.db"), **kw)
+
+
+def test_compare_trend_and_top(tmp_path):
+    store = _store(tmp_path)
+    main = run_scan(ScanRequest(code=MAIN, filename="app.py"))
+    first = store.record("acme", "main", "scan", main)
+    store.record("acme", "feature", "scan", run_scan(ScanRequest(code=BRANCH, filename="app.py")))
+
+    diff = store.compare("acme", "main", "feature")
+    assert diff.base.history_id == first and diff.head.ref == "feature"
+    assert [(f.rule_id.split(".")[0], f.line) for f in diff.new] == [("dangerous_exec", 3)]
+    assert [f.fingerprint for f in diff.fixed] == [main.findings[0].fingerprint]
+    # the moved password line keeps its fingerprint: neither new nor fixed
+    assert len(diff.head.by_severity) and sum(diff.head.by_severity.values()) == 2
+
+    trend = store.trend("acme")
+    assert [s.ref for s in trend] == ["main", "feature"] and store.trend("acme", "main", 1)[0].history_id == first
+    assert store.top("acme", "rule", scan="main")[0].findings == 1
+    assert [(t.key, t.findings) for t in store.top("acme", "file")] == [("app.py", 2)]
+
+
+def test_unsigned_fingerprints_and_missing_scans(tmp_path):
+    store = _store(tmp_path)
+    finding = Finding(detector="d", severity="LOW", confidence=0.5, message="m", file="a.py", line=1,
+                      rule_id="d.x", fingerprint="ffffffffffffffff")
+    store.record("p", "a", "scan", scan_response([finding]))
+    store.record("p", "b", "scan", scan_response([]))
+    assert store.compare("p", "b", "a").new[0].fingerprint == "ffffffffffffffff"
+    for call in (lambda: store.compare("p", "nope"), lambda: store.top("other")):
+        try:
+            call()
+            raise AssertionError("expected HistoryNotFound")
+        except history.HistoryNotFound:
+            pass
+
+
+def test_writes_are_batched_off_the_request_path(tmp_path, monkeypatch):
+    store = _store(tmp_path, batch=16, flush_s=0.05, queue_max=8)
+    batches = []
+    real = store._write
+    monkeypatch.setattr(store, "_write", lambda batch: batches.append(len(batch)) or real(batch))
+
+    # hold the writer back: record() only queues, and a full queue drops the scan
+    monkeypatch.setattr(store, "_writer", "held")
+    resp = run_scan(ScanRequest(code=MAIN, filename="app.py"))
+    ids = [store.record("acme", f"r{k}", "scan", resp) for k in range(10)]
+    assert all(ids[:8]) and ids[8:] == [None, None] and batches == []
+
+    store._writer = None
+    store._start()
+    store.flush()
+    assert batches == [8]
+    assert len(store.trend("acme", limit=100)) == 8
+
+
+def test_queries_use_the_indexes(tmp_path):
+    store = _store(tmp_path)
+    plans = []
+    for sql, args in [
+        ("SELECT fingerprint FROM scan_findings AS f WHERE f.history_id = ? AND NOT EXISTS "
+         "(SELECT 1 FROM scan_findings AS o WHERE o.history_id = ? AND o.fingerprint = f.fingerprint)", ("a", "b")),
+        ("SELECT rule_id, COUNT(*) FROM scan_findings WHERE history_id = ? GROUP BY rule_id", ("a",)),
+        ("SELECT file, COUNT(*) FROM scan_findings WHERE history_id = ? GROUP BY file", ("a",)),
+        ("SELECT history_id FROM scans WHERE project = ? AND ref = ? ORDER BY created_at DESC LIMIT 1", ("p", "r")),
+    ]:
+        plans.append(" ".join(row[-1] for row in store._query("EXPLAIN QUERY PLAN " + sql, args)))
+    assert all("USING" in plan and "SCAN scan_findings" not in plan and "TEMP B-TREE" not in plan for plan in plans)
+
+
+def test_endpoints(tmp_path, monkeypatch):
+    client = TestClient(app)
+    text = {"Content-Type": "text/plain"}
+    monkeypatch.setattr(history, "STORE", None)
+    assert client.post("/api/ai-devsec/scan?project=acme", content=MAIN, headers=text).json()["history_id"] is None
+    assert client.get("/api/ai-devsec/history/acme/trend").status_code == 404
+
+    monkeypatch.setattr(history, "STORE", _store(tmp_path))
+    main = client.post("/api/ai-devsec/scan?filename=app.py&project=org/acme&ref=main", content=MAIN, headers=text)
+    assert main.json()["history_id"]
+    diff = "+++ b/app.py\n@@ -1,0 +1,3 @@\n" + "".join("+" + line + "\n" for line in BRANCH.splitlines())
+    head = client.post("/api/ai-devsec/scan-diff?project=org/acme&ref=feature&dedupe=true", content=diff,
+                       headers=text).json()
+
+    body = client.get("/api/ai-devsec/history/org/acme/compare?base=main").json()
+    assert body["head"]["history_id"] == head["history_id"] and body["head"]["kind"] == "diff"
+    assert [f["line"] for f in body["new"]] == [3] and len(body["fixed"]) == 1
+    assert [s["ref"] for s in client.get("/api/ai-devsec/history/org/acme/trend").json()] == ["main", "feature"]
+    top = client.get("/api/ai-devsec/history/org/acme/top?by=file&scan=main").json()
+    assert top == [{"key": "app.py", "findings": 2}]
+    assert client.get("/api/ai-devsec/history/org/acme/compare?base=nope").status_code == 404
+    assert client.post("/api/ai-devsec/scan?project=bad project", content=MAIN, headers=text).status_code == 422
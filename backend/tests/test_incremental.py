@@ -0,0 +1,145 @@
+import random
+import time
+
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import incremental
+from backend.app.ai_devsec.findings import LineEdit, RescanRequest, ScanRequest
+from backend.app.ai_devsec.service import run_scan
+from backend.app.main import app
+
+
+client = TestClient(app)
+
+CODE = "\n".join(
+    ["import os", 'os.system("id")']
+    + [f"x{i} = {i}" for i in range(200)]
+    + ['password = "hunter2"', "y = eval(z)"]
+) + "\n"
+
+
+def _scan(code, filename="app.py"):
+    resp = client.post(f"/api/ai-devsec/scan?filename={filename}", content=code,
+                       headers={"Content-Type": "text/plain"})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def _edit(scan_id, edits, revision=None):
+    return client.post(f"/api/ai-devsec/scan/{scan_id}/edits",
+                       json={"edits": edits, "revision": revision})
+
+
+def _full_findings(code, filename="app.py"):
+    return run_scan(ScanRequest(code=code, filename=filename)).findings
+
+
+def _full(code, filename="app.py"):
+    return [f.model_dump() for f in _full_findings(code, filename)]
+
+
+def test_edit_rescans_only_edited_lines_and_shifts_the_rest():
+    body = _scan(CODE)
+    assert body["scan_id"] and body["revision"] == 0
+
+    # insert two lines near the top: one new finding, later findings move down by two
+    resp = _edit(body["scan_id"], [{"start_line": 3, "end_line": 2, "lines": ["a = 1", "b = eval(c)"]}])
+    assert resp.status_code == 200
+    updated = resp.json()
+    assert updated["revision"] == 1
+
+    new_code = CODE.splitlines()
+    new_code[2:2] = ["a = 1", "b = eval(c)"]
+    new_code = "\n".join(new_code) + "\n"
+    assert updated["findings"] == _full(new_code)
+    assert {f["line"] for f in updated["findings"]} >= {2, 4, 205, 206}
+    assert incremental.STORE.get(body["scan_id"]).last_rescan == (2, 4)
+
+
+def test_edit_that_opens_a_docstring_rescans_until_tokens_line_up():
+    code = 'def f():\n    pass\n\nos.system("a")\nos.system("b")\n'
+    body = _scan(code)
+    assert len(body["findings"]) == 2
+
+    # an unterminated docstring above turns every later line into a comment
+    updated = _edit(body["scan_id"], [{"start_line": 3, "end_line": 3, "lines": ['    """']}]).json()
+    assert updated["findings"] == []
+    # and closing it again brings the findings back
+    updated = _edit(body["scan_id"], [{"start_line": 3, "end_line": 3, "lines": ['    """doc"""']}], revision=1).json()
+    assert updated["findings"] == _full('def f():\n    pass\n    """doc"""\nos.system("a")\nos.system("b")\n')
+
+
+def test_sequential_edits_match_a_full_scan():
+    body = _scan(CODE, "app.js")
+    edits = [
+        {"start_line": 1, "end_line": 2, "lines": ["/* start", "eval(x)"]},   # opens a block comment
+        {"start_line": 100, "end_line": 100, "lines": ["*/ eval(y)"]},
+        {"start_line": 204, "end_line": 204, "lines": []},                   # delete a line
+    ]
+    updated = _edit(body["scan_id"], edits).json()
+
+    lines = CODE.splitlines()
+    lines[0:2] = ["/* start", "eval(x)"]
+    lines[99] = "*/ eval(y)"
+    del lines[203]
+    assert updated["findings"] == _full("\n".join(lines) + "\n", "app.js")
+
+
+def test_random_edits_match_a_full_scan():
+    # a backslash-newline or trailing backslash inside a string must not stop the string matching
+    session = incremental.new_session("s = `\neval(x)\n\\", "app.js")
+    incremental.rescan(session, *incremental.splice(session.ctx.code, [LineEdit(start_line=3, end_line=3, lines=["x"])]))
+    assert session.findings == _full_findings("s = `\neval(x)\nx", "app.js") == []
+
+    pieces = ["eval(x)", "os.system(a)", "DEBUG = True", "`", '"', "'", '"""', "\\", "/*", "*/", "//", "#", " ", "x"]
+    rng = random.Random(7)
+
+    def line():
+        return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 4)))
+
+    for filename in ("app.js", "app.py", None):
+        for _ in range(150):
+            session = incremental.new_session("\n".join(line() for _ in range(rng.randint(1, 6))) + "\n", filename)
+            for _ in range(3):
+                n = len(session.ctx.lines)
+                start = rng.randint(1, n + 1)
+                edit = LineEdit(start_line=start, end_line=rng.randint(start - 1, n),
+                                lines=[line() for _ in range(rng.randint(0, 2))])
+                code, head, tail = incremental.splice(session.ctx.code, [edit])
+                if not code.strip():
+                    break
+                incremental.rescan(session, code, head, tail)
+                assert session.findings == _full_findings(code, filename), code
+
+
+def test_edit_errors():
+    assert _edit("nope", [{"start_line": 1, "end_line": 1, "lines": []}]).status_code == 404
+
+    body = _scan(CODE)
+    assert _edit(body["scan_id"], [{"start_line": 999, "end_line": 999, "lines": []}]).status_code == 422
+    assert _edit(body["scan_id"], [{"start_line": 1, "end_line": 1, "lines": ["a\nb"]}]).status_code == 422
+    assert _edit(body["scan_id"], [{"start_line": 1, "end_line": 1, "lines": ["# x"]}], revision=0).status_code == 200
+    assert _edit(body["scan_id"], [{"start_line": 1, "end_line": 1, "lines": ["# y"]}], revision=0).status_code == 409
+
+
+def test_session_store_evicts_least_recently_used_and_expired(monkeypatch):
+    store = incremental.SessionStore(max_sessions=2, max_bytes=1000, ttl=60)
+    monkeypatch.setattr(incremental, "STORE", store)
+    ids = [incremental.open_session(ScanRequest(code=f"x = {i}\n")).scan_id for i in range(3)]
+    assert store.get(ids[0]) is None
+    assert store.get(ids[1]) is not None
+
+    big = incremental.open_session(ScanRequest(code="y = 1\n" * 200)).scan_id
+    assert store.get(big) is None   # larger than the byte budget on its own
+    assert len(store) <= 2
+
+    store.ttl = 0.01
+    time.sleep(0.02)
+    assert store.get(ids[2]) is None
+    request = RescanRequest(edits=[LineEdit(start_line=1, end_line=1, lines=[])])
+    try:
+        incremental.apply_edits(ids[1], request)
+    except incremental.SessionNotFound:
+        pass
+    else:
+        raise AssertionError("expired session was still usable")
@@ -0,0 +1,153 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import jobs
+from backend.app.ai_devsec.findings import Finding, ScanRequest
+from backend.app.ai_devsec.service import run_scan, scan_response
+from backend.app.main import app
+
+
+client = TestClient(app)
+
+FILES = [
+    {"filename": "app.py", "code": 'import os\nos.system("id")\npassword = "hunter2"\n'},
+    {"filename": "clean.py", "code": "x = 1\n"},
+    {"filename": "web.js", "code": "eval(userInput);\nfetch('http://example.org/api');\n"},
+]
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    made = []
+
+    def make(store=None, **kwargs):
+        kwargs = {"workers": 1, "batch_bytes": 1, **kwargs}
+        mgr = jobs.JobManager(store or jobs.MemoryJobStore(), **kwargs)
+        monkeypatch.setattr(jobs, "MANAGER", mgr)
+        made.append(mgr)
+        return mgr
+
+    yield make
+    for mgr in made:
+        mgr.shutdown()
+
+
+def _wait(job_id, offset=0, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get(f"/api/ai-devsec/jobs/{job_id}", params={"offset": offset}).json()
+        if body["status"] in ("done", "failed") or time.monotonic() > deadline:
+            return body
+        time.sleep(0.02)
+
+
+_scan_files = jobs._scan_files
+
+
+def _crash_once(files):
+    """Pool stand-in for _scan_files: crash.py kills its worker (once per marker file), slow.py dawdles."""
+    for name, _ in files:
+        if name.endswith("crash.py") and not os.path.exists(name):
+            open(name, "w").close()
+            time.sleep(0.3)
+            os._exit(1)
+        if name == "slow.py":
+            time.sleep(1.0)
+    return _scan_files(files)
+
+
+def _crash_always(files):
+    os._exit(1)
+
+
+def _expected(files):
+    return [f.model_dump() for entry in files for f in run_scan(ScanRequest(**entry)).findings]
+
+
+def test_job_runs_in_worker_processes_and_reports_progress(manager):
+    manager()
+    resp = client.post("/api/ai-devsec/jobs", json={"files": FILES})
+    assert resp.status_code == 202
+    body = resp.json()
+    assert body["status"] in ("queued", "running") and body["files_total"] == 3
+
+    done = _wait(body["job_id"])
+    assert done["status"] == "done"
+    assert done["files_done"] == 3 and done["bytes_done"] == done["bytes_total"]
+    assert done["findings"] == _expected(FILES)
+    assert done["risk_score"] == scan_response([Finding(**f) for f in done["findings"]]).risk_score
+    assert done["expires_at"] > done["finished_at"]
+
+    # polling with an offset only returns findings not seen yet
+    tail = client.get(f"/api/ai-devsec/jobs/{body['job_id']}", params={"offset": 2}).json()
+    assert tail["findings"] == done["findings"][2:] and tail["findings_total"] == len(done["findings"])
+
+
+def test_full_queue_rejects_submissions(manager):
+    manager(queue_max=1, batch_bytes=64 * 1024 * 1024)
+    big = {"files": [{"filename": "big.py", "code": 'os.system("id")\n' * 150_000}]}
+    codes = [client.post("/api/ai-devsec/jobs", json=big).status_code for _ in range(3)]
+    # one job runs, at most one waits, the rest are turned away
+    assert codes[0] == 202 and codes[-1] == 429
+    assert client.post("/api/ai-devsec/jobs", json=big).headers["Retry-After"]
+
+
+def test_job_limits_and_unknown_ids(manager):
+    manager(max_bytes=10)
+    assert client.post("/api/ai-devsec/jobs", json={"files": FILES}).status_code == 413
+    assert client.get("/api/ai-devsec/jobs/nope").status_code == 404
+    manager(workers=0)
+    assert client.post("/api/ai-devsec/jobs", json={"files": FILES}).status_code == 503
+
+
+def test_finished_jobs_expire(manager):
+    manager(ttl=0.2)
+    job_id = client.post("/api/ai-devsec/jobs", json={"files": FILES[:1]}).json()["job_id"]
+    assert _wait(job_id)["status"] == "done"
+    time.sleep(0.3)
+    assert client.get(f"/api/ai-devsec/jobs/{job_id}").status_code == 404
+    assert jobs.MANAGER.store.purge(time.time()) == 1
+
+
+def test_sqlite_store_resumes_unfinished_jobs_after_restart(tmp_path, manager, monkeypatch):
+    path = str(tmp_path / "jobs.db")
+    files = [(f["filename"], f["code"]) for f in FILES]
+
+    # a previous process scanned the first file, then died
+    before = jobs.SqliteJobStore(path)
+    job = jobs.Job("j1", len(files), sum(len(c) for _, c in files), time.time())
+    before.add(job, files)
+    before.start("j1", time.time())
+    first = [Finding(**f) for f in _expected(FILES[:1])]
+    before.progress("j1", 1, len(files[0][1]), first)
+
+    mgr = manager(store=jobs.SqliteJobStore(path))
+    # polling does not start the pool; the app's startup does, when JOBS_DB is set
+    assert client.get("/api/ai-devsec/jobs/j1").json()["status"] == "running" and mgr._pool is None
+    monkeypatch.setenv("JOBS_DB", path)
+    with TestClient(app):
+        done = _wait("j1")
+    # and its shutdown stops the dispatchers and the pool
+    assert mgr._state == "stopped" and not any(t.is_alive() for t in mgr._threads)
+    assert done["status"] == "done" and done["files_done"] == 3
+    assert done["findings"] == _expected(FILES)
+    assert jobs.SqliteJobStore(path).files("j1") == []
+
+
+def test_jobs_caught_in_a_broken_pool_are_retried(tmp_path, manager, monkeypatch):
+    monkeypatch.setattr(jobs, "_scan_files", _crash_once)
+    manager(workers=2)
+    slow = client.post("/api/ai-devsec/jobs", json={"files": [{**FILES[0], "filename": "slow.py"}]})
+    crash = client.post("/api/ai-devsec/jobs", json={"files": [{"filename": str(tmp_path / "crash.py"), "code": "x = 1\n"}]})
+    # the crash broke the pool under the slow job too; both go again on a fresh pool
+    assert _wait(slow.json()["job_id"])["status"] == "done"
+    assert _wait(crash.json()["job_id"])["status"] == "done"
+
+    # a job that kills every worker fails once its retries are used up
+    monkeypatch.setattr(jobs, "_scan_files", _crash_always)
+    manager(pool_retries=1)
+    failed = _wait(client.post("/api/ai-devsec/jobs", json={"files": FILES[:1]}).json()["job_id"])
+    assert failed["status"] == "failed" and "BrokenProcessPool" in failed["error"]
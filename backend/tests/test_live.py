@@ -0,0 +1,91 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from backend.app.main import app
+
+
+client = TestClient(app)
+
+CODE = 'import os\nos.system("id")\n\n\npassword = "hunter2"\n'
+
+
+@pytest.fixture(autouse=True)
+def fast_debounce(monkeypatch):
+    monkeypatch.setenv("LIVE_DEBOUNCE_MS", "20")
+
+
+def _open(ws, text=CODE, doc="app.py"):
+    ws.send_json({"type": "open", "doc": doc, "filename": doc, "text": text, "version": 0})
+    return ws.receive_json()
+
+
+def test_open_then_edits_stream_added_removed_and_moved():
+    with client.websocket_connect("/api/ai-devsec/live") as ws:
+        opened = _open(ws)
+        assert opened["type"] == "findings" and opened["version"] == 0
+        ids = {f["detector"]: f["id"] for f in opened["added"]}
+        assert set(ids) == {"dangerous_exec", "hardcoded_creds"}
+        assert opened["removed"] == [] and opened["moved"] == []
+
+        # insert an eval() above everything: one new finding, the others move down
+        ws.send_json({"type": "edit", "doc": "app.py", "version": 1,
+                      "edits": [{"start_line": 1, "end_line": 0, "lines": ["x = eval(y)"]}]})
+        event = ws.receive_json()
+        assert event["version"] == 1
+        assert [(f["detector"], f["line"]) for f in event["added"]] == [("dangerous_exec", 1)]
+        assert sorted(m["id"] for m in event["moved"]) == sorted(ids.values())
+        assert event["removed"] == []
+
+        # delete the os.system line: that finding is removed, the password one moves up
+        ws.send_json({"type": "edit", "doc": "app.py", "version": 2,
+                      "edits": [{"start_line": 3, "end_line": 3, "lines": []}]})
+        event = ws.receive_json()
+        assert event["removed"] == [ids["dangerous_exec"]]
+        assert event["moved"] == [{"id": ids["hardcoded_creds"], "line": 5}]
+        assert event["added"] == []
+
+
+def test_rapid_edits_are_debounced_into_one_scan(monkeypatch):
+    monkeypatch.setenv("LIVE_DEBOUNCE_MS", "300")
+    with client.websocket_connect("/api/ai-devsec/live") as ws:
+        _open(ws)
+        for version in (1, 2, 3):
+            ws.send_json({"type": "edit", "doc": "app.py", "version": version,
+                          "edits": [{"start_line": 3, "end_line": 3, "lines": [f"v{version} = eval(a)"]}]})
+        event = ws.receive_json()
+        assert event["version"] == 3
+        assert [f["evidence"] for f in event["added"]] == ["v3 = eval(a)"]
+
+        # nothing else was queued: the next message is the reply to this bad request
+        ws.send_json({"type": "edit", "doc": "missing.py", "edits": []})
+        assert ws.receive_json() == {"type": "error", "doc": "missing.py", "message": "document is not open"}
+
+
+def test_bad_edits_and_limits_are_reported(monkeypatch):
+    monkeypatch.setenv("LIVE_MAX_MB", "0.001")
+    monkeypatch.setenv("LIVE_MAX_DOCS", "1")
+    with client.websocket_connect("/api/ai-devsec/live") as ws:
+        _open(ws)
+        ws.send_json({"type": "edit", "doc": "app.py", "edits": [{"start_line": 50, "end_line": 50, "lines": []}]})
+        assert "outside the 5-line buffer" in ws.receive_json()["message"]
+
+        ws.send_json({"type": "edit", "doc": "app.py", "edits": [{"start_line": 1, "end_line": 0, "lines": ["x" * 2000]}]})
+        assert ws.receive_json()["message"] == "connection memory limit exceeded"
+
+        assert "at most 1 open documents" in _open(ws, doc="other.py")["message"]
+
+        ws.send_json({"type": "open", "doc": "b.py", "filename": ["b.py"], "text": "x"})
+        assert ws.receive_json()["message"] == "'filename' must be a string"
+
+        ws.send_text("not json")
+        assert ws.receive_json()["message"] == "messages must be JSON"
+
+
+def test_oversized_message_closes_the_connection(monkeypatch):
+    monkeypatch.setenv("LIVE_MAX_MESSAGE_MB", "0.001")
+    with client.websocket_connect("/api/ai-devsec/live") as ws:
+        ws.send_json({"type": "open", "doc": "big.py", "text": "x" * 5000})
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+        assert exc.value.code == 1009
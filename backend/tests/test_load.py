@@ -0,0 +1,73 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.benchmarks import load
+from backend.benchmarks.fake_anthropic import FakeOptions, create_app
+
+
+KEY = {"x-api-key": "test"}
+BODY = {"model": "m", "max_tokens": 16, "system": "be brief", "messages": [{"role": "user", "content": "hi there"}]}
+
+
+def test_fake_messages_api_shapes():
+    client = TestClient(create_app())
+    reply = client.post("/v1/messages", json=BODY, headers=KEY).json()
+    assert reply["type"] == "message" and reply["content"][0]["text"]
+    assert reply["usage"]["input_tokens"] == 4 and reply["usage"]["output_tokens"] > 0
+    assert client.post("/v1/messages", json=BODY).status_code == 401
+    assert client.post("/v1/messages", json={"model": "m"}, headers=KEY).status_code == 400
+
+    stream = client.post("/v1/messages", json={**BODY, "stream": True}, headers=KEY)
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[6:]) for line in stream.text.splitlines() if line.startswith("data: ")]
+    assert events[0]["type"] == "message_start" and events[-1]["type"] == "message_stop"
+    text = "".join(e["delta"]["text"] for e in events if e["type"] == "content_block_delta")
+    assert text == reply["content"][0]["text"]
+    assert client.get("/stats").json() == {"200": 2, "401": 1, "400": 1}
+
+
+def test_fake_failures():
+    limited = TestClient(create_app(FakeOptions(rate_limit_rate=1.0))).post("/v1/messages", json=BODY, headers=KEY)
+    assert limited.status_code == 429 and limited.headers["retry-after"] == "1"
+    assert limited.json()["error"]["type"] == "rate_limit_error"
+    failed = TestClient(create_app(FakeOptions(error_rate=1.0))).post("/v1/messages", json=BODY, headers=KEY)
+    assert failed.status_code == 500 and failed.json()["error"]["type"] == "api_error"
+
+    client = TestClient(create_app(FakeOptions(error_rate=0.3, rate_limit_rate=0.2, seed=1)))
+    for _ in range(200):
+        client.post("/v1/messages", json=BODY, headers=KEY)
+    stats = client.get("/stats").json()
+    assert 20 < stats["429"] < 60 and 40 < stats["500"] < 80
+
+
+def test_mix_and_summary():
+    assert load.parse_mix("scan=6,diff=3,chat") == {"scan": 6.0, "diff": 3.0, "chat": 1.0}
+    for bad in ("scan=1,jobs=2", "scan=0", "scan=-1"):
+        with pytest.raises(ValueError):
+            load.parse_mix(bad)
+
+    assert [load.percentile(list(range(1, 101)), q) for q in (50, 95, 99)] == [50, 95, 99]
+    samples = [("scan", 200, k / 1000) for k in range(1, 10)] + [("chat", 502, 1.0), ("chat", 0, 2.0)]
+    report = load.summarize(samples, elapsed=3.0)
+    assert report["scan"]["throughput_per_s"] == 3.0 and report["scan"]["error_rate"] == 0.0
+    assert report["scan"]["p50_ms"] == 5.0 and report["scan"]["max_ms"] == 9.0
+    assert report["chat"] == {"requests": 2, "throughput_per_s": 0.0, "error_rate": 1.0,
+                              "statuses": {"502": 1, "0": 1}, "p50_ms": 1000.0, "p95_ms": 2000.0,
+                              "p99_ms": 2000.0, "max_ms": 2000.0}
+    assert report["all"]["requests"] == 11
+
+
+def test_end_to_end_against_local_servers():
+    with load.servers(["--latency-ms", "20", "--jitter-ms", "0"]) as (app_url, fake_url):
+        report = load.run_load(app_url, rps=20, duration=1.0, mix=load.parse_mix("scan=1,diff=1,chat=1"),
+                               size=4096, seed=3)
+        upstream = httpx.get(f"{fake_url}/stats").json()
+    endpoints = report["endpoints"]
+    assert set(endpoints) == {"scan", "diff", "chat", "all"} and endpoints["all"]["requests"] == 20
+    assert all(row["error_rate"] == 0.0 for row in endpoints.values())
+    # every /chat reached the stand-in, and its latency floor shows in the app's
+    assert upstream == {"200": endpoints["chat"]["requests"]}
+    assert endpoints["chat"]["p50_ms"] >= 20
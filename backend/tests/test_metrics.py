@@ -0,0 +1,46 @@
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.ai_devsec import metrics
+from backend.app.ai_devsec.metrics import Counter, Histogram
+
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("t_latency", "test", ["route"], buckets=(0.1, 1.0))
+    h.observe(0.05, route="/a")
+    h.observe(0.5, route="/a")
+    h.observe(5.0, route="/a")
+    text = "\n".join(h.render())
+    assert 't_latency_bucket{route="/a",le="0.1"} 1' in text
+    assert 't_latency_bucket{route="/a",le="1"} 2' in text
+    assert 't_latency_bucket{route="/a",le="+Inf"} 3' in text
+    assert 't_latency_count{route="/a"} 3' in text
+
+
+def test_counter_escapes_label_values():
+    c = Counter("t_total", "test", ["name"])
+    c.inc(2, name='a"b')
+    assert c.render() == ['t_total{name="a\\"b"} 2']
+
+
+def test_scan_records_detector_metrics():
+    before = metrics.DETECTOR_FINDINGS.value(detector="dangerous_exec")
+    client.post("/api/ai-devsec/scan", content='os.system("whoami")',
+                headers={"Content-Type": "text/plain"})
+    assert metrics.DETECTOR_FINDINGS.value(detector="dangerous_exec") == before + 1
+    assert metrics.DETECTOR_SECONDS.value(detector="secrets") > 0
+
+
+def test_metrics_endpoint_exposes_route_templates():
+    client.post("/api/ai-devsec/scan-diff", content="+++ b/a.py\n@@ -1 +1 @@\n+x = 1\n",
+                headers={"Content-Type": "text/plain"})
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert 'route="/api/ai-devsec/scan-diff"' in body
+    assert 'ai_devsec_scan_input_chars_count{endpoint="scan-diff"}' in body
+    assert "# TYPE ai_devsec_detector_seconds_total counter" in body
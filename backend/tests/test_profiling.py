@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+
+
+client = TestClient(app)
+CODE = 'import os\nos.system("whoami")\npassword = "hunter2"\n'
+
+
+def _post(path, body, params="", token=None):
+    headers = {"Content-Type": "text/plain"}
+    if token:
+        headers["X-Admin-Token"] = token
+    return client.post(f"/api/ai-devsec/{path}{params}", content=body, headers=headers)
+
+
+def test_profile_requires_admin_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert _post("scan", CODE, "?profile=true", token="anything").status_code == 403
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert _post("scan", CODE, "?profile=true").status_code == 403
+    assert _post("scan", CODE, "?profile=true", token="wrong").status_code == 403
+
+
+def test_profile_returns_detector_and_rule_breakdown(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    resp = _post("scan", CODE, "?profile=true", token="s3cret")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert any(f["detector"] == "dangerous_exec" for f in body["findings"])
+
+    profile = body["profile"]
+    assert profile["lines"] == 3
+    assert profile["cprofile"] is None
+    by_name = {d["detector"]: d for d in profile["detectors"]}
+    assert len(by_name) == 10
+    exec_rules = {r["rule"]: r for r in by_name["dangerous_exec"]["rules"]}
+    # counted in the real scan: the anchor prefilter leaves one line for os.system() and none for eval()
+    assert exec_rules["os.system()"]["hits"] == 1
+    assert exec_rules["os.system()"]["evaluations"] == 1
+    assert exec_rules["eval()"]["evaluations"] == 0
+    assert by_name["dangerous_exec"]["findings"] == 1
+
+    # comment lines skipped by the detector are not evaluated either
+    body = _post("scan", "# os.system(x)\n" + CODE, "?profile=true&filename=a.py", token="s3cret").json()
+    exec_rules = {r["rule"]: r for d in body["profile"]["detectors"] if d["detector"] == "dangerous_exec"
+                  for r in d["rules"]}
+    assert exec_rules["os.system()"]["evaluations"] == 1
+
+
+def test_profile_diff_with_cprofile(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    diff = '+++ b/app.py\n@@ -1,1 +1,2 @@\n+os.system("id")\n'
+    resp = _post("scan-diff", diff, "?profile=true&cprofile=true", token="s3cret")
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["findings"][0]["file"] == "app.py"
+    assert "cumulative" in body["profile"]["cprofile"]
+
+
+def test_unprofiled_scan_has_no_profile_field():
+    body = _post("scan", CODE).json()
+    assert "profile" not in body
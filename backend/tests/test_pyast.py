@@ -0,0 +1,136 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import pyast
+from backend.app.ai_devsec.baseline import Baseline
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_gate, run_scan
+from backend.app.main import app
+
+
+FLOWS = '''import subprocess as sp
+from os import system as run
+from flask import request
+
+def view():
+    name = request.args.get("file")
+    path = "/srv/" + name
+    with open(path) as fh:
+        data = fh.read()
+    safe = int(request.args["page"])
+    open(f"/srv/{safe}.txt")
+    user_id = request.form["id"]
+    query = "SELECT * FROM users WHERE id = {}".format(user_id)
+    db.cursor().execute(query)
+    db.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+    run("ls")
+    sp.call(name, shell=True)
+    label = "eval(x) is only text here"
+
+def other():
+    open(path)
+'''
+
+
+def _ast_hits(resp):
+    return [(f.line, f.rule_id) for f in resp.findings if ".ast_" in (f.rule_id or "")]
+
+
+def test_aliases_and_flows_into_sinks():
+    resp = run_scan(ScanRequest(code=FLOWS, filename="views.py"), python_ast=True)
+    assert _ast_hits(resp) == [
+        (8, "path_traversal.ast_tainted_path"),
+        (14, "sql_injection.ast_tainted_query"),
+        (16, "dangerous_exec.ast_aliased_call"),
+    ]
+    # line 17 is already reported by the regex tier (shell=True): not repeated, same detector
+    assert [f.detector for f in resp.findings if f.line == 17] == ["dangerous_exec"]
+    # the regex tier's findings are all still there
+    regex_only = run_scan(ScanRequest(code=FLOWS, filename="views.py"))
+    assert all(f in resp.findings for f in regex_only.findings)
+    aliased = next(f for f in resp.findings if f.line == 16)
+    assert aliased.message == "os.system() called through an import alias."
+
+    # AST findings are fingerprinted like any other and honour baselines
+    accepted = Baseline("views", [int(aliased.fingerprint, 16)])
+    resp = run_scan(ScanRequest(code=FLOWS, filename="views.py"), accepted, python_ast=True)
+    assert resp.suppressed == 1 and aliased not in resp.findings
+
+
+def test_tainted_command_and_scopes():
+    code = "import sys, os\ndef main():\n    target = sys.argv[1]\n    os.system('ping ' + target)\n    eval(input())\n"
+    hits = _ast_hits(run_scan(ScanRequest(code=code, filename="cli.py"), python_ast=True))
+    # the regex tier already reports both lines as dangerous_exec; the AST tier adds nothing
+    assert hits == []
+    checker = pyast.Checker()
+    checker.visit(pyast.CACHE.parse(code).tree)
+    assert [(line, rule) for line, _, rule, _ in checker.hits] == [
+        (4, "dangerous_exec.ast_tainted_command"), (5, "dangerous_exec.ast_tainted_command"),
+    ]
+    # taint bound inside a function does not leak out of it
+    assert checker.tainted == set()
+
+
+def test_lines_match_the_regex_tier_after_a_form_feed():
+    code = ("import subprocess\nfrom flask import request\n\x0c\ndef view():\n"
+            "    cmd = request.args['c']\n    subprocess.call(cmd, shell=True)\n"
+            "    x = 1;\x0cfrom os import system as run; run('ls')\n")
+    resp = run_scan(ScanRequest(code=code, filename="a.py"), python_ast=True)
+    # the regex tier already reports line 7, so the tainted call there is not reported again
+    assert {f.line for f in resp.findings if f.rule_id == "dangerous_exec.shell_true"} == {7}
+    assert _ast_hits(resp) == [(9, "dangerous_exec.ast_aliased_call")]
+    assert resp.findings[-1].evidence == "from os import system as run; run('ls')"
+
+
+@pytest.mark.parametrize("code,filename", [
+    ("def broken(:\n    eval(x)\n", "bad.py"),         # syntax error: regex tier only
+    ("from os import system as run\nrun(x)\n", "a.js"),   # not Python
+    ("x = " + "+".join(["a"] * 2000) + "\neval(x)\n", "deep.py"),  # parses, too deep to visit
+])
+def test_falls_back_to_regex(code, filename):
+    assert run_scan(ScanRequest(code=code, filename=filename), python_ast=True) == run_scan(
+        ScanRequest(code=code, filename=filename))
+
+
+def test_parse_is_cached_by_content(monkeypatch):
+    cache = pyast.ParseCache(max_entries=2)
+    parses = []
+    real = pyast.ast.parse
+    monkeypatch.setattr(pyast.ast, "parse", lambda code, *args, **kw: parses.append(code) or real(code, *args, **kw))
+    for _ in range(3):
+        found = pyast.ast_findings(FLOWS, {}, {}, cache=cache)
+    assert len(parses) == 1 and len(found) == 4
+    pyast.ast_findings("x = 1\n", {}, {}, cache=cache)
+    pyast.ast_findings("y = 2\n", {}, {}, cache=cache)
+    pyast.ast_findings(FLOWS, {}, {}, cache=cache)    # evicted: parsed again
+    assert len(parses) == 4 and len(cache) == 2
+
+
+def test_endpoint():
+    client = TestClient(app)
+    headers = {"Content-Type": "text/plain"}
+    code = "from os import system as run\nrun(cmd)\n"
+    assert client.post("/api/ai-devsec/scan?filename=a.py", content=code, headers=headers).json()["findings"] == []
+    body = client.post("/api/ai-devsec/scan?filename=a.py&ast=true", content=code, headers=headers).json()
+    assert [f["rule_id"] for f in body["findings"]] == ["dangerous_exec.ast_aliased_call"]
+    assert body["scan_id"] is None
+
+    deep = "x = " + "+".join(["a"] * 2000) + "\n"
+    assert client.post("/api/ai-devsec/scan?filename=a.py&ast=true", content=deep, headers=headers).status_code == 200
+
+
+def test_gate_includes_the_ast_tier():
+    client = TestClient(app)
+    headers = {"Content-Type": "text/plain"}
+    code = "from os import system as run\nrun(cmd)\n"
+    url = "/api/ai-devsec/scan?filename=a.py&gate=HIGH"
+    assert client.post(url, content=code, headers=headers).json()["passed"] is True
+    body = client.post(url + "&ast=true", content=code, headers=headers).json()
+    assert body["passed"] is False and body["finding"]["rule_id"] == "dangerous_exec.ast_aliased_call"
+    assert client.post(url.replace("HIGH", "CRITICAL") + "&ast=true", content=code, headers=headers).json()["passed"]
+
+    # as in run_scan, the HIGH regex findings on line 4 take the place of the CRITICAL AST one
+    code = 'import subprocess\nfrom flask import request\nname = request.args["n"]\nsubprocess.call(name, shell=True)\n'
+    assert "dangerous_exec.ast_tainted_command" in [f.rule_id for f in pyast.ast_findings(code, {}, {})]
+    assert run_gate(ScanRequest(code=code, filename="a.py"), "CRITICAL", python_ast=True).passed
+    assert run_gate(ScanRequest(code=code, filename="a.py"), "HIGH", python_ast=True).finding.line == 4
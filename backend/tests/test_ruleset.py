@@ -0,0 +1,141 @@
+import json
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.ai_devsec import ruleset as rs
+from backend.app.ai_devsec.context import ScanContext
+from backend.app.ai_devsec.filetypes import FILE_TYPES
+from backend.app.ai_devsec.findings import ScanRequest
+from backend.app.ai_devsec.service import run_scan
+from backend.app.main import app
+from backend.benchmarks.corpus import CORPORA, generate
+
+
+ORG_PACK = {
+    "detector": "secrets",
+    "severity": "CRITICAL",
+    "confidence": 0.95,
+    "message": "Possible secret detected: {label}",
+    "recommendation": "Rotate the key.",
+    "rules": [{"id": "secrets.acme_key", "label": "ACME key", "pattern": r"\bacme_[0-9a-f]{24}\b", "anchors": ["acme_"]}],
+}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """A fresh rule store, so tests never leak packs into the shared one."""
+    fresh = rs.RuleStore()
+    monkeypatch.setattr(rs, "STORE", fresh)
+    monkeypatch.delenv("RULES_DIRS", raising=False)
+    monkeypatch.delenv("RULESET_ARTIFACT", raising=False)
+    return fresh
+
+
+def _write(path, pack):
+    path.write_text(json.dumps(pack))
+
+
+def test_builtin_packs_load_with_stable_version():
+    a, b = rs.load_packs(), rs.load_packs()
+    assert [d.name for d in a.detectors] == [
+        "secrets", "dangerous_exec", "hardcoded_creds", "insecure_http", "download_exec",
+        "sql_injection", "insecure_deserialization", "path_traversal", "weak_cryptography",
+        "debug_misconfig",
+    ]
+    assert a.version == b.version and a.version.startswith("sha256:")
+    ids = [r.id for d in a.detectors for r in d.rules]
+    assert len(ids) == len(set(ids)) == a.rule_count
+
+
+def test_anchors_never_hide_a_match():
+    """Every line a rule's regex matches must contain one of its anchor literals."""
+    texts = [generate(kind, 64 * 1024, seed=3) for kind in CORPORA]
+    texts.append(open(__file__.replace("test_ruleset.py", "test_ai_devsec.py")).read())
+    for detector in rs.load_packs().detectors:
+        for rule in detector.rules:
+            for text in texts:
+                ctx = ScanContext(text)
+                hits = ctx.lines_containing(rule.anchors, rule.ignorecase)
+                if hits is None:
+                    continue
+                for i, line in enumerate(ctx.lines):
+                    if rule.rx.search(line):
+                        assert i in hits, (rule.id, line)
+
+
+def test_org_pack_extends_detector_and_changes_version(tmp_path, store, monkeypatch):
+    code = "key = 'acme_0123456789abcdef01234567'\n"
+    before = rs.get_ruleset().version
+    assert run_scan(ScanRequest(code=code)).findings == []
+
+    _write(tmp_path / "acme.json", ORG_PACK)
+    monkeypatch.setenv("RULES_DIRS", str(tmp_path))
+    ruleset = rs.reload_ruleset()
+    assert ruleset.version != before
+    [finding] = run_scan(ScanRequest(code=code)).findings
+    assert finding.detector == "secrets"
+    assert finding.message == "Possible secret detected: ACME key"
+
+    # editing a pack is picked up; an unchanged tree is not reloaded
+    assert rs.reload_ruleset() is ruleset
+    _write(tmp_path / "acme.json", {**ORG_PACK, "confidence": 0.5})
+    assert rs.reload_ruleset().version != ruleset.version
+
+
+@pytest.mark.parametrize("mutate, error", [
+    (lambda p: p["rules"][0].update(pattern="(unclosed"), "invalid regex"),
+    (lambda p: p["rules"][0].update(id="other.acme_key"), "must start with 'secrets.'"),
+    (lambda p: p["rules"][0].update(severity="SEVERE"), "severity"),
+    (lambda p: p["rules"][0].update(file_types=["cobol"]), "file_types"),
+    (lambda p: p.update(skip_comments=True), "cannot redefine"),
+    (lambda p: p["rules"][0].update(id="secrets.github_token"), "duplicate rule id"),
+])
+def test_invalid_packs_are_rejected_and_old_ruleset_kept(tmp_path, store, monkeypatch, mutate, error):
+    good = rs.get_ruleset()
+    pack = json.loads(json.dumps(ORG_PACK))
+    mutate(pack)
+    _write(tmp_path / "bad.json", pack)
+    monkeypatch.setenv("RULES_DIRS", str(tmp_path))
+    with pytest.raises(rs.RulesetError, match=re.escape(error)):
+        rs.reload_ruleset()
+    assert rs.get_ruleset() is good
+
+
+def test_artifact_round_trip(tmp_path, store, monkeypatch):
+    out = tmp_path / "ruleset.json"
+    assert rs.main(["build", "-o", str(out)]) == 0
+    monkeypatch.setenv("RULESET_ARTIFACT", str(out))
+    loaded = rs.reload_ruleset(force=True)
+    assert loaded.version == rs.load_packs().version
+    assert loaded.sources == (str(out),)
+    for file_type in FILE_TYPES:
+        assert [(d.name, [r.id for r in rules]) for d, rules in loaded.route(file_type)] == \
+               [(d.name, [r.id for r in rules]) for d, rules in rs.load_packs().route(file_type)]
+
+    data = json.loads(out.read_text())
+    data["detectors"][0]["rules"][0]["pattern"] = "tampered"
+    out.write_text(json.dumps(data))
+    with pytest.raises(rs.RulesetError, match="version hash"):
+        rs.load_artifact(str(out))
+
+
+def test_rules_endpoints(tmp_path, store, monkeypatch):
+    client = TestClient(app)
+    summary = client.get("/api/ai-devsec/rules").json()
+    assert summary["detectors"]["secrets"] == 4
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.post("/api/ai-devsec/rules/reload").status_code == 403
+
+    _write(tmp_path / "acme.json", ORG_PACK)
+    monkeypatch.setenv("RULES_DIRS", str(tmp_path))
+    body = client.post("/api/ai-devsec/rules/reload", headers={"X-Admin-Token": "s3cret"}).json()
+    assert body["changed"] and body["previous_version"] == summary["version"]
+    assert body["detectors"]["secrets"] == 5
+
+    _write(tmp_path / "acme.json", {**ORG_PACK, "rules": []})
+    resp = client.post("/api/ai-devsec/rules/reload", headers={"X-Admin-Token": "s3cret"})
+    assert resp.status_code == 422
+    assert "rules must be a non-empty list" in resp.json()["detail"]